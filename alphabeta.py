@@ -0,0 +1,311 @@
+import itertools
+import time
+import numpy as np
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its time or node budget runs out."""
+
+
+class AlphaBetaSearch:
+    """Alpha-beta search from one player's point of view, shared by the
+    pruning players. Positions are looked up in a transposition table keyed
+    by the state's Zobrist hash, so a position reached through different move
+    orders is searched once, and the best move stored for a position is
+    tried first when it has to be searched again.
+
+    A MoveOrdering can be given to try likely cutoff moves first (killer
+    moves, history heuristic, square weights) after the table's best move.
+    With `in_place` the search plays and takes back moves on one mutable
+    state with Game.make_move and Game.unmake_move instead of building a
+    new state per node with Game.result. With `batch_evaluate` the children
+    of a node one ply above the depth limit are valued together in one call
+    instead of one by one. With `symmetry` (see symmetry.py) positions are
+    stored under their canonical key, so rotations and reflections of a
+    position share one entry; this is only sound if `evaluate` scores
+    symmetric positions alike, as terminal utilities always are. With
+    `bound` the search polls a lower bound on the root's value found
+    elsewhere (e.g. by a process searching a sibling root move) and raises
+    its alpha to it at every interior node, so the subtree is only searched
+    as far as it could still beat that bound.
+
+    Values are always from `player`'s point of view (Max), so a table must not
+    be shared between the two sides of a game."""
+
+    def __init__(self, game, player, depth=None, evaluate=None, table=None, deadline=None, node_limit=None,
+                 ordering=None, in_place=False, batch_evaluate=None, symmetry=None, bound=None):
+        """
+        Set up a search.
+
+        Args:
+            game: The game being played.
+            player: The player searching for a move.
+            depth: Number of plies to search below the root before calling
+                `evaluate`, or None to search all the way to terminal states.
+            evaluate: Heuristic evaluation of a state, used at the depth limit.
+            table: A TranspositionTable to reuse; a new one is created if None.
+            deadline: A time.perf_counter() value after which the search raises SearchTimeout.
+            node_limit: A number of nodes after which the search raises SearchTimeout.
+            ordering: A MoveOrdering for the moves of each node, or None to only try the table's move first.
+            in_place (bool): Whether to search with make_move/unmake_move.
+            batch_evaluate: A function valuing a list of leaf states for `player` at once
+                (utility if terminal, heuristic otherwise), e.g. Reversi.evaluate_leaves.
+            symmetry: A BoardSymmetry or BitboardSymmetry keying the table by canonical position.
+            bound: A function returning a value the root is known to reach from `player`'s point
+                of view; it may only grow during the search. Values at or below it are returned as bounds.
+        """
+        self.game = game
+        self.player = player
+        self.depth = depth if depth is not None else np.inf
+        self.evaluate = evaluate
+        self.table = table if table is not None else TranspositionTable()
+        self.deadline = deadline
+        self.node_limit = node_limit
+        self.ordering = ordering
+        self.in_place = in_place
+        self.batch_evaluate = batch_evaluate
+        self.symmetry = symmetry
+        self.bound = bound
+        self.nodes = 0
+        self.interior_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # Whether the value being computed depends on the depth limit
+        self.hit_limit = False
+
+    def best_move(self, state):
+        """Return the best move for `player` from `state`."""
+        self.table.new_search()
+        if self.ordering is not None:
+            self.ordering.new_search()
+        if self.in_place:
+            state = self.game.mutable_state(state)
+        entry = self.probe(state)[0]
+        return self.search_root(state, self.ordered_actions(state, entry, 0))[0]
+
+    def iterative_deepening(self, state, max_depth=None):
+        """
+        Search to depth 1, 2, 3... until the budget runs out, the tree is
+        solved to its terminal states, or `max_depth` is reached. Each
+        iteration searches the root moves best-first according to the one
+        before, and the moves stored in the table along the previous
+        principal variation are tried first further down.
+
+        Returns:
+            tuple: The best move of the last completed iteration (or the best
+            move found so far if none completed) and the depth it reached.
+        """
+        self.table.new_search()
+        if self.ordering is not None:
+            self.ordering.new_search()
+        if self.in_place:
+            state = self.game.mutable_state(state)
+        actions = list(self.ordered_actions(state, None, 0))
+        best_move, completed = actions[0] if actions else None, 0
+        for depth in itertools.count(1):
+            if max_depth is not None and depth > max_depth:
+                break
+            self.depth = depth
+            try:
+                move, values = self.search_root(state, actions)
+            except SearchTimeout:
+                break
+            best_move, completed = move, depth
+            # Stable sort, so moves with equal values keep their previous order
+            actions.sort(key=lambda action: values[action], reverse=True)
+            if not self.hit_limit:
+                break  # Nothing was cut off by the depth limit: the values are exact
+        return best_move, completed
+
+    def search_root(self, state, actions):
+        """Search the root moves in the given order and return the best one with every move's value or bound."""
+        self.hit_limit = False
+        best_move = None
+        a = -np.inf
+        values = {}
+        for action in actions:
+            v = self.search_child(state, action, a, np.inf, 1)
+            values[action] = v
+            if best_move is None or v > a:
+                best_move, a = action, v
+        self.record(state, self.depth if self.hit_limit else np.inf, a, EXACT, best_move)
+        return best_move, values
+
+    def probe(self, state):
+        """Look `state` up in the table and return its entry (or None), with the stored move
+        mapped to `state`, and the (key, symmetry) to store the position under."""
+        key, t = self.probe_key(state)
+        entry = self.table.lookup(key)
+        if entry is not None and entry.move is not None and self.symmetry is not None:
+            entry = entry._replace(move=self.symmetry.from_canonical(entry.move, t))
+        return entry, (key, t)
+
+    def record(self, state, depth, value, flag, move=None, key=None):
+        """Store a result for `state` in the table, under `key` as returned by probe if given."""
+        if key is None:
+            key = self.probe_key(state)
+        key, t = key
+        if move is not None and self.symmetry is not None:
+            move = self.symmetry.to_canonical(move, t)
+        self.table.store(key, depth, value, flag, move)
+
+    def probe_key(self, state):
+        """Return the (key, symmetry) `state` is stored under."""
+        if self.symmetry is None:
+            return state.zobrist, 0
+        return self.symmetry.canonical(state)
+
+    def ordered_actions(self, state, entry, ply):
+        """Return the legal moves, best guesses first: the stored best move, then the ordering's choice if any."""
+        actions = self.game.actions(state)
+        if self.ordering is not None:
+            tt_move = entry.move if entry is not None else None
+            return self.ordering.order(actions, self.game.to_move(state), ply, tt_move)
+        if entry is not None and entry.move in actions:
+            return [entry.move] + [action for action in actions if action != entry.move]
+        return actions
+
+    def search_child(self, state, action, a, b, ply):
+        """Return the alphabeta value of the state reached by playing `action` from `state`."""
+        if not self.in_place:
+            return self.alphabeta(self.game.result(state, action), a, b, ply)
+        undo = self.game.make_move(state, action)
+        try:
+            return self.alphabeta(state, a, b, ply)
+        finally:
+            self.game.unmake_move(state, undo)
+
+    def alphabeta(self, state, a, b, ply):
+        """Return the value of `state`, or a bound on it when it falls outside (a, b)."""
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        remaining = self.depth - ply
+        entry, key = self.probe(state)
+        if entry is not None and entry.depth >= remaining:
+            if (entry.flag == EXACT or
+                    (entry.flag == LOWER and entry.value >= b) or
+                    (entry.flag == UPPER and entry.value <= a)):
+                if entry.depth != np.inf:
+                    self.hit_limit = True
+                return entry.value
+
+        if self.game.terminal_test(state):
+            v = self.game.utility(state, self.player)
+            self.record(state, np.inf, v, EXACT, key=key)
+            return v
+        if remaining <= 0:
+            self.hit_limit = True
+            v = self.evaluate(state)
+            self.record(state, 0, v, EXACT, key=key)
+            return v
+
+        if remaining == 1 and self.batch_evaluate is not None:
+            return self.frontier_value(state, entry, ply, key)
+
+        outer_hit_limit, self.hit_limit = self.hit_limit, False
+        self.interior_nodes += 1
+        if self.bound is not None:
+            # Raise alpha only below beta, so a value cut short by it stays below beta
+            bound = self.bound()
+            if a < bound < b:
+                a = bound
+        to_move = self.game.to_move(state)
+        best_move = None
+        cutoff = False
+        if to_move == self.player:
+            v = -np.inf
+            for i, action in enumerate(self.ordered_actions(state, entry, ply)):
+                child = self.search_child(state, action, max(a, v), b, ply + 1)
+                if child > v:
+                    v, best_move = child, action
+                if v >= b:
+                    cutoff = True
+                    break
+        else:
+            v = np.inf
+            for i, action in enumerate(self.ordered_actions(state, entry, ply)):
+                child = self.search_child(state, action, a, min(b, v), ply + 1)
+                if child < v:
+                    v, best_move = child, action
+                if v <= a:
+                    cutoff = True
+                    break
+
+        if cutoff:
+            self.cutoffs += 1
+            if i == 0:
+                self.first_move_cutoffs += 1
+            if self.ordering is not None:
+                self.ordering.record_cutoff(action, to_move, ply, remaining)
+
+        if self.bound is not None:
+            # A child may have been searched against a higher bound than this node's alpha
+            a = max(a, self.bound())
+        if v >= b:
+            flag = LOWER
+        elif v <= a:
+            flag = UPPER
+        else:
+            flag = EXACT
+        # A subtree that never reached the depth limit holds for any depth
+        self.record(state, remaining if self.hit_limit else np.inf, v, flag, best_move, key)
+        self.hit_limit = outer_hit_limit or self.hit_limit
+        return v
+
+    def frontier_value(self, state, entry, ply, key=None):
+        """Return the exact value of a node whose children are all leaves, valuing the children
+        not found in the table with one batch_evaluate call. There is no pruning among them."""
+        self.interior_nodes += 1
+        actions = list(self.ordered_actions(state, entry, ply))
+        values = [None] * len(actions)
+        pending = []
+        for i, action in enumerate(actions):
+            self.nodes += 1
+            child = self.game.result(state, action)
+            child_entry, child_key = self.probe(child)
+            if child_entry is not None and child_entry.flag == EXACT:
+                values[i] = child_entry.value
+            else:
+                pending.append((i, child, child_key))
+
+        if pending:
+            for (i, child, child_key), v in zip(pending, self.batch_evaluate([child for _, child, _ in pending])):
+                values[i] = float(v)
+                self.record(child, 0, values[i], EXACT, key=child_key)
+        # Treat the value as depending on the depth limit, even if every child happened to be terminal
+        self.hit_limit = True
+
+        choose = max if self.game.to_move(state) == self.player else min
+        best = choose(range(len(actions)), key=values.__getitem__)
+        self.record(state, 1, values[best], EXACT, actions[best], key)
+        return values[best]
+
+    def principal_variation(self, state, max_length=None):
+        """Follow the best moves stored in the table from `state` and return them."""
+        pv = []
+        seen = set()
+        while max_length is None or len(pv) < max_length:
+            entry = self.probe(state)[0]
+            if entry is None or entry.move is None or entry.move not in self.game.actions(state) or state.zobrist in seen:
+                break
+            seen.add(state.zobrist)
+            pv.append(entry.move)
+            state = self.game.result(state, entry.move)
+        return pv
+
+    def statistics(self):
+        """Return the node, cutoff and transposition table counters of the search."""
+        return {
+            'nodes': self.nodes,
+            'tt_probes': self.table.probes,
+            'tt_hits': self.table.hits,
+            'cutoffs': self.cutoffs,
+            # Share of expanded nodes that were cut off, and of cutoffs caused by the first move tried
+            'cutoff_rate': self.cutoffs / self.interior_nodes if self.interior_nodes else 0,
+            'first_move_cutoff_rate': self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0,
+        }
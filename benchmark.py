@@ -0,0 +1,456 @@
+import argparse
+import random
+import time
+import tracemalloc
+from tictactoe import TicTacToe
+from compact_tictactoe import CompactTicTacToe
+from reversi import Reversi
+from bitboard_reversi import BitboardReversi
+from alphabeta import AlphaBetaSearch
+from move_ordering import MoveOrdering
+from minimax_limited_pruning import heuristic_evaluator
+from mcts import mcts_player
+from mcts_tree import MCTSTree, MCTSPlayer
+
+# Standard openings in Othello notation. The first player here ('X') starts
+# with the discs a standard board gives to Black mirrored left to right, so
+# a square like f5 maps to (7 - column, row - 1).
+OPENINGS = {
+    'start': '',
+    'perpendicular': 'f5d6',
+    'diagonal': 'f5f6',
+    'parallel': 'f5f4',
+    'tiger': 'f5d6c3d3c4',
+    'buffalo': 'f5f6e6f4c3',
+    'rabbit': 'f5f6e6f4e3',
+}
+
+
+def othello_move(square):
+    """Convert a square in Othello notation (e.g. 'f5') to a move of this repo's Reversi."""
+    return (7 - (ord(square[0]) - ord('a')), int(square[1]) - 1)
+
+
+def opening_state(game, moves):
+    """Play a sequence of moves in Othello notation from the initial state and return the position."""
+    state = game.initial
+    for i in range(0, len(moves), 2):
+        move = othello_move(moves[i:i + 2])
+        assert move in game.actions(state), f"{moves[i:i + 2]} is not legal"
+        state = game.result(state, move)
+    return state
+
+
+def ordering_report(game, depth):
+    """
+    Search each standard opening position to `depth` with and without the
+    heuristic move ordering, and print nodes, cutoff rates and time.
+
+    Args:
+        game: A Reversi engine.
+        depth (int): Plies to search.
+    """
+    print(f"{'opening':<14}{'ordering':<10}{'nodes':>9}{'cutoff%':>9}{'first%':>9}{'time':>9}")
+    totals = {False: 0, True: 0}
+    for name, moves in OPENINGS.items():
+        state = opening_state(game, moves)
+        player = game.to_move(state)
+        for use_ordering in (False, True):
+            ordering = MoveOrdering(game) if use_ordering else None
+            search = AlphaBetaSearch(game, player, depth=depth, evaluate=heuristic_evaluator(game, player),
+                                     ordering=ordering)
+            start_time = time.perf_counter()
+            search.best_move(state)
+            elapsed = time.perf_counter() - start_time
+            stats = search.statistics()
+            totals[use_ordering] += stats['nodes']
+            print(f"{name:<14}{'on' if use_ordering else 'off':<10}{stats['nodes']:>9}"
+                  f"{100 * stats['cutoff_rate']:>8.1f}%{100 * stats['first_move_cutoff_rate']:>8.1f}%{elapsed:>8.2f}s")
+    print(f"total nodes: {totals[False]} without ordering, {totals[True]} with ordering "
+          f"({totals[True] / totals[False]:.2f}x)")
+
+
+def random_positions(game, count, seed=0):
+    """Collect `count` positions from random games, for evaluation benchmarks."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        state = game.initial
+        while not game.terminal_test(state) and len(positions) < count:
+            positions.append(state)
+            state = game.result(state, rng.choice(game.actions(state)))
+    return positions
+
+
+def evaluation_report(count):
+    """
+    Time the heuristic on `count` random Reversi positions one state at a
+    time on both engines, and as one batch with reversi_batch.
+
+    Args:
+        count (int): Number of positions to evaluate.
+    """
+    import reversi_batch
+
+    for game in (Reversi(), BitboardReversi()):
+        positions = random_positions(game, count)
+        start_time = time.perf_counter()
+        scores = [game.evaluateHeuristicFunction(state) for state in positions]
+        elapsed = time.perf_counter() - start_time
+        print(f"{type(game).__name__:<16} one at a time: {count / elapsed:>12,.0f} positions/s")
+
+    boards = reversi_batch.board_array(positions)
+    players = [reversi_batch.player_sign(state.to_move) for state in positions]
+    start_time = time.perf_counter()
+    batch_scores = reversi_batch.evaluate_batch(boards, players)
+    elapsed = time.perf_counter() - start_time
+    assert list(batch_scores) == scores
+    print(f"{'batch':<16} one call:      {count / elapsed:>12,.0f} positions/s")
+
+
+def mcts_report(game, iterations, positions):
+    """
+    Compare mcts_player with the array-backed MCTSTree on random positions:
+    iterations per second, tree size and peak memory traced by tracemalloc.
+    Both use the same random seed per position, so they pick the same moves.
+
+    Args:
+        game: The game to search.
+        iterations (int): MCTS iterations per position.
+        positions (int): Number of positions to search.
+    """
+    states = random_positions(game, positions, seed=1)
+
+    def run_tree(state):
+        tree = MCTSTree(game, state)
+        for _ in range(iterations):
+            tree.iterate()
+        return tree.best_move(), tree.node_count()
+
+    def run(name, state):
+        if name == 'mcts_player':
+            mcts_player(game, state, iterations)
+            return 0
+        return run_tree(state)[1]
+
+    print(f"{'engine':<14}{'iterations/s':>14}{'nodes':>10}{'peak memory':>14}")
+    for name in ('mcts_player', 'MCTSTree'):
+        elapsed = peak = nodes = 0
+        for n, state in enumerate(states):
+            random.seed(n)
+            start_time = time.perf_counter()
+            nodes += run(name, state)
+            elapsed += time.perf_counter() - start_time
+
+            # Memory is measured in a second run, as tracing slows everything down
+            random.seed(n)
+            tracemalloc.start()
+            run(name, state)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        node_count = f"{nodes // len(states)}" if nodes else "-"
+        print(f"{name:<14}{iterations * len(states) / elapsed:>14,.0f}{node_count:>10}{peak / 2**20:>12.2f}MB")
+
+
+def memory_report(game, iterations, budgets):
+    """
+    Search the initial position for `iterations` iterations with MCTSTree
+    expanding all children at once, one child per visit, and each of those
+    within each node budget, and print the nodes held at the end and at
+    the peak, the node slots allocated, the memory of the tree's arrays
+    against the memory of the peak nodes, the time, and how often the
+    bounded trees recycled nodes and the share of the time that took.
+
+    Args:
+        game: The game to search.
+        iterations (int): MCTS iterations per search.
+        budgets: Node budgets of the bounded trees.
+    """
+    print(f"{'tree':<26}{'nodes':>8}{'peak':>8}{'slots':>8}{'memory':>10}{'peak mem':>10}{'time':>9}{'move':>9}"
+          f"{'recycles':>10}{'recycling':>11}")
+    trees = [('all children', {}), ('lazy', {'lazy_expansion': True})]
+    for max_nodes in budgets:
+        trees += [(f'all children, {max_nodes} max', {'max_nodes': max_nodes}),
+                  (f'lazy, {max_nodes} max', {'max_nodes': max_nodes, 'lazy_expansion': True})]
+    for name, options in trees:
+        random.seed(0)
+        start_time = time.perf_counter()
+        tree = MCTSTree(game, game.initial, **options)
+        tree.search(iterations)
+        elapsed = time.perf_counter() - start_time
+        print(f"{name:<26}{tree.node_count():>8}{tree.peak_nodes:>8}{len(tree.parent):>8}"
+              f"{tree.memory_bytes() / 2**10:>8.0f}KB{tree.peak_nodes * tree.node_bytes() / 2**10:>8.0f}KB"
+              f"{elapsed:>8.2f}s{str(tree.best_move()):>9}{tree.recycles:>10}{tree.recycle_time / elapsed:>10.1%}")
+
+
+def playout_report(count):
+    """
+    Time random playouts from the initial Reversi position on both engines,
+    through Game.result one move at a time and with the game's playout method.
+
+    Args:
+        count (int): Number of playouts per engine and method.
+    """
+    def result_playout(game, state):
+        while not game.terminal_test(state):
+            state = game.result(state, random.choice(game.actions(state)))
+        return game.utility(state, 'X')
+
+    for game in (Reversi(), BitboardReversi()):
+        for name, play in (('Game.result', result_playout), ('playout', lambda g, s: g.playout(s, 'X'))):
+            start_time = time.perf_counter()
+            for _ in range(count):
+                play(game, game.initial)
+            elapsed = time.perf_counter() - start_time
+            print(f"{type(game).__name__:<16}{name:<13}{count / elapsed:>10,.0f} playouts/s")
+
+
+def tictactoe_report(sizes, count, iterations):
+    """
+    Compare TicTacToe with CompactTicTacToe on boards of each size: random
+    playouts per second through Game.result and, on the compact engine,
+    with its playout method, then mcts_player iterations per second from the
+    empty board.
+
+    Args:
+        sizes: (h, v, k) boards to compare.
+        count (int): Number of playouts per engine and method.
+        iterations (int): MCTS iterations per engine.
+    """
+    def result_playout(game, state):
+        while not game.terminal_test(state):
+            state = game.result(state, random.choice(game.actions(state)))
+        return game.utility(state, 'X')
+
+    print(f"{'board':<12}{'engine':<18}{'result':>14}{'playout':>14}{'mcts_player':>18}")
+    for h, v, k in sizes:
+        for game in (TicTacToe(h, v, k), CompactTicTacToe(h, v, k)):
+            rates = []
+            methods = [result_playout] + ([lambda g, s: g.playout(s, 'X')] if hasattr(game, 'playout') else [])
+            for play in methods:
+                random.seed(0)
+                start_time = time.perf_counter()
+                for _ in range(count):
+                    play(game, game.initial)
+                rates.append(f"{count / (time.perf_counter() - start_time):>9,.0f}/s")
+            rates += ["-"] * (2 - len(rates))
+
+            random.seed(0)
+            start_time = time.perf_counter()
+            mcts_player(game, game.initial, iterations)
+            mcts_rate = iterations / (time.perf_counter() - start_time)
+            print(f"{f'{h}x{v}, k={k}':<12}{type(game).__name__:<18}{rates[0]:>14}{rates[1]:>14}{mcts_rate:>13,.0f} it/s")
+
+
+def head_to_head(game, new_player, new_opponent, games):
+    """
+    Play `games` games between two players, each playing first in half of them.
+
+    Args:
+        game: The game to play.
+        new_player: Function returning the player to test, called for each game.
+        new_opponent: Function returning its opponent, called for each game.
+        games (int): Number of games to play.
+
+    Returns:
+        tuple: {'wins', 'draws', 'losses'} of the player, and the per-move
+        records of Game.play_game for the player (key True) and the opponent (key False).
+    """
+    results = {'wins': 0, 'draws': 0, 'losses': 0}
+    records = {True: [], False: []}
+    for n in range(games):
+        random.seed(n)
+        players = [new_player(), new_opponent()]
+        player_first = n % 2 == 0
+        if not player_first:
+            players.reverse()
+        stats = []
+        utility = game.play_game(*players, stats=stats)[0]
+        utility = utility if player_first else -utility
+        results['wins' if utility > 0 else 'losses' if utility < 0 else 'draws'] += 1
+        for record in stats:
+            records[(record['player'] == 0) == player_first].append(record)
+    return results, records
+
+
+def reuse_report(game, iterations, games):
+    """
+    Play MCTSPlayer with tree reuse against MCTSPlayer without, at the same
+    iterations per move, each side playing first in half of the games, and
+    print the results with the average move time and reused visits.
+
+    Args:
+        game: The game to play.
+        iterations (int): MCTS iterations per move for both players.
+        games (int): Number of games to play.
+    """
+    results, records = head_to_head(game, lambda: MCTSPlayer(iterations, reuse=True),
+                                    lambda: MCTSPlayer(iterations, reuse=False), games)
+    print(f"with reuse against without, {iterations} iterations per move: "
+          f"{results['wins']} wins, {results['draws']} draws, {results['losses']} losses")
+    for uses_reuse in (True, False):
+        times = [record['move_time'] for record in records[uses_reuse]]
+        print(f"{'with' if uses_reuse else 'without'} reuse: {sum(times) / len(times):.4f}s per move")
+    reused = [record['reused_visits'] for record in records[True]]
+    print(f"visits reused per move: {sum(reused) / len(reused):.0f}")
+
+
+def rave_report(game, iterations, fraction, games):
+    """
+    Play MCTSPlayer with RAVE at `fraction` of the iterations against plain
+    UCB1 MCTSPlayer at `iterations`, each side playing first in half of the
+    games, and print the results with the average move time of each side.
+
+    Args:
+        game: The game to play.
+        iterations (int): MCTS iterations per move of the UCB1 player.
+        fraction (float): Share of those iterations the RAVE player gets.
+        games (int): Number of games to play.
+    """
+    rave_iterations = max(1, int(iterations * fraction))
+    results, records = head_to_head(game, lambda: MCTSPlayer(rave_iterations, reuse=False, rave=True),
+                                    lambda: MCTSPlayer(iterations, reuse=False), games)
+    print(f"RAVE at {rave_iterations} iterations against UCB1 at {iterations}: "
+          f"{results['wins']} wins, {results['draws']} draws, {results['losses']} losses")
+    for uses_rave in (True, False):
+        times = [record['move_time'] for record in records[uses_rave]]
+        print(f"{'RAVE' if uses_rave else 'UCB1'}: {sum(times) / len(times):.4f}s per move")
+
+
+def parallel_mcts_report(game, time_budget, games, workers):
+    """
+    Compare serial MCTS with root- and leaf-parallel MCTS at the same time
+    per move: iterations per second from the initial position, then the
+    results of games of each parallel mode against the serial search.
+
+    Args:
+        game: The game to play.
+        time_budget (float): Seconds per move for every player.
+        games (int): Number of games per parallel mode.
+        workers (int): Number of worker processes.
+    """
+    from parallel_mcts import root_parallel_mcts_player, leaf_parallel_mcts_player
+
+    modes = {
+        'serial': lambda: MCTSPlayer(None, reuse=False, time_budget=time_budget),
+        'root-parallel': lambda: lambda g, s: root_parallel_mcts_player(g, s, None, workers, time_budget),
+        'leaf-parallel': lambda: lambda g, s: leaf_parallel_mcts_player(g, s, None, workers, time_budget),
+    }
+    for name, new_player in modes.items():
+        info = new_player()(game, game.initial).info
+        print(f"{name:<14}{info['iterations'] / info['search_time']:>10,.0f} iterations/s")
+    for name in ('root-parallel', 'leaf-parallel'):
+        results, _ = head_to_head(game, modes[name], modes['serial'], games)
+        print(f"{name} against serial, {time_budget}s per move: "
+              f"{results['wins']} wins, {results['draws']} draws, {results['losses']} losses")
+
+
+def parallel_search_report(game, depth, workers):
+    """
+    Search each standard opening position to `depth` with the serial
+    AlphaBetaSearch and with parallel_root_search, and print the wall-clock
+    time and nodes of both, the speedup (serial time over parallel time), the
+    nodes searched by the parallel search per serial node, and the workers'
+    CPU utilization.
+
+    Args:
+        game: A Reversi engine.
+        depth (int): Plies to search.
+        workers (int): Number of worker processes.
+    """
+    from parallel_search import parallel_root_search
+
+    # Start the pool outside the timings
+    parallel_root_search(game, game.initial, depth=1, workers=workers)
+    print(f"{'opening':<14}{'serial':>9}{'nodes':>10}{'parallel':>10}{'nodes':>10}{'speedup':>9}{'overhead':>10}"
+          f"{'cpu/wall':>10}")
+    totals = [0, 0]
+    for name, moves in OPENINGS.items():
+        state = opening_state(game, moves)
+        player = game.to_move(state)
+        search = AlphaBetaSearch(game, player, depth=depth, evaluate=heuristic_evaluator(game, player),
+                                 ordering=MoveOrdering(game), in_place=True)
+        start_time = time.perf_counter()
+        move = search.best_move(state)
+        serial_time = time.perf_counter() - start_time
+        result = parallel_root_search(game, state, depth=depth, workers=workers)
+        assert result.move == move, f"{name}: the parallel search played {result.move}, the serial one {move}"
+        info = result.info
+        totals[0] += serial_time
+        totals[1] += info['search_time']
+        print(f"{name:<14}{serial_time:>8.2f}s{search.nodes:>10}{info['search_time']:>9.2f}s{info['nodes']:>10}"
+              f"{serial_time / info['search_time']:>8.2f}x{info['nodes'] / search.nodes:>9.2f}x"
+              f"{info['utilization']:>10.2f}")
+    print(f"total: {totals[0]:.2f}s serial, {totals[1]:.2f}s parallel ({totals[0] / totals[1]:.2f}x speedup)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search and simulation benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ordering_parser = subparsers.add_parser("ordering", help="nodes and cutoff rates with and without move ordering")
+    ordering_parser.add_argument("--depth", type=int, default=5, help="plies to search")
+    ordering_parser.add_argument("--engine", choices=["dict", "bitboard"], default="bitboard", help="Reversi engine")
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="per-state against batch heuristic evaluation")
+    evaluate_parser.add_argument("--positions", type=int, default=20000, help="number of positions to evaluate")
+
+    mcts_parser = subparsers.add_parser("mcts", help="speed and memory of mcts_player against the array-backed tree")
+    mcts_parser.add_argument("--iterations", type=int, default=2000, help="MCTS iterations per position")
+    mcts_parser.add_argument("--positions", type=int, default=5, help="number of positions to search")
+    mcts_parser.add_argument("--engine", choices=["dict", "bitboard"], default="bitboard", help="Reversi engine")
+
+    playout_parser = subparsers.add_parser("playout", help="random playouts per second with and without the playout kernel")
+    playout_parser.add_argument("--playouts", type=int, default=200, help="number of playouts per engine and method")
+
+    memory_parser = subparsers.add_parser("memory", help="MCTS tree size and memory with lazy expansion and a node budget")
+    memory_parser.add_argument("--iterations", type=int, default=5000, help="MCTS iterations per search")
+    memory_parser.add_argument("--max-nodes", type=int, nargs="+", default=[1000, 20000],
+                               help="node budgets of the bounded trees")
+
+    reuse_parser = subparsers.add_parser("reuse", help="MCTS with tree reuse against MCTS without")
+    reuse_parser.add_argument("--iterations", type=int, default=500, help="MCTS iterations per move")
+    reuse_parser.add_argument("--games", type=int, default=10, help="number of games to play")
+    reuse_parser.add_argument("--game", choices=["tictactoe", "reversi"], default="reversi", help="game to play")
+
+    rave_parser = subparsers.add_parser("rave", help="MCTS with RAVE at a fraction of the iterations against UCB1 MCTS")
+    rave_parser.add_argument("--iterations", type=int, default=400, help="MCTS iterations per move of the UCB1 player")
+    rave_parser.add_argument("--fraction", type=float, default=0.25, help="share of the iterations the RAVE player gets")
+    rave_parser.add_argument("--games", type=int, default=10, help="number of games to play")
+    rave_parser.add_argument("--game", choices=["tictactoe", "reversi"], default="reversi", help="game to play")
+
+    tictactoe_parser = subparsers.add_parser("tictactoe", help="TicTacToe against CompactTicTacToe over board sizes")
+    tictactoe_parser.add_argument("--count", type=int, default=200, help="playouts per engine and method")
+    tictactoe_parser.add_argument("--iterations", type=int, default=500, help="mcts_player iterations per engine")
+
+    parallel_parser = subparsers.add_parser("parallel-mcts", help="root- and leaf-parallel MCTS against serial MCTS")
+    parallel_parser.add_argument("--time", type=float, default=0.5, help="seconds per move")
+    parallel_parser.add_argument("--games", type=int, default=4, help="number of games per parallel mode")
+    parallel_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs)")
+
+    search_parser = subparsers.add_parser("parallel-search", help="speedup of the root-split search over the serial search")
+    search_parser.add_argument("--depth", type=int, default=5, help="plies to search")
+    search_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs)")
+
+    args = parser.parse_args()
+    if args.command == "ordering":
+        ordering_report(BitboardReversi() if args.engine == "bitboard" else Reversi(), args.depth)
+    elif args.command == "evaluate":
+        evaluation_report(args.positions)
+    elif args.command == "mcts":
+        mcts_report(BitboardReversi() if args.engine == "bitboard" else Reversi(), args.iterations, args.positions)
+    elif args.command == "playout":
+        playout_report(args.playouts)
+    elif args.command == "memory":
+        memory_report(BitboardReversi(), args.iterations, args.max_nodes)
+    elif args.command == "reuse":
+        reuse_report(BitboardReversi() if args.game == "reversi" else TicTacToe(), args.iterations, args.games)
+    elif args.command == "rave":
+        rave_report(BitboardReversi() if args.game == "reversi" else TicTacToe(), args.iterations, args.fraction,
+                    args.games)
+    elif args.command == "tictactoe":
+        tictactoe_report([(3, 3, 3), (7, 7, 4), (11, 11, 5), (15, 15, 5)], args.count, args.iterations)
+    elif args.command == "parallel-mcts":
+        parallel_mcts_report(BitboardReversi(), args.time, args.games, args.workers)
+    elif args.command == "parallel-search":
+        parallel_search_report(BitboardReversi(), args.depth, args.workers)
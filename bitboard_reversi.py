@@ -0,0 +1,441 @@
+import argparse
+import copy
+import random
+from collections import namedtuple
+from game import Game, MutableState
+from reversi import Reversi, GameState
+from zobrist import ZobristKeys
+
+# Square (x, y) lives on bit x * 8 + y, so walking the set bits from the least
+# significant upwards yields moves in the same order as Reversi.getValidMoves.
+FULL = 0xFFFFFFFFFFFFFFFF
+INNER = 0x7E7E7E7E7E7E7E7E  # every square except those with y == 0 or y == 7
+
+# The four lines through a square are walked both ways (<< and >>) by shifting:
+# 1 along y, 8 along x and 7 and 9 along the diagonals. Runs of discs are only
+# followed through the opponent's discs allowed by the line's mask: the shifts
+# that change y keep to the inner rows, so a run cannot wrap around from one
+# edge of the board to the other.
+def line_masks(opp):
+    """Return (shift amount, squares a run may cross) for each line, given the opponent's discs."""
+    inner = opp & INNER
+    return ((1, inner), (7, inner), (8, opp), (9, inner))
+
+
+SQUARES = [(x, y) for x in range(8) for y in range(8)]
+SQUARE_BITS = {square: 1 << index for index, square in enumerate(SQUARES)}
+
+# The corner sets used by Reversi.cornersCaptured and Reversi.cornerProximity, as
+# bitboards. Those sets are written 1-indexed, so only the squares that land on
+# the 0-indexed board can ever hold a disc and the rest are dropped here.
+CAPTURED_CORNERS = sum(SQUARE_BITS.get(c, 0) for c in [(1, 1), (1, 8), (8, 1), (8, 8)])
+CORNER_NEIGHBOURS = [
+    (SQUARE_BITS.get(corner, 0), sum(SQUARE_BITS.get(n, 0) for n in neighbours))
+    for corner, neighbours in [
+        ((1, 1), [(1, 2), (2, 1), (2, 2)]),
+        ((1, 8), [(1, 7), (2, 7), (2, 8)]),
+        ((8, 1), [(7, 1), (7, 2), (8, 2)]),
+        ((8, 8), [(7, 7), (7, 8), (8, 7)]),
+    ]
+]
+
+BitboardState = namedtuple('BitboardState', 'to_move, utility, xdiscs, odiscs, moves, zobrist')
+
+
+def valid_move_bits(own, opp):
+    """Return a bitboard of every empty square where the owner of `own` may play."""
+    empty = ~(own | opp) & FULL
+    moves = 0
+    # Fill from `own` through the opponent's discs in 1, 2 and 4 steps at a time
+    for amount, run_mask in line_masks(opp):
+        double, quadruple = amount * 2, amount * 4
+
+        fill, through = own, run_mask
+        fill |= through & (fill << amount)
+        through &= through << amount
+        fill |= through & (fill << double)
+        through &= through << double
+        fill |= through & (fill << quadruple)
+        moves |= (fill & run_mask) << amount
+
+        fill, through = own, run_mask
+        fill |= through & (fill >> amount)
+        through &= through >> amount
+        fill |= through & (fill >> double)
+        through &= through >> double
+        fill |= through & (fill >> quadruple)
+        moves |= (fill & run_mask) >> amount
+    return moves & empty
+
+
+def flip_bits(own, opp, move_bit):
+    """Return the bitboard of discs flipped when the owner of `own` plays on `move_bit`."""
+    flips = 0
+    for amount, run_mask in line_masks(opp):
+        line = 0
+        square = (move_bit << amount) & run_mask
+        while square:
+            line |= square
+            end = square << amount
+            square = end & run_mask
+        if line and end & own:
+            flips |= line
+
+        line = 0
+        square = (move_bit >> amount) & run_mask
+        while square:
+            line |= square
+            end = square >> amount
+            square = end & run_mask
+        if line and end & own:
+            flips |= line
+    return flips
+
+
+def bits_to_moves(bits):
+    """Convert a bitboard of squares to a list of (x, y) moves in scan order."""
+    moves = []
+    while bits:
+        low = bits & -bits
+        index = low.bit_length() - 1
+        moves.append((index >> 3, index & 7))
+        bits ^= low
+    return moves
+
+
+def random_playout(own, opp, played=None):
+    """
+    Play uniformly random moves from a position, with the owner of `own` to
+    move, until the player to move has none, and return the result for the
+    player who was to move at the start: 1 for a win, -1 for a loss, 0
+    otherwise. There are no passes, so, as in Reversi.compute_utility, the
+    game is only decided if the player who moved last has no move either.
+
+    Moves are drawn with random.randrange over the moves in scan order, the
+    same draw random.choice(state.moves) makes, so a seeded playout follows
+    the same game as a rollout through Game.result. If `played` is a list,
+    the bit index (x * 8 + y) of each move is appended to it.
+    """
+    randrange = random.randrange
+    sign = 1  # 1 while `own` belongs to the player to move at the start
+    while True:
+        moves = valid_move_bits(own, opp)
+        if not moves:
+            break
+        for _ in range(randrange(moves.bit_count())):
+            moves &= moves - 1
+        move_bit = moves & -moves
+        if played is not None:
+            played.append(move_bit.bit_length() - 1)
+        flips = flip_bits(own, opp, move_bit)
+        own, opp = opp ^ flips, own | move_bit | flips
+        sign = -sign
+
+    if valid_move_bits(opp, own):
+        return 0
+    difference = own.bit_count() - opp.bit_count()
+    return sign * ((difference > 0) - (difference < 0))
+
+
+class BitboardReversi(Game):
+    """Reversi with the same rules and interface as `Reversi`, but a state
+    holds the discs of each player as a 64-bit integer instead of a dict.
+    Move generation and flipping are done with shift-and-mask operations,
+    which makes it a drop-in replacement for the dict board in searches."""
+
+    def __init__(self):
+        """
+        Initialize a new game with the standard starting position, 'X' to move.
+        """
+        xdiscs = SQUARE_BITS[(3, 3)] | SQUARE_BITS[(4, 4)]
+        odiscs = SQUARE_BITS[(3, 4)] | SQUARE_BITS[(4, 3)]
+        moves = bits_to_moves(valid_move_bits(xdiscs, odiscs))
+
+        # Same keys as the dict engine, so a position hashes the same in both
+        self.zobrist_keys = ZobristKeys(SQUARES)
+        self.zobrist_columns = self.zobrist_column_tables()
+        zobrist = self.zobrist_keys.hash_board({(3, 3): 'X', (4, 4): 'X', (3, 4): 'O', (4, 3): 'O'}, 'X')
+        self.initial = BitboardState(to_move='X', utility=0, xdiscs=xdiscs, odiscs=odiscs, moves=moves,
+                                     zobrist=zobrist)
+
+        # Evaluation reuses the dict engine's weights so both engines agree on every score
+        self.weights_matrix = Reversi.weighted_matrix(self)
+        self.column_weights = self.column_weight_tables()
+
+    def actions(self, state):
+        """Legal moves are the squares that flip at least one disc."""
+        return state.moves
+
+    def result(self, state, move):
+        """Apply a move, flip the captured discs and return the new state with the next player's turn."""
+        if move not in state.moves:
+            return state  # Illegal move has no effect
+        move_bit = SQUARE_BITS[move]
+        if state.to_move == 'X':
+            flips = flip_bits(state.xdiscs, state.odiscs, move_bit)
+            xdiscs = state.xdiscs | move_bit | flips
+            odiscs = state.odiscs ^ flips
+            own, opp = xdiscs, odiscs
+        else:
+            flips = flip_bits(state.odiscs, state.xdiscs, move_bit)
+            odiscs = state.odiscs | move_bit | flips
+            xdiscs = state.xdiscs ^ flips
+            own, opp = odiscs, xdiscs
+        moves = bits_to_moves(valid_move_bits(opp, own))
+        return BitboardState(to_move=('O' if state.to_move == 'X' else 'X'),
+                             utility=self.compute_utility(own, opp, xdiscs, odiscs),
+                             xdiscs=xdiscs, odiscs=odiscs, moves=moves,
+                             zobrist=self.update_zobrist(state.zobrist, move, flips, state.to_move))
+
+    def utility(self, state, player):
+        """Return the value to player; 1 for win, -1 for loss, 0 otherwise."""
+        return state.utility if player == 'X' else -state.utility
+
+    def mutable_state(self, state):
+        """Return a copy of state for make_move and unmake_move."""
+        return MutableState(**state._asdict())
+
+    def make_move(self, state, move):
+        """Play a legal move on a mutable state in place and return what unmake_move needs to take it back."""
+        undo = (state.xdiscs, state.odiscs, state.moves, state.utility, state.zobrist)
+        move_bit = SQUARE_BITS[move]
+        if state.to_move == 'X':
+            flips = flip_bits(state.xdiscs, state.odiscs, move_bit)
+            state.xdiscs |= move_bit | flips
+            state.odiscs ^= flips
+            own, opp = state.xdiscs, state.odiscs
+        else:
+            flips = flip_bits(state.odiscs, state.xdiscs, move_bit)
+            state.odiscs |= move_bit | flips
+            state.xdiscs ^= flips
+            own, opp = state.odiscs, state.xdiscs
+        state.zobrist = self.update_zobrist(state.zobrist, move, flips, state.to_move)
+        state.moves = bits_to_moves(valid_move_bits(opp, own))
+        state.utility = self.compute_utility(own, opp, state.xdiscs, state.odiscs)
+        state.to_move = 'O' if state.to_move == 'X' else 'X'
+        return undo
+
+    def unmake_move(self, state, undo):
+        """Take back a move played by make_move."""
+        state.xdiscs, state.odiscs, state.moves, state.utility, state.zobrist = undo
+        state.to_move = 'O' if state.to_move == 'X' else 'X'
+
+    def terminal_test(self, state):
+        """A state is terminal if the player to move has no valid moves."""
+        return not state.moves
+
+    def playout(self, state, player, played=None):
+        """Play random moves from `state` to the end on bitboards and return the utility for `player`.
+        If `played` is a list, the moves played are appended to it."""
+        indices = [] if played is not None else None
+        if state.to_move == 'X':
+            value = random_playout(state.xdiscs, state.odiscs, indices)
+        else:
+            value = random_playout(state.odiscs, state.xdiscs, indices)
+        if played is not None:
+            played.extend(SQUARES[index] for index in indices)
+        return value if player == state.to_move else -value
+
+    def display(self, state):
+        """Print the board through the dict engine's display."""
+        Reversi.display(self, self.to_board_state(state))
+
+    def compute_utility(self, own, opp, xdiscs, odiscs):
+        """Mirror Reversi.compute_utility: the game is scored only once the player who moved has no move left."""
+        if valid_move_bits(own, opp):
+            return 0
+        xscore, oscore = xdiscs.bit_count(), odiscs.bit_count()
+        if xscore > oscore:
+            return 1
+        elif xscore == oscore:
+            return 0
+        else:
+            return -1
+
+    def to_board_state(self, state):
+        """Return the equivalent state of the dict-based `Reversi` engine."""
+        board = {}
+        for square, bit in SQUARE_BITS.items():
+            if state.xdiscs & bit:
+                board[square] = 'X'
+            elif state.odiscs & bit:
+                board[square] = 'O'
+        return GameState(to_move=state.to_move, utility=state.utility, board=board, moves=list(state.moves),
+                         zobrist=state.zobrist)
+
+    def update_zobrist(self, zobrist, move, flips, player):
+        """Return the hash after `player` plays `move` and flips the discs in `flips`."""
+        zobrist = self.zobrist_keys.place(zobrist, move, player)
+        own = self.zobrist_columns[player]
+        opp = self.zobrist_columns['O' if player == 'X' else 'X']
+        x = 0
+        while flips:
+            column = flips & 0xFF
+            if column:
+                zobrist ^= own[x][column] ^ opp[x][column]
+            flips >>= 8
+            x += 1
+        return zobrist
+
+    def zobrist_column_tables(self):
+        """Precompute, per player and column x, the XOR of the Zobrist keys of every 8-bit disc pattern in that column."""
+        tables = {}
+        for player, keys in self.zobrist_keys.keys.items():
+            tables[player] = []
+            for x in range(8):
+                table = [0] * 256
+                for pattern in range(1, 256):
+                    low = pattern & -pattern
+                    table[pattern] = table[pattern ^ low] ^ keys[(x, low.bit_length() - 1)]
+                tables[player].append(table)
+        return tables
+
+    def column_weight_tables(self):
+        """Precompute, for each column x, the summed stability weight of every 8-bit disc pattern in that column."""
+        tables = []
+        for x in range(8):
+            table = [0] * 256
+            for pattern in range(256):
+                table[pattern] = sum(self.weights_matrix[y][x] for y in range(8) if pattern >> y & 1)
+            tables.append(table)
+        return tables
+
+    def evaluateHeuristicFunction(self, state, player=None):
+        """Calculate the same heuristic score as Reversi.evaluateHeuristicFunction, from the point of view of player (by default the player to move)."""
+        weight_parity = 10
+        weight_corners_captured = 801.724
+        weight_corners_proximity = 382.026
+        weight_mobility = 78.922
+        weight_stability = 10
+
+        if (player or state.to_move) == 'X':
+            own, opp = state.xdiscs, state.odiscs
+        else:
+            own, opp = state.odiscs, state.xdiscs
+
+        total_score = weight_parity * self.coinParity(own, opp) + weight_corners_captured * self.cornersCaptured(own, opp) + weight_corners_proximity * self.cornerProximity(own, opp) + weight_mobility * self.mobility(own, opp) + weight_stability * self.stability(own, opp)
+        return total_score
+
+    def evaluateHeuristicBatch(self, boards, players):
+        """Score many boards, given as an (N, 8, 8) int8 array, in one vectorized pass; see reversi_batch.evaluate_batch."""
+        import reversi_batch
+        return reversi_batch.evaluate_batch(boards, players)
+
+    def evaluate_leaves(self, states, player):
+        """Value many leaf states of a search at once: the utility to player if terminal, the heuristic from player's side otherwise."""
+        import reversi_batch
+        to_move = [reversi_batch.player_sign(state.to_move) for state in states]
+        return reversi_batch.leaf_values(reversi_batch.board_array(states), to_move, player)
+
+    def batch_rollout(self, states, n):
+        """Play n random games to the end from each state in one vectorized computation, and return a
+        (len(states), n) array of the final utilities for 'X'; see reversi_batch.batch_rollout."""
+        import reversi_batch
+        return reversi_batch.batch_rollout(states, n)
+
+    def coinParity(self, own, opp):
+        """Score the relative difference in the number of discs, regardless of who leads."""
+        own_coins, opp_coins = own.bit_count(), opp.bit_count()
+        if own_coins > opp_coins:
+            return 100 * own_coins / (own_coins + opp_coins)
+        elif opp_coins > own_coins:
+            return 100 * opp_coins / (own_coins + opp_coins)
+        return 0
+
+    def mobility(self, own, opp):
+        """Score the relative difference in the number of valid moves, regardless of who leads."""
+        own_moves = valid_move_bits(own, opp).bit_count()
+        opp_moves = valid_move_bits(opp, own).bit_count()
+        if own_moves > opp_moves:
+            return 100 * own_moves / (own_moves + opp_moves)
+        elif opp_moves > own_moves:
+            return 100 * opp_moves / (own_moves + opp_moves)
+        return 0
+
+    def cornersCaptured(self, own, opp):
+        """Score the corners held by the player against those held by the opponent."""
+        return 25 * ((own & CAPTURED_CORNERS).bit_count() - (opp & CAPTURED_CORNERS).bit_count())
+
+    def stability(self, own, opp):
+        """Score the discs of both players with the weights matrix, one column (byte) at a time."""
+        score = 0
+        for x, table in enumerate(self.column_weights):
+            score += table[(own >> (x * 8)) & 0xFF] - table[(opp >> (x * 8)) & 0xFF]
+        return score
+
+    def cornerProximity(self, own, opp):
+        """Penalise discs next to corners that are still empty."""
+        occupied = own | opp
+        xscore = 0
+        oscore = 0
+        for corner, neighbours in CORNER_NEIGHBOURS:
+            if not corner & occupied:
+                xscore += (own & neighbours).bit_count()
+                oscore += (opp & neighbours).bit_count()
+        return -12.5 * (xscore - oscore)
+
+
+def position_fields(state):
+    """Return the fields of a state of either engine as a dict, for comparisons."""
+    fields = ['to_move', 'utility', 'moves', 'zobrist']
+    fields += ['board'] if hasattr(state, 'board') else ['xdiscs', 'odiscs']
+    return {field: getattr(state, field) for field in fields}
+
+
+def cross_check(num_games=100, seed=None):
+    """
+    Play random games on `Reversi` and `BitboardReversi` side by side and assert
+    that both engines agree on every move list, utility, terminal test, hash
+    and heuristic score along the way, and that make_move and unmake_move
+    agree with result on both.
+
+    Args:
+        num_games (int): The number of random games to play.
+        seed: Optional seed for the random move choices.
+
+    Returns:
+        int: The total number of positions compared.
+    """
+    rng = random.Random(seed)
+    reference = Reversi()
+    bitboard = BitboardReversi()
+    positions = 0
+
+    for _ in range(num_games):
+        state, bstate = reference.initial, bitboard.initial
+        mutable_state, mutable_bstate = reference.mutable_state(state), bitboard.mutable_state(bstate)
+        while True:
+            positions += 1
+            assert bitboard.actions(bstate) == reference.actions(state), (state, bstate)
+            assert bitboard.to_board_state(bstate).board == state.board, (state, bstate)
+            assert bitboard.to_move(bstate) == reference.to_move(state)
+            assert bstate.zobrist == state.zobrist == reference.zobrist_keys.hash_board(state.board, state.to_move)
+            assert bitboard.terminal_test(bstate) == reference.terminal_test(state)
+            for player in ('X', 'O'):
+                assert bitboard.utility(bstate, player) == reference.utility(state, player)
+            for player in (None, 'X', 'O'):
+                assert bitboard.evaluateHeuristicFunction(bstate, player) == reference.evaluateHeuristicFunction(state, player)
+            if reference.terminal_test(state):
+                break
+            move = rng.choice(reference.actions(state))
+            state, bstate = reference.result(state, move), bitboard.result(bstate, move)
+
+            # Playing the move in place must agree with result, and taking it back must restore the position
+            for game, mutable, after in ((reference, mutable_state, state), (bitboard, mutable_bstate, bstate)):
+                before = copy.deepcopy(position_fields(mutable))
+                undo = game.make_move(mutable, move)
+                assert position_fields(mutable) == position_fields(after), (mutable, after)
+                game.unmake_move(mutable, undo)
+                assert position_fields(mutable) == before
+                game.make_move(mutable, move)
+    return positions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-check BitboardReversi against the dict-based Reversi engine.")
+    parser.add_argument("--games", type=int, default=100, help="number of random games to play")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random move choices")
+    args = parser.parse_args()
+
+    positions = cross_check(args.games, args.seed)
+    print(f"{args.games} games, {positions} positions: both engines agree")
@@ -0,0 +1,234 @@
+import argparse
+import copy
+import random
+from array import array
+from collections import namedtuple
+from game import Game, MutableState
+from tictactoe import TicTacToe
+from zobrist import ZobristKeys
+
+# Bytes of the board: 0 for an empty square, then one per player
+PIECES = {'X': 1, 'O': 2}
+
+
+class CompactState(namedtuple('CompactState', 'to_move, utility, board, moves, zobrist, counts, positions')):
+    """A CompactTicTacToe position. result builds a new state and make_move
+    only changes the copies made by mutable_state, so a state is never
+    changed in place, and copy.deepcopy (as mcts_player does per node) can
+    return the state itself instead of copying the board and move list."""
+
+    __slots__ = ()
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class CompactTicTacToe(Game):
+    """TicTacToe on an h x v board with k in a row to win, with the same
+    rules, moves and interface as `TicTacToe`, for large boards such as
+    15 x 15 with k = 5 (gomoku).
+
+    A state holds the board as a flat bytearray, one byte per square, and
+    the empty squares as the `moves` list together with `positions`, the
+    index of each square in that list, so a move is taken out of the list
+    by swapping it with the last one instead of a list.remove. Every run of
+    k squares in a row, column or diagonal (a window) has a counter per
+    player of the discs in it: a move adds one to the counters of the
+    windows through its square, and wins when one of them reaches k. So a
+    move costs about 4k counter updates, however large the board, and the
+    moves are listed in a different order than TicTacToe lists them."""
+
+    def __init__(self, h=3, v=3, k=3):
+        self.h = h
+        self.v = v
+        self.k = k
+        self.squares = [(x, y) for x in range(1, h + 1) for y in range(1, v + 1)]
+        self.cells = {square: cell for cell, square in enumerate(self.squares)}
+
+        # The windows through each square, as indices into the counters
+        windows = []
+        for x, y in self.squares:
+            for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                if 1 <= x + dx * (k - 1) <= h and 1 <= y + dy * (k - 1) <= v:
+                    windows.append([self.cells[(x + dx * i, y + dy * i)] for i in range(k)])
+        self.window_count = len(windows)
+        self.cell_windows = [[] for _ in self.squares]
+        for w, cells in enumerate(windows):
+            for cell in cells:
+                self.cell_windows[cell].append(w)
+
+        # Same keys as TicTacToe, so a position hashes the same in both
+        self.zobrist_keys = ZobristKeys(self.squares)
+        self.initial = CompactState(to_move='X', utility=0, board=bytearray(len(self.squares)),
+                                    moves=list(self.squares), zobrist=0,
+                                    counts=bytearray(2 * self.window_count),
+                                    positions=array('H', range(len(self.squares))))
+
+    def actions(self, state):
+        """Legal moves are any square not yet taken."""
+        return state.moves
+
+    def result(self, state, move):
+        cell = self.cells.get(move)
+        if cell is None or state.board[cell]:
+            return state  # Illegal move has no effect
+        board = bytearray(state.board)
+        counts = bytearray(state.counts)
+        moves = list(state.moves)
+        positions = array('H', state.positions)
+        board[cell] = PIECES[state.to_move]
+        utility = self.add_disc(counts, cell, state.to_move)
+        self.remove_move(moves, positions, cell)
+        return CompactState(to_move=('O' if state.to_move == 'X' else 'X'), utility=utility, board=board,
+                            moves=moves, zobrist=self.zobrist_keys.place(state.zobrist, move, state.to_move),
+                            counts=counts, positions=positions)
+
+    def utility(self, state, player):
+        """Return the value to player; 1 for win, -1 for loss, 0 otherwise."""
+        return state.utility if player == 'X' else -state.utility
+
+    def terminal_test(self, state):
+        """A state is terminal if it is won or there are no empty squares."""
+        return state.utility != 0 or len(state.moves) == 0
+
+    def mutable_state(self, state):
+        """Return a copy of state, with its own board, counters and moves, for make_move and unmake_move."""
+        return MutableState(to_move=state.to_move, utility=state.utility, board=bytearray(state.board),
+                            moves=list(state.moves), zobrist=state.zobrist, counts=bytearray(state.counts),
+                            positions=array('H', state.positions))
+
+    def make_move(self, state, move):
+        """Play a legal move on a mutable state in place and return what unmake_move needs to take it back."""
+        cell = self.cells[move]
+        player = state.to_move
+        undo = (move, state.positions[cell], state.utility, state.zobrist)
+        state.board[cell] = PIECES[player]
+        state.utility = self.add_disc(state.counts, cell, player)
+        self.remove_move(state.moves, state.positions, cell)
+        state.zobrist = self.zobrist_keys.place(state.zobrist, move, player)
+        state.to_move = 'O' if player == 'X' else 'X'
+        return undo
+
+    def unmake_move(self, state, undo):
+        """Take back a move played by make_move."""
+        move, index, state.utility, state.zobrist = undo
+        cell = self.cells[move]
+        state.to_move = 'O' if state.to_move == 'X' else 'X'
+        state.board[cell] = 0
+        offset = 0 if state.to_move == 'X' else self.window_count
+        for w in self.cell_windows[cell]:
+            state.counts[offset + w] -= 1
+        # Undo the swap: the move goes back to its index and the square that took its place to the end
+        moves, positions = state.moves, state.positions
+        if index < len(moves):
+            moves.append(moves[index])
+            positions[self.cells[moves[index]]] = len(moves) - 1
+            moves[index] = move
+        else:
+            moves.append(move)
+        positions[cell] = index
+
+    def add_disc(self, counts, cell, player):
+        """Count a disc of player's on cell in the window counters, and return the utility after it."""
+        offset = 0 if player == 'X' else self.window_count
+        k = self.k
+        won = False
+        for w in self.cell_windows[cell]:
+            counts[offset + w] += 1
+            if counts[offset + w] == k:
+                won = True
+        if won:
+            return +1 if player == 'X' else -1
+        return 0
+
+    def remove_move(self, moves, positions, cell):
+        """Take the square `cell` out of the moves list by moving the last move into its place."""
+        index = positions[cell]
+        last = moves.pop()
+        if index < len(moves):
+            moves[index] = last
+            positions[self.cells[last]] = index
+
+    def playout(self, state, player, played=None):
+        """Play random moves from `state` to the end on one copy of the board and counters, and return
+        the utility for `player`. It draws the same moves as a seeded rollout through result.
+        If `played` is a list, the moves played are appended to it."""
+        utility = state.utility
+        moves = list(state.moves)
+        positions = array('H', state.positions)
+        counts = bytearray(state.counts)
+        to_move = state.to_move
+        randrange = random.randrange
+        cells = self.cells
+        while utility == 0 and moves:
+            move = moves[randrange(len(moves))]
+            if played is not None:
+                played.append(move)
+            cell = cells[move]
+            utility = self.add_disc(counts, cell, to_move)
+            self.remove_move(moves, positions, cell)
+            to_move = 'O' if to_move == 'X' else 'X'
+        return utility if player == 'X' else -utility
+
+    def display(self, state):
+        print("  " + " ".join(str(y % 10) for y in range(1, self.v + 1)))
+        for x in range(1, self.h + 1):
+            print(x % 10, end=' ')
+            for y in range(1, self.v + 1):
+                print('.XO'[state.board[self.cells[(x, y)]]], end=' ')
+            print()
+
+    def to_board(self, state):
+        """Return the board as TicTacToe's {(x, y): player} dict."""
+        return {square: 'XO'[piece - 1] for square, piece in zip(self.squares, state.board) if piece}
+
+
+def cross_check(h, v, k, num_games=100, seed=None):
+    """
+    Play random games on `TicTacToe` and `CompactTicTacToe` side by side and
+    assert that both engines agree on the board, the set of moves, the
+    utility, the terminal test and the hash along the way, and that
+    make_move and unmake_move agree with result.
+
+    Returns:
+        int: The total number of positions compared.
+    """
+    rng = random.Random(seed)
+    reference = TicTacToe(h, v, k)
+    compact = CompactTicTacToe(h, v, k)
+    positions = 0
+
+    for _ in range(num_games):
+        state, cstate = reference.initial, compact.initial
+        mutable = compact.mutable_state(cstate)
+        while True:
+            positions += 1
+            assert compact.to_board(cstate) == state.board
+            assert sorted(compact.actions(cstate)) == sorted(reference.actions(state))
+            assert all(cstate.moves[cstate.positions[compact.cells[move]]] == move for move in cstate.moves)
+            assert cstate.zobrist == state.zobrist
+            assert compact.terminal_test(cstate) == reference.terminal_test(state)
+            assert compact.utility(cstate, 'X') == reference.utility(state, 'X')
+            if reference.terminal_test(state):
+                break
+            move = rng.choice(reference.actions(state))
+            state, cstate = reference.result(state, move), compact.result(cstate, move)
+
+            before = copy.deepcopy(mutable.__dict__)
+            undo = compact.make_move(mutable, move)
+            assert mutable.__dict__ == cstate._asdict()
+            compact.unmake_move(mutable, undo)
+            assert mutable.__dict__ == before
+            compact.make_move(mutable, move)
+    return positions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-check CompactTicTacToe against TicTacToe.")
+    parser.add_argument("--games", type=int, default=100, help="number of random games per board")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random move choices")
+    args = parser.parse_args()
+
+    for h, v, k in ((3, 3, 3), (4, 4, 3), (5, 7, 4), (15, 15, 5)):
+        positions = cross_check(h, v, k, args.games, args.seed)
+        print(f"TicTacToe({h}, {v}, {k}): {args.games} games, {positions} positions: both engines agree")
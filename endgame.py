@@ -0,0 +1,265 @@
+import argparse
+import random
+import time
+from bitboard_reversi import BitboardReversi, valid_move_bits, flip_bits, SQUARES, SQUARE_BITS
+from game import SearchResult
+from reversi import Reversi
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+# The four quadrants of the board (x < 4 or not, y < 4 or not) as bitboards.
+# Near the end of the game the last move into a region is usually worth more
+# than the others, so moves into regions with an odd number of empty squares
+# are tried first (parity ordering).
+QUADRANTS = (0x000000000F0F0F0F, 0x00000000F0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000)
+
+# Below this many empty squares moves are ordered by parity alone; above it by
+# the opponent's mobility after the move (fastest first), then parity.
+FASTEST_FIRST_EMPTIES = 7
+
+# Below this many empty squares positions are not stored in the table, as
+# searching them again costs less than looking them up.
+TABLE_EMPTIES = 6
+
+# Default number of empty squares at or below which the players solve exactly
+ENDGAME_EMPTIES = 12
+
+
+class EndgameSolver:
+    """Exact negamax search of Reversi endgames on bitboards.
+
+    Scores are the final disc difference from the point of view of the
+    player to move. As in Reversi.compute_utility there are no passes: a
+    player without a move ends the game, and the result only counts (is
+    the disc difference rather than 0) if the player who moved last has no
+    move either. Positions are kept in a TranspositionTable keyed by the
+    pair of bitboards, with the player to move first."""
+
+    def __init__(self, table=None):
+        """
+        Set up a solver.
+
+        Args:
+            table: A TranspositionTable to reuse; a new one is created if None.
+        """
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0
+
+    def solve(self, own, opp, alpha=-64, beta=64):
+        """Return the exact score of the position, or a bound on it when it falls outside (alpha, beta)."""
+        self.table.new_search()
+        return self.negamax(own, opp, alpha, beta, 64 - (own | opp).bit_count())
+
+    def best_move(self, own, opp):
+        """Return the best move's bit index (None if there is no move) and the exact score of the position."""
+        self.table.new_search()
+        empties = 64 - (own | opp).bit_count()
+        moves = valid_move_bits(own, opp)
+        if not moves:
+            return None, self.negamax(own, opp, -64, 64, empties)
+        best_index, alpha = None, -65
+        for move_bit, child_own, child_opp in self.ordered_children(own, opp, moves, empties, None):
+            v = -self.negamax(child_own, child_opp, -64, -alpha, empties - 1)
+            if v > alpha:
+                best_index, alpha = move_bit.bit_length() - 1, v
+        self.table.store(hash((own, opp)), empties, alpha, EXACT, best_index)
+        return best_index, alpha
+
+    def ordered_children(self, own, opp, moves, empties, tt_index):
+        """Return (move bit, opponent's discs, own discs) after each move, in the order to search them."""
+        empty = ~(own | opp) & 0xFFFFFFFFFFFFFFFF
+        odd = 0
+        for quadrant in QUADRANTS:
+            if (empty & quadrant).bit_count() & 1:
+                odd |= quadrant
+
+        children = []
+        while moves:
+            move_bit = moves & -moves
+            moves ^= move_bit
+            flips = flip_bits(own, opp, move_bit)
+            child_own, child_opp = opp ^ flips, own | move_bit | flips
+            if move_bit.bit_length() - 1 == tt_index:
+                priority = -1  # The stored best move first
+            elif empties > FASTEST_FIRST_EMPTIES:
+                priority = 2 * valid_move_bits(child_own, child_opp).bit_count() + (not move_bit & odd)
+            else:
+                priority = not move_bit & odd
+            children.append((priority, move_bit, child_own, child_opp))
+        children.sort(key=lambda child: child[0])  # Stable, so equal moves keep scan order
+        return [child[1:] for child in children]
+
+    def negamax(self, own, opp, alpha, beta, empties):
+        """Return the score of the position for the owner of `own`, who is to move."""
+        self.nodes += 1
+        moves = valid_move_bits(own, opp)
+        if not moves:
+            if valid_move_bits(opp, own):
+                return 0  # The game ends undecided, as in Reversi.compute_utility
+            return own.bit_count() - opp.bit_count()
+
+        if empties == 1:  # The only move fills the board, which ends the game
+            flips = flip_bits(own, opp, moves)
+            self.nodes += 1
+            return own.bit_count() - opp.bit_count() + 2 * flips.bit_count() + 1
+
+        key = tt_index = None
+        if empties >= TABLE_EMPTIES:
+            key = hash((own, opp))
+            entry = self.table.lookup(key)
+            if entry is not None:
+                if entry.flag == EXACT:
+                    return entry.value
+                if entry.flag == LOWER and entry.value > alpha:
+                    alpha = entry.value
+                elif entry.flag == UPPER and entry.value < beta:
+                    beta = entry.value
+                if alpha >= beta:
+                    return entry.value
+                tt_index = entry.move
+
+        original_alpha = alpha
+        best, best_index = -65, None
+        for move_bit, child_own, child_opp in self.ordered_children(own, opp, moves, empties, tt_index):
+            v = -self.negamax(child_own, child_opp, -beta, -alpha, empties - 1)
+            if v > best:
+                best, best_index = v, move_bit.bit_length() - 1
+                if v > alpha:
+                    alpha = v
+                    if alpha >= beta:
+                        break
+
+        if key is not None:
+            flag = LOWER if best >= beta else UPPER if best <= original_alpha else EXACT
+            self.table.store(key, empties, best, flag, best_index)
+        return best
+
+
+def position_bits(game, state):
+    """Return the discs of the player to move and of the opponent as bitboards, or None if `game` is not Reversi."""
+    if isinstance(game, BitboardReversi):
+        xdiscs, odiscs = state.xdiscs, state.odiscs
+    elif isinstance(game, Reversi):
+        xdiscs = sum(SQUARE_BITS[square] for square, player in state.board.items() if player == 'X')
+        odiscs = sum(SQUARE_BITS[square] for square, player in state.board.items() if player == 'O')
+    else:
+        return None
+    return (xdiscs, odiscs) if state.to_move == 'X' else (odiscs, xdiscs)
+
+
+def solve_endgame(game, state, table=None):
+    """
+    Solve a Reversi position exactly, with either engine.
+
+    Args:
+        game: A Reversi or BitboardReversi game.
+        state: The position to solve.
+        table: A TranspositionTable to reuse across the moves of one player.
+
+    Returns:
+        SearchResult: The best move, with the exact final disc difference for
+        the player to move ('score'), the empty squares, node count and time
+        taken in its info dict.
+    """
+    start_time = time.perf_counter()
+    own, opp = position_bits(game, state)
+    solver = EndgameSolver(table)
+    index, score = solver.best_move(own, opp)
+    empties = 64 - (own | opp).bit_count()
+    info = {
+        'score': score,
+        'empties': empties,
+        'depth': empties,
+        'nodes': solver.nodes,
+        'search_time': time.perf_counter() - start_time,
+    }
+    return SearchResult(SQUARES[index] if index is not None else None, info)
+
+
+def endgame_move(game, state, max_empties=ENDGAME_EMPTIES, table=None):
+    """Return solve_endgame's result if `state` is a Reversi position with a move and at most
+    `max_empties` empty squares, and None otherwise, so that a player can fall back to its own search."""
+    bits = position_bits(game, state)
+    if bits is None or game.terminal_test(state) or 64 - (bits[0] | bits[1]).bit_count() > max_empties:
+        return None
+    return solve_endgame(game, state, table)
+
+
+def brute_force(own, opp):
+    """Return the exact score of a position by plain negamax over every move, without pruning or ordering."""
+    moves = valid_move_bits(own, opp)
+    if not moves:
+        if valid_move_bits(opp, own):
+            return 0
+        return own.bit_count() - opp.bit_count()
+    best = -65
+    while moves:
+        move_bit = moves & -moves
+        moves ^= move_bit
+        flips = flip_bits(own, opp, move_bit)
+        best = max(best, -brute_force(opp ^ flips, own | move_bit | flips))
+    return best
+
+
+def endgame_positions(count, empties, seed=0):
+    """
+    Return `count` positions with exactly `empties` empty squares, reached by
+    random play from the initial position (games that end earlier are
+    skipped), as (own, opp) pairs with the player to move first.
+    """
+    rng = random.Random(seed)
+    game = BitboardReversi()
+    positions = []
+    while len(positions) < count:
+        state = game.initial
+        while not game.terminal_test(state) and 64 - (state.xdiscs | state.odiscs).bit_count() > empties:
+            state = game.result(state, rng.choice(state.moves))
+        if not game.terminal_test(state) and 64 - (state.xdiscs | state.odiscs).bit_count() == empties:
+            positions.append(position_bits(game, state))
+    return positions
+
+
+def check_solver(count, max_empties, seed=0):
+    """
+    Solve random endgame positions with 1 to `max_empties` empty squares and
+    assert that the solver's score matches brute_force, both on the full
+    window and as a bound on narrow windows around it.
+
+    Returns:
+        int: The number of positions checked.
+    """
+    for empties in range(1, max_empties + 1):
+        for own, opp in endgame_positions(count, empties, seed + empties):
+            expected = brute_force(own, opp)
+            assert EndgameSolver().solve(own, opp) == expected, (own, opp)
+            assert EndgameSolver().best_move(own, opp)[1] == expected, (own, opp)
+            assert EndgameSolver().solve(own, opp, expected - 1, expected + 1) == expected
+            assert EndgameSolver().solve(own, opp, expected, expected + 2) <= expected
+            assert EndgameSolver().solve(own, opp, expected - 2, expected) >= expected
+    return count * max_empties
+
+
+def time_solver(count, empties_list, seed=0):
+    """Print the average nodes and time to solve random positions with each number of empty squares."""
+    print(f"{'empties':>8}{'nodes':>12}{'time':>10}{'nodes/s':>12}")
+    for empties in empties_list:
+        nodes = 0
+        start_time = time.perf_counter()
+        for own, opp in endgame_positions(count, empties, seed + empties):
+            solver = EndgameSolver()
+            solver.best_move(own, opp)
+            nodes += solver.nodes
+        elapsed = time.perf_counter() - start_time
+        print(f"{empties:>8}{nodes / count:>12.0f}{elapsed / count:>9.3f}s{nodes / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the endgame solver against brute force and time it.")
+    parser.add_argument("--positions", type=int, default=20, help="positions per number of empty squares")
+    parser.add_argument("--check-empties", type=int, default=7, help="check every count of empty squares up to this one")
+    parser.add_argument("--empties", type=int, nargs='+', default=[8, 10, 12, 14], help="counts of empty squares to time")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random positions")
+    args = parser.parse_args()
+
+    checked = check_solver(args.positions, args.check_empties, args.seed)
+    print(f"{checked} positions with up to {args.check_empties} empty squares: solver matches brute force")
+    time_solver(args.positions, args.empties, args.seed)
@@ -1,3 +1,20 @@
+from collections import namedtuple
+
+# What a player may return instead of a bare move, to report how it searched
+# (depth, node count...). Game.play_game unwraps it and records the info.
+SearchResult = namedtuple('SearchResult', 'move, info')
+
+class MutableState:
+    """A mutable copy of a state namedtuple, for Game.make_move and
+    Game.unmake_move. It has the same fields as the state it was made from,
+    so actions, terminal_test, utility and the heuristics read it the same."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        return 'MutableState({})'.format(', '.join('{}={!r}'.format(k, v) for k, v in self.__dict__.items()))
+
 class Game:
     """A game is similar to a problem, but it has a utility for each
     state and a terminal test instead of a path cost and a goal
@@ -19,6 +36,20 @@ class Game:
         """Return the value of this final state to player."""
         raise NotImplementedError
 
+    def mutable_state(self, state):
+        """Return a copy of state that make_move and unmake_move can change in place."""
+        raise NotImplementedError
+
+    def make_move(self, state, move):
+        """Apply a legal move to a mutable state in place, and return a token
+        that unmake_move uses to restore the state as it was. This avoids
+        building a new state per node in deep searches."""
+        raise NotImplementedError
+
+    def unmake_move(self, state, undo):
+        """Undo the make_move call that returned the token `undo`."""
+        raise NotImplementedError
+
     def terminal_test(self, state):
         """Return True if this is a final state for the game."""
         return not self.actions(state)
@@ -34,22 +65,47 @@ class Game:
     def __repr__(self):
         return '<{}>'.format(self.__class__.__name__)
 
-    def play_game(self, *players):
+    def play_game(self, *players, stats=None, profiler=None, on_move=None):
         import time
-        """Play an n-person, move-alternating game."""
+        """Play an n-person, move-alternating game.
+
+        If `stats` is a list, a dict is appended to it for every move with
+        the ply, the player index, the move, its time and whatever search
+        info the player returned in a SearchResult. A MoveProfiler (see
+        instrumentation.py) given as `profiler` adds profiles and memory
+        peaks of the moves it was asked for to those dicts. `on_move`, if
+        given, is called with each move's dict as soon as the move is played."""
         state = self.initial
         player_move_times = [[], []]
+        # Players that keep state between moves (e.g. OrderingPlayer) start the game afresh
+        for player in players:
+            if hasattr(player, 'new_game'):
+                player.new_game()
+        ply = 0
         while True:
             for i, player in enumerate(players):
                 # Start timing for the player's move
-                start_time = time.time()
+                if profiler is not None:
+                    profiler.start_move(ply)
+                start_time = time.perf_counter()
                 move = player(self, state)
+                info = None
+                if isinstance(move, SearchResult):
+                    move, info = move
                 state = self.result(state, move)
-                end_time = time.time()
+                end_time = time.perf_counter()
 
                 # Store the time taken for this move
                 move_time = end_time - start_time
                 player_move_times[i].append(move_time)
+                record = dict(info or {}, ply=ply, player=i, move=move, move_time=move_time)
+                if profiler is not None:
+                    profiler.end_move(ply, record)
+                if stats is not None:
+                    stats.append(record)
+                if on_move is not None:
+                    on_move(record)
+                ply += 1
 
                 if self.terminal_test(state):
                     #self.display(state) # Uncomment if you want to display each game
@@ -0,0 +1,154 @@
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import tracemalloc
+import numpy as np
+
+# Per-move counters that players report in their SearchResult info and that
+# are averaged per player, with the name they are summarised under.
+AVERAGED_KEYS = (('depth', 'Depth'), ('nodes', 'Nodes'), ('utilization', 'Utilization'), ('iterations', 'Iterations'),
+                 ('rollouts', 'Rollouts'), ('memory_bytes', 'Memory_Bytes'))
+
+
+class MoveProfiler:
+    """Captures a cProfile profile and the peak traced memory (tracemalloc)
+    around chosen moves of a game, for Game.play_game. The moves are given
+    by ply, counted from 0 over both players, and the results are added to
+    the move's record: 'profile' holds the functions with the most
+    cumulative time as [function, calls, cumulative seconds], and
+    'peak_memory' the peak traced memory in bytes."""
+
+    def __init__(self, profile_plies=(), memory_plies=(), top=10, profile_dir=None):
+        """
+        Args:
+            profile_plies: Plies to profile with cProfile.
+            memory_plies: Plies to trace memory allocations for.
+            top (int): Number of functions kept in the record from each profile.
+            profile_dir: If given, each profile is also dumped there for pstats or snakeviz.
+        """
+        self.profile_plies = set(profile_plies)
+        self.memory_plies = set(memory_plies)
+        self.top = top
+        self.profile_dir = profile_dir
+        self.profile = None
+        self.tracing = False
+
+    def start_move(self, ply):
+        """Start the captures chosen for this ply."""
+        if ply in self.memory_plies and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+        if ply in self.profile_plies:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def end_move(self, ply, record):
+        """Stop the captures started for this ply and add their results to the move's record."""
+        if self.profile is not None:
+            self.profile.disable()
+            stats = pstats.Stats(self.profile)
+            record['profile'] = [[pstats.func_std_string(function), calls, round(cumulative, 6)]
+                                 for function, (_, calls, _, cumulative, _) in
+                                 sorted(stats.stats.items(), key=lambda item: -item[1][3])[:self.top]]
+            if self.profile_dir is not None:
+                path = os.path.join(self.profile_dir, f'move_{os.getpid()}_{ply}.prof')
+                self.profile.dump_stats(path)
+                record['profile_file'] = path
+            self.profile = None
+        if self.tracing:
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.tracing = False
+
+
+def json_value(value):
+    """Convert what json cannot write by itself (NumPy scalars and arrays) for JsonlSink."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class JsonlSink:
+    """Appends events, one JSON object per line, to a file. Lines are
+    flushed as they are written, so a long run can be followed (or
+    recovered after a crash) while it is going. Each line goes to the file
+    in a single append, so several processes can write to the same file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', buffering=1)
+
+    def write(self, event):
+        """Write one event."""
+        self.file.write(json.dumps(event, default=json_value) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_events(path):
+    """Return the events of a JSON Lines file as a list of dicts."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class MoveSummary:
+    """Running summary of per-move records (as Game.play_game writes them to
+    `stats`), per player: the averages of AVERAGED_KEYS over the moves that
+    report them, the 95th percentile and maximum move time, and the
+    transposition table hit rate over the moves that report table probes."""
+
+    def __init__(self):
+        self.totals = {}
+        self.move_times = {}
+
+    def add(self, record):
+        """Count one move record."""
+        i = record['player']
+        self.move_times.setdefault(i, []).append(record['move_time'])
+        for key, name in AVERAGED_KEYS + (('tt_hits', 'TT_Hits'), ('tt_probes', 'TT_Probes')):
+            if key in record:
+                totals = self.totals.setdefault((i, name), [0, 0])
+                totals[0] += record[key]
+                totals[1] += 1
+
+    def results(self):
+        """Return the summary as a dict of 'Average_Player{n}_{name}' and 'Player{n}_{name}' entries."""
+        results = {}
+        for (i, name), (total, count) in self.totals.items():
+            if name in ('TT_Hits', 'TT_Probes'):
+                continue
+            results[f'Average_Player{i+1}_{name}'] = total / count
+        for i, times in self.move_times.items():
+            results[f'Player{i+1}_Move_Time_P95'] = float(np.percentile(times, 95))
+            results[f'Player{i+1}_Max_Move_Time'] = max(times)
+            probes = self.totals.get((i, 'TT_Probes'), [0])[0]
+            if probes:
+                results[f'Player{i+1}_TT_Hit_Rate'] = self.totals[(i, 'TT_Hits')][0] / probes
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise the per-move events of a JSON Lines log.")
+    parser.add_argument("path", help="JSON Lines file written by simulate_games")
+    args = parser.parse_args()
+
+    summary = MoveSummary()
+    games = set()
+    for event in read_events(args.path):
+        summary.add(event)
+        games.add(event.get('game'))
+    print(f"{len(games)} games")
+    for name, value in sorted(summary.results().items()):
+        print(f"{name}: {value:.4f}")
@@ -1,13 +1,49 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 from tictactoe import TicTacToe
+from compact_tictactoe import CompactTicTacToe
 from reversi import Reversi
+from bitboard_reversi import BitboardReversi
 from randomplayer import random_player
 from manual_player import manual_player
 from minimax import minimax_player
 from minimax_pruning import minimax_pruning_player
-from minimax_limited_pruning import minimax_limited_pruning_player
+from minimax_limited_pruning import minimax_limited_pruning_player, minimax_iterative_deepening_player
 from mcts import mcts_player
+from mcts_tree import anytime_mcts_player
+from parallel_search import parallel_minimax_limited_pruning_player
+from move_ordering import OrderingPlayer
+from opening_book import BookPlayer, DEFAULT_BOOK
+from tictactoe_table import perfect_play_player, table_supported, MAX_CELLS
+from instrumentation import JsonlSink, MoveProfiler, MoveSummary
 
-def simulate_games(game, player1, player2, num_games):
+def play_one_game(game, player1, player2, seed=None, profiler=None, log=None, game_number=None):
+    """
+    Play one game, seeding the random number generators first if a seed is given.
+    If `log` is a path, each move's event (with the game number and seed) is appended
+    to that JSON Lines file as soon as the move is played, from whichever process plays it.
+
+    Returns:
+        tuple: The utility for Player 1, the average move time of each player and the per-move statistics.
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed % 2**32)
+    move_stats = []
+    sink = JsonlSink(log) if log is not None else None
+    on_move = (lambda record: sink.write(dict(record, game=game_number, seed=seed))) if sink is not None else None
+    try:
+        utility, avg_player1_time, avg_player2_time = game.play_game(player1, player2, stats=move_stats,
+                                                                     profiler=profiler, on_move=on_move)
+    finally:
+        if sink is not None:
+            sink.close()
+    return utility, avg_player1_time, avg_player2_time, move_stats
+
+def simulate_games(game, player1, player2, num_games, workers=1, seed=None, callback=None, log=None,
+                   profile_plies=(), memory_plies=()):
     """
     Simulate a series of games between two players.
 
@@ -16,11 +52,29 @@ def simulate_games(game, player1, player2, num_games):
         player1: The function representing Player 1's move strategy.
         player2: The function representing Player 2's move strategy.
         num_games (int): The number of games to simulate.
+        workers (int): Number of processes playing games at the same time; 1 plays them one after another.
+            With more, the game and players must be picklable (module-level functions).
+        seed (int): Game i is played with the random number generators seeded with seed + i, so results
+            do not depend on the number of workers or the order games finish in. Without a seed, a random
+            one is drawn, so that worker processes do not all inherit the same NumPy random state. The
+            seed used is returned in the results as 'Seed', so the run can be repeated.
+        callback: Called as callback(results, games_played) after each game, with the statistics so far.
+        log: Path of a JSON Lines file to append one event per move to: the game number and seed, the ply,
+            player, move and move time, and the search info the player reported (see instrumentation.py).
+            Events are written as each move is played, by the process playing the game.
+        profile_plies: Plies (counted from 0 over both players) to profile with cProfile in every game.
+        memory_plies: Plies to measure the peak traced memory of in every game.
 
     Returns:
         dict: A dictionary containing the results of the simulations, including the number of wins for each player, number of draws, and average move times.
+        The 95th percentile and maximum move time of each player are included, and for players that report
+        their search, the average depth reached, nodes searched, iterations and parallel workers' CPU utilization per move and
+        the transposition table hit rate.
     """
+    if seed is None:
+        seed = int.from_bytes(os.urandom(4), 'little')
     results = {
+        'Seed': seed,
         'Player1_Wins': 0,
         'Player2_Wins': 0,
         'Draws': 0,
@@ -30,10 +84,14 @@ def simulate_games(game, player1, player2, num_games):
     
     total_player1_move_time = 0
     total_player2_move_time = 0
-    
-    for _ in range(num_games):  # Play the game, user-defined times
-        utility, avg_player1_time, avg_player2_time = game.play_game(player1, player2)
-        
+    summary = MoveSummary()
+    games_played = 0
+    profiler = MoveProfiler(profile_plies, memory_plies) if profile_plies or memory_plies else None
+
+    def record(game_result):
+        nonlocal total_player1_move_time, total_player2_move_time, games_played
+        utility, avg_player1_time, avg_player2_time, game_move_stats = game_result
+        games_played += 1
         total_player1_move_time += avg_player1_time
         total_player2_move_time += avg_player2_time
         
@@ -44,11 +102,29 @@ def simulate_games(game, player1, player2, num_games):
         else:
             results['Draws'] += 1
     
-    results['Average_Player1_Move_Time'] = total_player1_move_time / num_games
-    results['Average_Player2_Move_Time'] = total_player2_move_time / num_games
+        results['Average_Player1_Move_Time'] = total_player1_move_time / games_played
+        results['Average_Player2_Move_Time'] = total_player2_move_time / games_played
+
+        # Move time percentiles and search statistics, for the players that report them
+        for move_record in game_move_stats:
+            summary.add(move_record)
+        results.update(summary.results())
+        if callback is not None:
+            callback(results, games_played)
+
+    game_seeds = [seed + i for i in range(num_games)]
+    if workers <= 1:
+        for game_number, game_seed in enumerate(game_seeds):  # Play the game, user-defined times
+            record(play_one_game(game, player1, player2, game_seed, profiler, log, game_number))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(play_one_game, game, player1, player2, game_seed, profiler, log, game_number)
+                       for game_number, game_seed in enumerate(game_seeds)]
+            for future in as_completed(futures):
+                record(future.result())
     return results
 
-def game_initialization(game, player1, player2, num_of_games):
+def game_initialization(game, player1, player2, num_of_games, workers=1, log=None, seed=None):
     """
     Initialize and start the simulation of games.
 
@@ -57,19 +133,51 @@ def game_initialization(game, player1, player2, num_of_games):
         player1: The function representing Player 1's move strategy.
         player2: The function representing Player 2's move strategy.
         num_of_games (int): The number of games to simulate.
+        workers (int): Number of games played at the same time.
+        log: Path of a JSON Lines file to write every move's statistics to, or None.
+        seed (int): Base seed of the games (see simulate_games), or None for a random one.
 
     Returns:
         None
     """
     print("\n\nThe game is starting:")
-    results = simulate_games(game, player1, player2, num_of_games)
+
+    # Partial statistics about every tenth of the games, for long runs
+    report_every = max(1, num_of_games // 10)
+    def show_progress(results, games_played):
+        if games_played % report_every == 0 and games_played < num_of_games:
+            print(f"{games_played}/{num_of_games} games: Player 1 Wins: {results['Player1_Wins']}, "
+                  f"Player 2 Wins: {results['Player2_Wins']}, Draws: {results['Draws']}")
+
+    results = simulate_games(game, player1, player2, num_of_games, workers=workers, seed=seed, callback=show_progress,
+                             log=log)
     
     # Statistics
+    print(f"Seed: {results['Seed']} (enter it again to repeat these games)")
     print(f"Player 1 Wins: {results['Player1_Wins']}")
     print(f"Player 2 Wins: {results['Player2_Wins']}")
     print(f"Draws: {results['Draws']}")
     print(f"Average Player 1 Move Time: {results['Average_Player1_Move_Time']:.4f} seconds")
     print(f"Average Player 2 Move Time: {results['Average_Player2_Move_Time']:.4f} seconds")
+    for i in range(1, 3):
+        if f'Player{i}_Move_Time_P95' in results:
+            print(f"Player {i} Move Time, 95th Percentile: {results[f'Player{i}_Move_Time_P95']:.4f} seconds, "
+                  f"Maximum: {results[f'Player{i}_Max_Move_Time']:.4f} seconds")
+        if f'Average_Player{i}_Depth' in results:
+            print(f"Average Player {i} Search Depth: {results[f'Average_Player{i}_Depth']:.2f}")
+        if f'Average_Player{i}_Nodes' in results:
+            print(f"Average Player {i} Nodes per Move: {results[f'Average_Player{i}_Nodes']:.0f}")
+        if f'Average_Player{i}_Iterations' in results:
+            print(f"Average Player {i} Iterations per Move: {results[f'Average_Player{i}_Iterations']:.0f}")
+        if f'Average_Player{i}_Memory_Bytes' in results:
+            print(f"Average Player {i} Search Tree Memory: {results[f'Average_Player{i}_Memory_Bytes'] / 2**10:.0f} KB")
+        if f'Average_Player{i}_Rollouts' in results:
+            print(f"Average Player {i} Rollouts per Move: {results[f'Average_Player{i}_Rollouts']:.0f}")
+        if f'Player{i}_TT_Hit_Rate' in results:
+            print(f"Player {i} Transposition Table Hit Rate: {results[f'Player{i}_TT_Hit_Rate']:.1%}")
+        if f'Average_Player{i}_Utilization' in results:
+            print(f"Average Player {i} Worker CPU Utilization: {results[f'Average_Player{i}_Utilization']:.2f} "
+                  f"CPU seconds per second")
 
 def main():
     # Mapping of player options to functions
@@ -77,28 +185,37 @@ def main():
         1: manual_player,
         2: random_player,
         3: minimax_player,
-        4: minimax_pruning_player,
-        5: minimax_limited_pruning_player,
-        6: mcts_player
+        4: OrderingPlayer(minimax_pruning_player),
+        5: OrderingPlayer(minimax_limited_pruning_player),
+        6: mcts_player,
+        7: OrderingPlayer(minimax_iterative_deepening_player),
+        8: parallel_minimax_limited_pruning_player,
+        9: anytime_mcts_player,
+        10: BookPlayer(OrderingPlayer(minimax_limited_pruning_player)),
+        11: perfect_play_player
     }
 
     # Available games
     games = {
         "1": TicTacToe(),
-        "2": Reversi()
+        "2": Reversi(),
+        "3": BitboardReversi(),
+        "4": CompactTicTacToe(15, 15, 5)
     }
 
     # Game choice
     print("Choose which game you would like to play:")
     print("1. Tic Tac Toe")
     print("2. Reversi (Othello)")
+    print("3. Reversi (Othello, bitboard engine)")
+    print("4. Gomoku (15x15 Tic Tac Toe, five in a row)")
 
     while True:
         game_choice = input("Enter your choice: ")
         if game_choice in games:
             break
         else:
-            print("Invalid input. Please enter either '1' or '2'.")
+            print("Invalid input. Please enter '1', '2', '3' or '4'.")
 
     game = games.get(game_choice)
 
@@ -111,16 +228,29 @@ def main():
         print("4. Minimax with Pruning Player")
         print("5. Minimax with Limited Pruning Player")
         print("6. Monte Carlo Player")
+        print("7. Minimax with Iterative Deepening Player (1 second per move)")
+        print("8. Parallel Minimax with Limited Pruning Player (all CPU cores)")
+        print("9. Monte Carlo Player (anytime, up to 1 second per move)")
+        print("10. Minimax with Limited Pruning Player, opening book first (Reversi)")
+        print("11. Perfect Play Table Player (Tic Tac Toe)")
 
         while True:
             try:
                 player_choice = int(input("Enter your choice: "))
-                if 1 <= player_choice <= 6:
+                if player_choice == 11 and not table_supported(game):
+                    print(f"The perfect play table only covers Tic Tac Toe boards of up to {MAX_CELLS} squares. "
+                          f"Please choose another player.")
+                elif player_choice == 10 and not isinstance(game, (Reversi, BitboardReversi)):
+                    print("The opening book only covers Reversi. Please choose another player.")
+                elif player_choice == 10 and not os.path.exists(DEFAULT_BOOK):
+                    print(f"There is no opening book at {DEFAULT_BOOK} yet; build one with "
+                          f"'python opening_book.py'. Please choose another player.")
+                elif 1 <= player_choice <= 11:
                     break
                 else:
-                    print("Invalid input. Please enter a number between 1 and 6.")
+                    print("Invalid input. Please enter a number between 1 and 11.")
             except ValueError:
-                print("Invalid input. Please enter a number between 1 and 6.")
+                print("Invalid input. Please enter a number between 1 and 11.")
 
         if i == 0:
             player1 = all_players.get(player_choice)
@@ -139,8 +269,33 @@ def main():
         except ValueError:
             print("Invalid input. Please enter a positive integer.")
 
+    # Number of worker processes choice (games with a human player are played one at a time)
+    workers = 1
+    if num_of_games > 1 and manual_player not in (player1, player2):
+        while True:
+            try:
+                workers = int(input(f"Enter the number of games to play at the same time (1 to {os.cpu_count()}): "))
+                if workers > 0:
+                    break
+                else:
+                    print("Invalid number. Please enter a positive integer.")
+            except ValueError:
+                print("Invalid input. Please enter a positive integer.")
+
+    # Optional log of every move's statistics
+    log = input("Enter a file to log every move to (JSON Lines), or press Enter to skip: ").strip() or None
+
+    # Optional seed, to repeat an earlier run
+    while True:
+        seed = input("Enter a seed to repeat an earlier run, or press Enter for a random one: ").strip()
+        try:
+            seed = int(seed) if seed else None
+            break
+        except ValueError:
+            print("Invalid input. Please enter an integer.")
+
     # Initialize the game
-    game_initialization(game, player1, player2, num_of_games)
+    game_initialization(game, player1, player2, num_of_games, workers, log, seed)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,6 +1,9 @@
 import copy
 import math
 import random
+import time
+import numpy as np
+from game import SearchResult
 
 class MCTSNode:
     def __init__(self, game, game_state, parent=None, move=None):
@@ -51,38 +54,52 @@ class MCTSNode:
             self.children.append(child_node)
         self.unexplored_moves = []
 
-    def rollout(self, state, player):
+    def rollout(self, state, player, count=1):
         """
         Perform a rollout (simulation) from the current state.
 
         Args:
             state: The game state to start the rollout from.
             player: The player for whom the utility is calculated.
+            count: Number of rollouts to play; games with a `batch_rollout`
+                method (e.g. Reversi) play several at once, vectorized.
 
         Returns:
-            float: The result of the rollout.
+            float: The result of the rollout, summed over the rollouts.
         """
-        while not self.game.terminal_test(state):
-            move = random.choice(state.moves)
-            state = self.game.result(state, move)
+        if count > 1:
+            batch_rollout = getattr(self.game, 'batch_rollout', None)
+            if batch_rollout is None:
+                return sum(self.rollout(state, player) for _ in range(count))
+            values = batch_rollout([state], count)[0] * (1 if player == 'X' else -1)
+            return float(np.where(values != 0, values, 0.5).sum())  # Count draw as 0.5
+
+        playout = getattr(self.game, 'playout', None)
+        if playout is not None:  # The game plays the whole rollout itself, faster
+            value = playout(state, player)
+        else:
+            while not self.game.terminal_test(state):
+                move = random.choice(state.moves)
+                state = self.game.result(state, move)
 
-        value = self.game.utility(state, player)
+            value = self.game.utility(state, player)
         return value if value != 0 else 0.5  # Count draw as 0.5
 
-    def backpropagation(self, value):
+    def backpropagation(self, value, count=1):
         """
         Backpropagate the result of the rollout up the tree.
 
         Args:
             value: The result to propagate.
+            count: The number of rollouts it sums.
         """
         node = self
         while node is not None:
-            node.visits += 1
+            node.visits += count
             node.wins += value
             node = node.parent
 
-def mcts_player(game, state, iterations=2000):
+def mcts_player(game, state, iterations=2000, rollouts_per_leaf=1):
     """
     Monte Carlo Tree Search algorithm to choose the best move.
 
@@ -90,15 +107,21 @@ def mcts_player(game, state, iterations=2000):
         game: The game being played.
         state: The current game state.
         iterations: Number of iterations to run the algorithm.
+        rollouts_per_leaf: Number of rollouts played from each selected leaf,
+            in one batch_rollout call when the game has one.
 
     Returns:
-        The best move determined by MCTS.
+        SearchResult: The best move determined by MCTS, with the iterations, rollouts
+        played, tree nodes and search time in its info dict.
     """
+    start_time = time.perf_counter()
     player = state.to_move
     root = MCTSNode(game, state)
 
     for move in state.moves:  # Initialize children
         root.children.append(MCTSNode(game, game.result(state, move), root, move))
+    nodes = 1 + len(root.children)
+    rollouts = 0
 
     for _ in range(iterations):
         current_node = root
@@ -109,16 +132,19 @@ def mcts_player(game, state, iterations=2000):
 
         # Expansion and Rollout
         if game.terminal_test(current_node.state):
-            result = game.utility(current_node.state, player)
+            result = game.utility(current_node.state, player) * rollouts_per_leaf
         else:
             if current_node.visits > 0:
                 current_node.expansion()
+                nodes += len(current_node.children)
                 current_node = current_node.children[0]
-            result = current_node.rollout(current_node.state, player)
+            result = current_node.rollout(current_node.state, player, rollouts_per_leaf)
+            rollouts += rollouts_per_leaf
 
         # Backpropagation
-        current_node.backpropagation(result)
+        current_node.backpropagation(result, rollouts_per_leaf)
 
     # Choose the best move
     best_child = max(root.children, key=lambda child: child.wins / child.visits)
-    return best_child.move
\ No newline at end of file
+    return SearchResult(best_child.move, {'iterations': iterations, 'rollouts': rollouts, 'nodes': nodes,
+                                          'search_time': time.perf_counter() - start_time})
\ No newline at end of file
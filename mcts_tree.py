@@ -0,0 +1,605 @@
+import heapq
+import math
+import random
+import sys
+import time
+from array import array
+from game import SearchResult
+
+# (name, typecode, initial value) of the per-node arrays of MCTSTree
+NODE_ARRAYS = [
+    ('parent', 'i', -1),
+    ('first_child', 'i', -1),
+    ('next_sibling', 'i', -1),
+    ('move', 'H', 0),
+    ('visits', 'i', 0),
+    ('wins', 'd', 0.0),
+]
+# Added with `rave`: the all-moves-as-first visits and results of each node's move
+RAVE_ARRAYS = [
+    ('amaf_visits', 'i', 0),
+    ('amaf_wins', 'd', 0.0),
+]
+# Parent of a recycled node slot, waiting on the free list
+FREED = -2
+
+def rollout(game, state, player, played=None):
+    """Play random moves from `state` to the end and return the result for `player` (a draw counts 0.5).
+    Games with a `playout` method (e.g. Reversi) play the whole game in it. If `played`
+    is a list, the moves of the rollout are appended to it."""
+    playout = getattr(game, 'playout', None)
+    if playout is not None:
+        value = playout(state, player, played)
+    else:
+        while not game.terminal_test(state):
+            move = random.choice(game.actions(state))
+            if played is not None:
+                played.append(move)
+            state = game.result(state, move)
+        value = game.utility(state, player)
+    return value if value != 0 else 0.5  # Count draw as 0.5
+
+class MCTSTree:
+    """A Monte Carlo search tree stored in flat arrays instead of one
+    MCTSNode object per node. Node i is described by entry i of each array:
+    its parent, first child and next sibling (indices, -1 for none), the
+    move that led to it (an index into `move_list`), its visit count and its
+    summed results. The arrays start at `capacity` nodes (at most `max_nodes`)
+    and double when full.
+
+    Only the root state is kept. The state of any other node is rebuilt by
+    playing the moves from the root while descending to it, which costs a
+    few Game.result calls per iteration, against a full rollout, and no
+    per-node copies of the board.
+
+    The search is the one of mcts.mcts_player: UCB1 selection of the
+    child with the best win rate for the root player at every level, all
+    children added when a visited leaf is expanded, random rollouts, and
+    results counted for the root player (a draw is 0.5 after a rollout, 0 if
+    the leaf itself is terminal).
+
+    With `rave`, each node also keeps all-moves-as-first (AMAF) statistics:
+    the results of every iteration in which its move was played by the same
+    player at any later point of the selected path or of the rollout, not
+    only right away. Selection blends the AMAF win rate into the win rate
+    with a weight sqrt(k / (3 * visits + k)) that fades as the node's own
+    visits grow, k being `rave_equivalence`. A child with no visits is
+    scored by its AMAF win rate, if it has one.
+
+    With `max_nodes`, the tree never holds more nodes than that: when it is
+    full, the subtrees below the least visited nodes are cut off (those
+    nodes become leaves again, keeping their statistics) until a quarter of
+    the budget is free, and their slots are reused. With `lazy_expansion`,
+    a visited leaf gets one child per visit, for its first untried move,
+    instead of all of them at once, so the tree only grows where the search
+    goes."""
+
+    def __init__(self, game, state, capacity=4096, rave=False, rave_equivalence=500, max_nodes=None,
+                 lazy_expansion=False):
+        """
+        Start a tree at `state`, with a child for each of its moves (unless `lazy_expansion`).
+
+        Args:
+            game: The game being played.
+            state: The root state.
+            capacity (int): Number of nodes to allocate room for up front, lowered to `max_nodes` if smaller.
+            rave (bool): Whether to keep AMAF statistics and use them in selection.
+            rave_equivalence: Number of visits at which a node's own win rate and its AMAF
+                win rate weigh the same (about; the AMAF weight is 1/2 at k/3 visits).
+            max_nodes: Most nodes the tree may hold, or None for no limit.
+            lazy_expansion (bool): Whether to add one child per visit instead of all at once.
+        """
+        self.game = game
+        self.root_state = state
+        self.player = game.to_move(state)
+        self.rave = rave
+        self.rave_equivalence = rave_equivalence
+        self.node_arrays = NODE_ARRAYS + (RAVE_ARRAYS if rave else [])
+        if max_nodes is not None:
+            capacity = min(capacity, max_nodes)
+        for name, typecode, initial in self.node_arrays:
+            setattr(self, name, array(typecode, [initial]) * capacity)
+        # Slots in use are below `size`, except those on the `free` list
+        self.size = 0
+        self.free = []
+        # Most nodes held at once since the tree was started or the last search began
+        self.peak_nodes = 0
+        # Number of recycle calls and the time they took, for benchmarks
+        self.recycles = 0
+        self.recycle_time = 0.0
+        self.max_nodes = max_nodes
+        self.lazy_expansion = lazy_expansion
+        # Distinct moves seen, so each node stores a small index instead of a move object
+        self.move_list = []
+        self.move_ids = {}
+
+        self.root = self.new_node(-1, None)
+        if not lazy_expansion:
+            self.expand(self.root, game.actions(state))
+
+    def node_count(self):
+        """Return the number of nodes in the tree."""
+        return self.size - len(self.free)
+
+    def memory_bytes(self):
+        """Return the memory allocated for the node arrays and the free list, in bytes."""
+        arrays = sum(getattr(self, name).buffer_info()[1] * getattr(self, name).itemsize
+                     for name, _, _ in self.node_arrays)
+        return arrays + sys.getsizeof(self.free)
+
+    def node_bytes(self):
+        """Return the bytes one node slot takes over all the node arrays."""
+        return sum(getattr(self, name).itemsize for name, _, _ in self.node_arrays)
+
+    def new_node(self, parent, move):
+        """Add a node with no children or visits and return its index."""
+        if self.max_nodes is not None and not self.free and self.size >= self.max_nodes:
+            self.recycle(parent)
+        if self.free:
+            node = self.free.pop()
+        else:
+            if self.size == len(self.parent):
+                self.grow()
+            node = self.size
+            self.size += 1
+        if self.size - len(self.free) > self.peak_nodes:
+            self.peak_nodes = self.size - len(self.free)
+        self.parent[node] = parent
+        self.first_child[node] = -1
+        self.next_sibling[node] = -1
+        self.visits[node] = 0
+        self.wins[node] = 0.0
+        if self.rave:
+            self.amaf_visits[node] = 0
+            self.amaf_wins[node] = 0.0
+        if move is not None:
+            move_id = self.move_ids.get(move)
+            if move_id is None:
+                move_id = self.move_ids[move] = len(self.move_list)
+                self.move_list.append(move)
+            self.move[node] = move_id
+        return node
+
+    def grow(self):
+        """Double the room for nodes, up to `max_nodes` while the tree is within its budget."""
+        count = len(self.parent)
+        if self.max_nodes is not None and count < self.max_nodes:
+            count = min(count, self.max_nodes - count)
+        for name, typecode, initial in self.node_arrays:
+            getattr(self, name).extend(array(typecode, [initial]) * count)
+
+    def recycle(self, keep):
+        """
+        Free a quarter of the node budget by cutting off the subtrees of the
+        least visited nodes, sparing `keep` and its ancestors. If that frees
+        nothing (every interior node is on that path), the tree grows instead.
+        """
+        start_time = time.perf_counter()
+        protected = set()
+        node = keep
+        while node >= 0:
+            protected.add(node)
+            node = self.parent[node]
+        parent, first_child, visits = self.parent, self.first_child, self.visits
+        interior = (n for n in range(self.size)
+                    if parent[n] != FREED and first_child[n] != -1 and n not in protected)
+        target = max(1, self.max_nodes // 4)
+        # Every candidate frees at least one slot (its first child), either here or with an
+        # ancestor cut off before it, so the `target` least visited ones are enough
+        for node in heapq.nsmallest(target, interior, key=visits.__getitem__):
+            if len(self.free) >= target:
+                break
+            if parent[node] != FREED:  # Not already cut off with an ancestor
+                self.collapse(node)
+        self.recycles += 1
+        self.recycle_time += time.perf_counter() - start_time
+
+    def collapse(self, node):
+        """Remove all the descendants of `node`, putting their slots on the free list."""
+        stack = self.children(node)
+        self.first_child[node] = -1
+        while stack:
+            descendant = stack.pop()
+            stack.extend(self.children(descendant))
+            self.parent[descendant] = FREED
+            self.free.append(descendant)
+
+    def add_child(self, node, move):
+        """Add a child for `move` after the existing children of `node` and return it."""
+        child = self.new_node(node, move)
+        last = self.first_child[node]
+        if last == -1:
+            self.first_child[node] = child
+        else:
+            while self.next_sibling[last] != -1:
+                last = self.next_sibling[last]
+            self.next_sibling[last] = child
+        return child
+
+    def expand(self, node, moves):
+        """Give `node` a child for each move, in the order given."""
+        previous = -1
+        for move in moves:
+            child = self.new_node(node, move)
+            if previous == -1:
+                self.first_child[node] = child
+            else:
+                self.next_sibling[previous] = child
+            previous = child
+
+    def children(self, node):
+        """Return the indices of the children of `node`, in move order."""
+        children = []
+        child = self.first_child[node]
+        while child != -1:
+            children.append(child)
+            child = self.next_sibling[child]
+        return children
+
+    def node_move(self, node):
+        """Return the move that led to `node`."""
+        return self.move_list[self.move[node]]
+
+    def select(self, node):
+        """Return the child of `node` with the highest UCB1 value (the first one if several tie)."""
+        if self.rave:
+            return self.select_rave(node)
+        c = 1.4
+        visits, wins, next_sibling = self.visits, self.wins, self.next_sibling
+        log_visit_count = math.log(visits[node]) if visits[node] > 0 else 0
+        best, best_value = -1, -math.inf
+        child = self.first_child[node]
+        while child != -1:
+            n = visits[child]
+            if n == 0:
+                return child  # Unvisited children come first, and the first of them wins the tie
+            value = (wins[child] / n) + c * math.sqrt(log_visit_count / n)
+            if value > best_value:
+                best, best_value = child, value
+            child = next_sibling[child]
+        return best
+
+    def select_rave(self, node):
+        """Return the child of `node` with the highest UCB1 value, its win rate blended with its AMAF win rate."""
+        c = 1.4
+        k = self.rave_equivalence
+        visits, wins, next_sibling = self.visits, self.wins, self.next_sibling
+        amaf_visits, amaf_wins = self.amaf_visits, self.amaf_wins
+        log_visit_count = math.log(visits[node]) if visits[node] > 0 else 0
+        best, best_value = -1, -math.inf
+        child = self.first_child[node]
+        while child != -1:
+            n, amaf_n = visits[child], amaf_visits[child]
+            if n == 0:
+                if amaf_n == 0:
+                    return child  # Nothing known about it yet: try it first, as UCB1 would
+                value = amaf_wins[child] / amaf_n + c * math.sqrt(log_visit_count)
+            else:
+                rate = wins[child] / n
+                if amaf_n > 0:
+                    beta = math.sqrt(k / (3 * n + k))
+                    rate = (1 - beta) * rate + beta * amaf_wins[child] / amaf_n
+                value = rate + c * math.sqrt(log_visit_count / n)
+            if value > best_value:
+                best, best_value = child, value
+            child = next_sibling[child]
+        return best
+
+    def rollout(self, state, played=None):
+        """Play random moves from `state` to the end and return the result for the root player.
+        If `played` is a list, the moves of the rollout are appended to it."""
+        return rollout(self.game, state, self.player, played)
+
+    def update_amaf(self, node, played, value):
+        """
+        Add an AMAF visit and `value` to every child, of `node` and of each of
+        its ancestors, whose move the player to move there played later in the
+        iteration: on the path below or in the rollout (`played`).
+        """
+        # The whole game from the root: the path down to `node`, then the rollout
+        path = []
+        while node != -1:
+            path.append(node)
+            node = self.parent[node]
+        path.reverse()
+        sequence = [self.node_move(n) for n in path[1:]] + played
+
+        amaf_visits, amaf_wins = self.amaf_visits, self.amaf_wins
+        for depth, node in enumerate(path):
+            # Players alternate (there are no passes), so every other move is the same player's
+            later = set(sequence[depth::2])
+            child = self.first_child[node]
+            while child != -1:
+                if self.node_move(child) in later:
+                    amaf_visits[child] += 1
+                    amaf_wins[child] += value
+                child = self.next_sibling[child]
+
+    def backpropagate(self, node, value, count=1):
+        """Add `count` visits and `value` to `node` and all of its ancestors."""
+        visits, wins, parent = self.visits, self.wins, self.parent
+        while node != -1:
+            visits[node] += count
+            wins[node] += value
+            node = parent[node]
+
+    def iterate(self):
+        """Run one selection, expansion, rollout and backpropagation, and return the depth of the node played out from."""
+        node, state, depth, terminal = self.select_leaf()
+        played = [] if self.rave else None
+        result = self.game.utility(state, self.player) if terminal else self.rollout(state, played)
+        self.backpropagate(node, result)
+        if self.rave:
+            self.update_amaf(node, played, result)
+        return depth
+
+    def select_leaf(self):
+        """
+        Run the selection and expansion steps.
+
+        Returns:
+            tuple: The node to play out from, its state, its depth, and whether
+            it was a terminal leaf (scored by its utility, without a rollout).
+        """
+        if self.lazy_expansion:
+            return self.select_leaf_lazily()
+        game = self.game
+        node, state = self.root, self.root_state
+        depth = 0
+
+        # Selection, rebuilding the states on the way down
+        while self.first_child[node] != -1:
+            node = self.select(node)
+            state = game.result(state, self.node_move(node))
+            depth += 1
+
+        # Expansion
+        if game.terminal_test(state):
+            return node, state, depth, True
+        if self.visits[node] > 0:
+            self.expand(node, game.actions(state))
+            node = self.first_child[node]
+            state = game.result(state, self.node_move(node))
+            depth += 1
+        return node, state, depth, False
+
+    def select_leaf_lazily(self):
+        """select_leaf with lazy expansion: descend through nodes that have a child for every
+        move, and add a child for the first untried move of the first node that does not."""
+        game = self.game
+        node, state = self.root, self.root_state
+        depth = 0
+        while True:
+            if game.terminal_test(state):
+                return node, state, depth, True
+            if node != self.root and self.visits[node] == 0:
+                return node, state, depth, False
+            children = self.children(node)
+            moves = game.actions(state)
+            if len(children) < len(moves):
+                tried = {self.move[child] for child in children}
+                move = next(move for move in moves if self.move_ids.get(move) not in tried)
+                child = self.add_child(node, move)
+                return child, game.result(state, move), depth + 1, False
+            node = self.select(node)
+            state = game.result(state, self.node_move(node))
+            depth += 1
+
+    def search(self, iterations=None, time_budget=None, early_stop=False):
+        """
+        Run iterations until `iterations` of them are done or `time_budget`
+        seconds have passed, whichever comes first. With `early_stop` the
+        search also ends when the most visited root child is ahead of the
+        second by more visits than the budget has iterations left, so that
+        no other child can overtake it, which ends at once when there is
+        only one move. With a time budget, the iterations left are estimated
+        from the speed so far.
+
+        Returns:
+            dict: The iterations run, the deepest node played out from, the
+            tree size, the most nodes held during the search, the node slots
+            allocated and their memory in bytes, the time taken, whether the
+            search stopped early, and [move, visits, win rate] for each root child.
+        """
+        if iterations is None and time_budget is None:
+            raise ValueError("an iteration count or a time budget is needed")
+        start_time = time.perf_counter()
+        deadline = start_time + time_budget if time_budget is not None else None
+        done = max_depth = 0
+        stopped_early = False
+        self.peak_nodes = self.node_count()
+        while iterations is None or done < iterations:
+            if early_stop and done % 16 == 0 and self.decided(done, iterations, start_time, deadline):
+                stopped_early = True
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            max_depth = max(max_depth, self.iterate())
+            done += 1
+
+        return {
+            'iterations': done,
+            'max_depth': max_depth,
+            'nodes': self.node_count(),
+            'peak_nodes': self.peak_nodes,
+            'slots': len(self.parent),
+            'memory_bytes': self.memory_bytes(),
+            'search_time': time.perf_counter() - start_time,
+            'stopped_early': stopped_early,
+            'children': [[self.node_move(child), self.visits[child],
+                          self.wins[child] / self.visits[child] if self.visits[child] else None]
+                         for child in self.children(self.root)],
+        }
+
+    def decided(self, done, iterations, start_time, deadline):
+        """Return True if the most visited root child cannot be overtaken with the budget that is left."""
+        visits = sorted((self.visits[child] for child in self.children(self.root)), reverse=True)
+        if len(visits) < 2:
+            return True
+        remaining = math.inf
+        if iterations is not None:
+            remaining = iterations - done
+        if deadline is not None and done > 0:
+            now = time.perf_counter()
+            remaining = min(remaining, done / (now - start_time) * (deadline - now))
+        return visits[0] - visits[1] > remaining
+
+    def reroot(self, node, state):
+        """
+        Make `node`, whose state is `state`, the root and drop the rest of the
+        tree. The subtree is copied to the front of the arrays, keeping its
+        statistics and the order of children.
+        """
+        order = [node]
+        new_index = {node: 0}
+        for old in order:  # Breadth first; the list grows while it is walked
+            child = self.first_child[old]
+            while child != -1:
+                new_index[child] = len(order)
+                order.append(child)
+                child = self.next_sibling[child]
+
+        padding = len(self.parent) - len(order)
+        for name, typecode, initial in self.node_arrays:
+            values = getattr(self, name)
+            if name in ('parent', 'first_child', 'next_sibling'):
+                kept = [new_index.get(values[n], -1) for n in order]
+            else:
+                kept = [values[n] for n in order]
+            setattr(self, name, array(typecode, kept) + array(typecode, [initial]) * padding)
+        self.size = len(order)
+        self.free = []
+        self.root = 0
+        self.next_sibling[0] = -1
+        self.root_state = state
+        if self.first_child[0] == -1 and not self.lazy_expansion:
+            self.expand(0, self.game.actions(state))
+
+    def find_child(self, node, move):
+        """Return the child of `node` reached by `move`, or None."""
+        for child in self.children(node):
+            if self.node_move(child) == move:
+                return child
+        return None
+
+    def best_move(self, by_visits=False):
+        """Return the move of the root child with the highest win rate, or with the most visits if `by_visits`."""
+        best, best_score = None, -math.inf
+        for child in self.children(self.root):
+            if self.visits[child] == 0:
+                continue
+            score = self.visits[child] if by_visits else self.wins[child] / self.visits[child]
+            if score > best_score:
+                best, best_score = child, score
+        return self.node_move(best) if best is not None else None
+
+def compact_mcts_player(game, state, iterations=2000):
+    """
+    Monte Carlo Tree Search with the tree stored in arrays (MCTSTree).
+    With the same random seed it plays the same moves as mcts_player.
+
+    Args:
+        game: The game being played.
+        state: The current game state.
+        iterations: Number of iterations to run the algorithm.
+
+    Returns:
+        SearchResult: The best move determined by MCTS, with the iterations and tree nodes in its info dict.
+    """
+    tree = MCTSTree(game, state)
+    for _ in range(iterations):
+        tree.iterate()
+    return SearchResult(tree.best_move(), {'iterations': iterations, 'nodes': tree.node_count()})
+
+class MCTSPlayer:
+    """A Monte Carlo player that keeps its tree from one move to the next.
+
+    After playing a move, the subtree below it already holds the results of
+    many playouts through the opponent's replies. When called again, the
+    player finds the reply that leads to the state it is given, among the
+    children of its own last move, and makes that node the root, so the new
+    search starts from those statistics. If the state cannot be matched (a
+    new game, or a reply the tree never expanded) it starts a fresh tree.
+
+    Use one instance per side; it can be passed to Game.play_game like a
+    player function."""
+
+    def __init__(self, iterations=2000, reuse=True, time_budget=None, early_stop=False, rave=False, max_nodes=None,
+                 lazy_expansion=False):
+        """
+        Args:
+            iterations (int): Number of iterations to run per move, or None to only use the time budget.
+            reuse (bool): Whether to keep the tree between moves.
+            time_budget: Wall-clock seconds per move, or None for no time limit.
+            early_stop (bool): Whether to stop once the most visited move cannot be overtaken,
+                and play that move instead of the one with the best win rate.
+            rave (bool): Whether to search with AMAF statistics (see MCTSTree).
+            max_nodes: Most nodes the tree may hold, old subtrees being recycled (see MCTSTree).
+            lazy_expansion (bool): Whether to add one child per visit instead of all at once.
+        """
+        self.iterations = iterations
+        self.reuse = reuse
+        self.time_budget = time_budget
+        self.early_stop = early_stop
+        self.rave = rave
+        self.max_nodes = max_nodes
+        self.lazy_expansion = lazy_expansion
+        self.tree = None
+        self.last_move = None
+
+    def reused_tree(self, game, state):
+        """Return the previous tree re-rooted at `state`, or None if `state` is not two moves below its root."""
+        tree = self.tree
+        if not self.reuse or tree is None or tree.game is not game:
+            return None
+        node = tree.find_child(tree.root, self.last_move)
+        if node is None:
+            return None
+        after = game.result(tree.root_state, self.last_move)
+        for reply in tree.children(node):
+            reply_state = game.result(after, tree.node_move(reply))
+            if reply_state == state:
+                tree.reroot(reply, reply_state)
+                return tree
+        return None
+
+    def __call__(self, game, state):
+        """
+        Choose a move for `state`.
+
+        Returns:
+            SearchResult: The move, with the search statistics of
+            MCTSTree.search and the number of visits reused from the
+            previous move in its info dict.
+        """
+        tree = self.reused_tree(game, state)
+        if tree is None:
+            tree = MCTSTree(game, state, rave=self.rave, max_nodes=self.max_nodes,
+                            lazy_expansion=self.lazy_expansion)
+        reused_visits = tree.visits[tree.root]
+        info = tree.search(self.iterations, self.time_budget, self.early_stop)
+        info['reused_visits'] = reused_visits
+        self.tree, self.last_move = tree, tree.best_move(by_visits=self.early_stop)
+        return SearchResult(self.last_move, info)
+
+def anytime_mcts_player(game, state, time_budget=1.0, iterations=None, early_stop=True):
+    """
+    Monte Carlo Tree Search that runs until a wall-clock or iteration budget
+    runs out, and by default stops as soon as the most visited move can no
+    longer be overtaken (at once if there is only one move). It plays the
+    most visited move.
+
+    Args:
+        game: The game being played.
+        state: The current game state.
+        time_budget: Wall-clock seconds per move, or None for no time limit.
+        iterations: Maximum number of iterations, or None for no limit.
+        early_stop (bool): Whether to stop once the result is decided.
+
+    Returns:
+        SearchResult: The move, with the iterations run, deepest node, tree
+        size, time and per-move visits and win rates in its info dict.
+    """
+    tree = MCTSTree(game, state)
+    info = tree.search(iterations, time_budget, early_stop)
+    return SearchResult(tree.best_move(by_visits=True), info)
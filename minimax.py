@@ -1,29 +1,54 @@
 import numpy as np
+from transposition import TranspositionTable, EXACT
 
-def minimax_player(game, state):
+def minimax_player(game, state, table=None, in_place=True):
     """Given a state in a game, calculate the best move by searching
-    forward all the way to the terminal states."""
+    forward all the way to the terminal states. Values of positions
+    already solved are looked up in a transposition table (one per
+    player, since values are from that player's point of view). With
+    `in_place` the search plays moves on one mutable state with
+    make_move/unmake_move instead of building states with result."""
 
     player = game.to_move(state)
+    if table is None:
+        table = TranspositionTable()
+
+    def child_value(state, action, value):
+        if not in_place:
+            return value(game.result(state, action))
+        undo = game.make_move(state, action)
+        v = value(state)
+        game.unmake_move(state, undo)
+        return v
 
     def max_value(state):
+        entry = table.lookup(state.zobrist)
+        if entry is not None:
+            return entry.value
         if game.terminal_test(state):
             return game.utility(state, player)
 
         v = -np.inf
-        for action in game.actions(state):
-            v = max(v, min_value(game.result(state, action)))
+        for action in list(game.actions(state)):
+            v = max(v, child_value(state, action, min_value))
 
+        table.store(state.zobrist, np.inf, v, EXACT)
         return v
 
     def min_value(state):
+        entry = table.lookup(state.zobrist)
+        if entry is not None:
+            return entry.value
         if game.terminal_test(state):
             return game.utility(state, player)
 
         v = np.inf
-        for action in game.actions(state):
-            v = min(v, max_value(game.result(state, action)))
+        for action in list(game.actions(state)):
+            v = min(v, child_value(state, action, max_value))
 
+        table.store(state.zobrist, np.inf, v, EXACT)
         return v
 
-    return max(game.actions(state), key=lambda a: min_value(game.result(state, a)))
\ No newline at end of file
+    if in_place:
+        state = game.mutable_state(state)
+    return max(list(game.actions(state)), key=lambda a: child_value(state, a, min_value))
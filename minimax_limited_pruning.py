@@ -1,44 +1,96 @@
-import numpy as np
+import time
+from alphabeta import AlphaBetaSearch
+from endgame import endgame_move, ENDGAME_EMPTIES
+from game import SearchResult
+from move_ordering import MoveOrdering
 from reversi import Reversi
 
-def minimax_limited_pruning_player(game, state):
+def heuristic_evaluator(game, player):
+    """Return a function scoring states from `player`'s point of view with the game's heuristic."""
+    # Games with their own evaluator (e.g. BitboardReversi) score their own states
+    evaluate = getattr(game, 'evaluateHeuristicFunction', None) or Reversi().evaluateHeuristicFunction
+    return lambda state: evaluate(state, player)
+
+def leaf_batch_evaluator(game, player):
+    """Return a function valuing a list of leaf states for `player` in one call, or None if the game has none."""
+    evaluate_leaves = getattr(game, 'evaluate_leaves', None)
+    if evaluate_leaves is None:
+        return None
+    return lambda states: evaluate_leaves(states, player)
+
+def minimax_limited_pruning_player(game, state, depth=4, table=None, ordering=None, in_place=True, batch=False,
+                                   endgame_empties=ENDGAME_EMPTIES):
     """Given a state in a game, calculate the best move by searching
-    forward limited to a depth of 3."""
-    
-    a = -np.inf
-    b = np.inf
-    initial_depth = 0
-    
-    reversi_game = Reversi()
-    
+    forward limited to a depth of 3 below the root's children (4 plies),
+    pruning with alpha-beta bounds and a transposition table.
+
+    `depth` is the number of plies searched before the heuristic is
+    applied. Pass a TranspositionTable as `table` and a MoveOrdering as
+    `ordering` to keep results and history scores across the moves of one
+    player (OrderingPlayer does this for the ordering). With `in_place` the
+    search plays moves on one mutable state (make_move/unmake_move). With `batch` the leaves below each frontier
+    node are evaluated together in one vectorized call, if the game
+    supports it (Game.evaluate_leaves). Reversi positions with at most
+    `endgame_empties` empty squares are solved exactly instead (see
+    endgame.py); pass 0 to always use the heuristic search.
+
+    Returns a SearchResult with the depth and the search counters
+    (AlphaBetaSearch.statistics) in its info."""
+
+    solved = endgame_move(game, state, endgame_empties)
+    if solved is not None:
+        return solved
+
+    player = game.to_move(state)
+    if ordering is None:
+        ordering = MoveOrdering(game)
+    search = AlphaBetaSearch(game, player, depth=depth, evaluate=heuristic_evaluator(game, player), table=table,
+                             ordering=ordering, in_place=in_place,
+                             batch_evaluate=leaf_batch_evaluator(game, player) if batch else None)
+    move = search.best_move(state)
+    info = search.statistics()
+    info['depth'] = depth
+    return SearchResult(move, info)
+
+def minimax_iterative_deepening_player(game, state, time_budget=1.0, node_budget=None, max_depth=None, table=None,
+                                       ordering=None, in_place=True, batch=False, endgame_empties=ENDGAME_EMPTIES):
+    """Given a state in a game, search it with the depth-limited alpha-beta
+    search at depth 1, 2, 3... until the per-move budget runs out, and play
+    the best move of the deepest completed iteration.
+
+    Args:
+        game: The game being played.
+        state: The current game state.
+        time_budget: Wall-clock seconds per move, or None for no time limit.
+        node_budget: Nodes per move, or None for no node limit.
+        max_depth: Deepest iteration to run, or None to go until the budget runs out.
+        table: A TranspositionTable to reuse across the moves of this player.
+        ordering: A MoveOrdering to reuse across the moves of this player (see OrderingPlayer).
+        in_place (bool): Search with make_move/unmake_move instead of result.
+        batch (bool): Evaluate the leaves below each frontier node in one vectorized call.
+        endgame_empties (int): Solve Reversi positions with at most this many
+            empty squares exactly with endgame.solve_endgame instead.
+
+    Returns:
+        SearchResult: The move, with the depth reached, node count and
+        principal variation in its info dict.
+    """
+    solved = endgame_move(game, state, endgame_empties)
+    if solved is not None:
+        return solved
+
+    start_time = time.perf_counter()
     player = game.to_move(state)
+    deadline = start_time + time_budget if time_budget is not None else None
+    if ordering is None:
+        ordering = MoveOrdering(game)
+    search = AlphaBetaSearch(game, player, evaluate=heuristic_evaluator(game, player), table=table,
+                             deadline=deadline, node_limit=node_budget, ordering=ordering,
+                             in_place=in_place, batch_evaluate=leaf_batch_evaluator(game, player) if batch else None)
 
-    def max_value(state, a, b, current_depth):     
-        if game.terminal_test(state):
-            return game.utility(state, player)
-        if current_depth == 3:
-            return reversi_game.evaluateHeuristicFunction(state)
-
-        v = -np.inf
-        for action in game.actions(state):
-            v = max(v, min_value(game.result(state, action), a, b, current_depth + 1))
-            if (v >= b):
-                return v
-            a = max(a,v)
-        return v
-
-    def min_value(state, a, b, current_depth):
-        if game.terminal_test(state):
-            return game.utility(state, player)
-        if current_depth == 3:
-            return reversi_game.evaluateHeuristicFunction(state)
-
-        v = np.inf
-        for action in game.actions(state):
-            v = min(v, max_value(game.result(state, action), a, b, current_depth + 1))
-            if v <= a:
-                return v
-            b = min(b, v)
-        return v
-
-    return max(game.actions(state), key=lambda action: min_value(game.result(state, action), a, b, initial_depth))
\ No newline at end of file
+    move, depth = search.iterative_deepening(state, max_depth)
+    info = search.statistics()
+    info['depth'] = depth
+    info['search_time'] = time.perf_counter() - start_time
+    info['pv'] = search.principal_variation(state, depth)
+    return SearchResult(move, info)
@@ -1,36 +1,32 @@
-import numpy as np
+from alphabeta import AlphaBetaSearch
+from endgame import endgame_move, ENDGAME_EMPTIES
+from game import SearchResult
+from move_ordering import MoveOrdering
+from symmetry import game_symmetry
 
-def minimax_pruning_player(game, state):
+def minimax_pruning_player(game, state, table=None, ordering=None, in_place=True, endgame_empties=ENDGAME_EMPTIES,
+                           symmetric=False):
     """Given a state in a game, calculate the best move by searching
-    forward all the way to the terminal states."""
-    
-    a = -np.inf
-    b = np.inf
-    
-    player = game.to_move(state)
+    forward all the way to the terminal states, pruning with alpha-beta
+    bounds and a transposition table.
 
-    def max_value(state, a, b):
-        if game.terminal_test(state):
-            return game.utility(state, player)
+Pass a TranspositionTable as `table` and a MoveOrdering as `ordering`
+    to keep results and history scores across the moves of one player
+    (OrderingPlayer does this for the ordering). With `in_place` the search
+    plays moves on one mutable state (make_move/unmake_move).
+    Reversi positions with at most `endgame_empties` empty squares go to
+    the bitboard endgame solver, which finds the same result much faster.
+    With `symmetric` the table stores rotations and reflections of a
+    position as one entry (see symmetry.py).
 
-        v = -np.inf
-        for action in game.actions(state):
-            v = max(v, min_value(game.result(state, action), a, b))
-            if (v >= b):
-                return v
-            a = max(a,v)
-        return v
+    Returns a SearchResult with the search counters (AlphaBetaSearch.statistics) in its info."""
 
-    def min_value(state, a, b):
-        if game.terminal_test(state):
-            return game.utility(state, player)
-
-        v = np.inf
-        for action in game.actions(state):
-            v = min(v, max_value(game.result(state, action), a, b))
-            if v <= a:
-                return v
-            b = min(b, v)
-        return v
-
-    return max(game.actions(state), key=lambda action: min_value(game.result(state, action), a, b))
\ No newline at end of file
+    solved = endgame_move(game, state, endgame_empties)
+    if solved is not None:
+        return solved
+    if ordering is None:
+        ordering = MoveOrdering(game)
+    search = AlphaBetaSearch(game, game.to_move(state), table=table, ordering=ordering,
+                             in_place=in_place, symmetry=game_symmetry(game) if symmetric else None)
+    move = search.best_move(state)
+    return SearchResult(move, search.statistics())
@@ -0,0 +1,98 @@
+class MoveOrdering:
+    """Orders the moves of a node for alpha-beta search, best guesses first.
+
+    Moves are tried in this order: the best move stored in the transposition
+    table, then by square class from the game's `weights_matrix` (corners,
+    the highest weighted squares, first and the X- and C-squares next to them
+    last), and within a class the killer moves of the current ply (moves that
+    caused a cutoff in a sibling node) before the rest by history score (how
+    often and how deep they caused cutoffs so far).
+
+    Killers are cleared for every move searched, but the history table is
+    kept, so passing the same MoveOrdering to a player for all of its moves
+    in a game (see OrderingPlayer) lets later searches learn from earlier ones."""
+
+    def __init__(self, game, killers_per_ply=2):
+        """
+        Set up the tables for a game.
+
+        Args:
+            game: The game being played; its `weights_matrix`, if any, gives the static square scores.
+            killers_per_ply (int): Number of killer moves remembered per ply.
+        """
+        self.square_classes = self.classify_squares(getattr(game, 'weights_matrix', None))
+        self.killers_per_ply = killers_per_ply
+        self.killers = {}
+        self.history = {}
+
+    def new_search(self):
+        """Forget the killer moves of the previous search; the history table is kept."""
+        self.killers = {}
+
+    def classify_squares(self, weights):
+        """Return {(x, y): class}, 1 for the highest weighted squares, -1 for their neighbours and 0 otherwise."""
+        if weights is None:
+            return {}
+        best = max(max(row) for row in weights)
+        corners = [(x, y) for y, row in enumerate(weights) for x, weight in enumerate(row) if weight == best]
+        classes = {}
+        for cx, cy in corners:
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    classes.setdefault((cx + dx, cy + dy), -1)
+        for corner in corners:
+            classes[corner] = 1
+        return classes
+
+    def order(self, actions, player, ply, tt_move=None):
+        """Return the moves sorted best guess first; moves that tie keep their order."""
+        killers = self.killers.get(ply, ())
+        history = self.history
+        classes = self.square_classes
+
+        def key(move):
+            if move == tt_move:
+                return (2, 0, 0)
+            return (classes.get(move, 0), move in killers, history.get((player, move), 0))
+
+        return sorted(actions, key=key, reverse=True)
+
+    def record_cutoff(self, move, player, ply, remaining):
+        """Credit a move that caused a beta cutoff at `ply` with `remaining` plies left to search."""
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.killers_per_ply:]
+        # Deeper cutoffs save more work, so they weigh more (capped for full-depth searches)
+        remaining = min(remaining, 8)
+        self.history[(player, move)] = self.history.get((player, move), 0) + remaining * remaining
+
+
+class OrderingPlayer:
+    """A search player that takes an `ordering` argument (minimax_pruning_player,
+    minimax_limited_pruning_player, minimax_iterative_deepening_player), given
+    the same MoveOrdering for every move of a game, so its history table is
+    kept across the game's moves. Game.play_game calls new_game at the start
+    of every game, which starts a fresh MoveOrdering.
+
+    It can be passed to Game.play_game like a player function."""
+
+    def __init__(self, player, **params):
+        """
+        Args:
+            player: The search player function.
+            params: Other arguments of the player, such as `depth`.
+        """
+        self.player = player
+        self.params = params
+        self.ordering = None
+        self.game = None
+
+    def new_game(self):
+        """Forget the move ordering of the previous game."""
+        self.ordering = None
+
+    def __call__(self, game, state):
+        if self.ordering is None or game is not self.game:
+            self.ordering, self.game = MoveOrdering(game), game
+        return self.player(game, state, ordering=self.ordering, **self.params)
@@ -0,0 +1,180 @@
+import argparse
+import os
+import time
+import warnings
+import numpy as np
+from bitboard_reversi import BitboardReversi
+from game import SearchResult
+from minimax_limited_pruning import minimax_limited_pruning_player
+from reversi import Reversi
+from symmetry import BitboardSymmetry
+
+# One record per position: its canonical key (see symmetry.BitboardSymmetry)
+# and the move to play in the canonical position. Records are sorted by key,
+# so a lookup is a binary search over the memory-mapped file and only the
+# pages it touches are read.
+BOOK_DTYPE = np.dtype([('key', '<u8'), ('x', 'u1'), ('y', 'u1')])
+
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.npy')
+
+
+class OpeningBook:
+    """A read-only table of book moves keyed by position, stored as a NumPy
+    array of BOOK_DTYPE records sorted by key. The file is memory-mapped on
+    the first lookup, so opening a book costs nothing until it is used, and
+    a missing file is an empty book.
+
+    Positions are keyed by their canonical form, so one record serves every
+    rotation and reflection of a position, and the key is the same in
+    Reversi and BitboardReversi, so one book serves both engines."""
+
+    def __init__(self, path=DEFAULT_BOOK):
+        """
+        Args:
+            path: The .npy file written by save_book.
+        """
+        self.path = path
+        self.entries = None
+        self.symmetry = None
+
+    def __getstate__(self):
+        # Worker processes map the file themselves instead of receiving a copy
+        return {'path': self.path, 'entries': None, 'symmetry': None}
+
+    def load(self):
+        """Map the book file, or use an empty book (with a warning) if it does not exist, and return the records."""
+        if self.entries is None:
+            if os.path.exists(self.path):
+                self.entries = np.load(self.path, mmap_mode='r')
+            else:
+                warnings.warn(f"no opening book at {self.path}, build one with opening_book.py; "
+                              f"playing without a book")
+                self.entries = np.zeros(0, dtype=BOOK_DTYPE)
+        return self.entries
+
+    def __len__(self):
+        return len(self.load())
+
+    def lookup(self, game, state):
+        """Return the book move for `state`, or None if the position is not in the book."""
+        entries = self.load()
+        if not isinstance(game, (Reversi, BitboardReversi)) or len(entries) == 0:
+            return None
+        if self.symmetry is None:
+            self.symmetry = BitboardSymmetry()
+        key, t = self.symmetry.canonical(state)
+        keys = entries['key']
+        i = np.searchsorted(keys, np.uint64(key))
+        if i == len(keys) or keys[i] != key:
+            return None
+        move = self.symmetry.from_canonical((int(entries['x'][i]), int(entries['y'][i])), t)
+        # A hash collision with a position from another game could give an illegal move
+        return move if move in state.moves else None
+
+
+class BookPlayer:
+    """A player that plays the book move when the position is in `book`, and
+    asks `player` otherwise. Book moves are returned as a SearchResult with
+    'book' set in the info, so play_game records which moves came from it."""
+
+    def __init__(self, player, book=None):
+        """
+        Args:
+            player: The search player used out of the book.
+            book: An OpeningBook (default: the one at DEFAULT_BOOK).
+        """
+        self.player = player
+        self.book = book if book is not None else OpeningBook()
+
+    def new_game(self):
+        """Pass the start of a game on to the search player, if it keeps state between moves."""
+        if hasattr(self.player, 'new_game'):
+            self.player.new_game()
+
+    def __call__(self, game, state):
+        move = self.book.lookup(game, state)
+        if move is not None:
+            return SearchResult(move, {'book': True})
+        return self.player(game, state)
+
+
+def book_positions(game, plies, symmetry):
+    """Return every position reached in fewer than `plies` moves from the initial position,
+    one per canonical key, by ply, as {key: (state, symmetry to the canonical position)}."""
+    positions = {}
+    frontier = [game.initial]
+    for _ in range(plies):
+        children = []
+        for state in frontier:
+            key, t = symmetry.canonical(state)
+            if key in positions:
+                continue
+            positions[key] = (state, t)
+            if not game.terminal_test(state):
+                children.extend(game.result(state, move) for move in game.actions(state))
+        frontier = children
+    return positions
+
+
+def build_book(game, plies, player, entries=None, progress=None):
+    """
+    Search every position within the first `plies` moves with `player` and
+    record its move.
+
+    Args:
+        game: The game to build the book for.
+        plies (int): Number of opening moves covered.
+        player: The search player whose moves go into the book.
+        entries (dict): Existing {key: move} entries; positions in it are not searched again.
+        progress: Called as progress(searched, total) after each position.
+
+    Returns:
+        dict: The {canonical key: move in the canonical position} entries.
+    """
+    entries = dict(entries or {})
+    symmetry = BitboardSymmetry()
+    positions = [(key, state, t) for key, (state, t) in book_positions(game, plies, symmetry).items()
+                 if not game.terminal_test(state)]
+    for searched, (key, state, t) in enumerate(positions, 1):
+        if key not in entries:
+            move = player(game, state)
+            if isinstance(move, SearchResult):
+                move = move.move
+            entries[key] = symmetry.to_canonical(move, t)
+        if progress is not None:
+            progress(searched, len(positions))
+    return entries
+
+
+def load_entries(path):
+    """Return the {key: move} entries of a book file, or an empty dict if it does not exist."""
+    if not os.path.exists(path):
+        return {}
+    return {int(key): (int(x), int(y)) for key, x, y in np.load(path)}
+
+
+def save_book(entries, path):
+    """Write {canonical key: move} entries as a book file, sorted by key."""
+    records = np.array([(key, x, y) for key, (x, y) in entries.items()], dtype=BOOK_DTYPE)
+    records.sort(order='key')
+    np.save(path, records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a Reversi opening book with depth-limited searches.")
+    parser.add_argument("--plies", type=int, default=5, help="number of opening moves the book covers")
+    parser.add_argument("--depth", type=int, default=6, help="search depth for each book position")
+    parser.add_argument("--output", default=DEFAULT_BOOK, help="book file to write (extended if it exists)")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    game = BitboardReversi()
+    player = lambda game, state: minimax_limited_pruning_player(game, state, depth=args.depth)
+
+    def show_progress(searched, total):
+        if searched % 100 == 0 or searched == total:
+            print(f"{searched}/{total} positions")
+
+    entries = build_book(game, args.plies, player, load_entries(args.output), show_progress)
+    save_book(entries, args.output)
+    print(f"{len(entries)} positions written to {args.output} in {time.perf_counter() - start_time:.1f}s")
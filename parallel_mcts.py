@@ -0,0 +1,136 @@
+import os
+import random
+import time
+from game import SearchResult
+from mcts_tree import MCTSTree, rollout
+from parallel_search import get_pool
+
+# Result counted for each rollout in flight through a node, so that the
+# selections of one batch spread over different paths (a loss for the root player)
+VIRTUAL_LOSS = -1
+
+
+def _search_tree(game, state, iterations, time_budget, seed):
+    """Worker task: search an independent tree and return its root children as [move, visits, wins] and its iteration count."""
+    random.seed(seed)
+    tree = MCTSTree(game, state)
+    info = tree.search(iterations, time_budget)
+    children = [[tree.node_move(child), tree.visits[child], tree.wins[child]] for child in tree.children(tree.root)]
+    return children, info['iterations']
+
+
+def _rollouts(game, states, player, count, seed):
+    """Worker task: play `count` rollouts from each state and return the summed result of each."""
+    random.seed(seed)
+    return [sum(rollout(game, state, player) for _ in range(count)) for state in states]
+
+
+def root_parallel_mcts_player(game, state, iterations=2000, workers=None, time_budget=None):
+    """
+    Root-parallel Monte Carlo Tree Search: each worker process searches its
+    own tree from `state`, with its own random seed, and the visits and wins
+    of the root children are added up over the trees before choosing the
+    move with the best win rate, as mcts_player does.
+
+    Args:
+        game: The game being played.
+        state: The current game state.
+        iterations: Iterations per tree, or None to only use the time budget.
+        workers: Number of worker processes (default: the number of CPUs).
+        time_budget: Wall-clock seconds per tree, or None for no time limit.
+
+    Returns:
+        SearchResult: The move, with the total iterations, the number of
+        workers and the time taken in its info dict.
+    """
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    pool, _ = get_pool(workers)
+    seed = random.getrandbits(32)
+    futures = [pool.submit(_search_tree, game, state, iterations, time_budget, seed + i) for i in range(workers)]
+
+    visits, wins = {}, {}
+    total_iterations = 0
+    for future in futures:
+        children, tree_iterations = future.result()
+        total_iterations += tree_iterations
+        for move, move_visits, move_wins in children:
+            visits[move] = visits.get(move, 0) + move_visits
+            wins[move] = wins.get(move, 0) + move_wins
+
+    # Choose the best move; dicts keep the moves in the order of the first tree
+    best_move = max((move for move in visits if visits[move] > 0), key=lambda move: wins[move] / visits[move])
+    info = {
+        'iterations': total_iterations,
+        'workers': workers,
+        'search_time': time.perf_counter() - start_time,
+    }
+    return SearchResult(best_move, info)
+
+
+def leaf_parallel_mcts_player(game, state, iterations=2000, workers=None, time_budget=None, batch=None,
+                              rollouts_per_leaf=1):
+    """
+    Leaf-parallel Monte Carlo Tree Search: one tree in this process, whose
+    leaves are played out by the worker processes. Each step selects a batch
+    of leaves, adding a virtual loss along the path of each one so that the
+    next selections go elsewhere, plays out `rollouts_per_leaf` rollouts from
+    each in the workers, then takes the virtual losses back and
+    backpropagates the real results.
+
+    Args:
+        game: The game being played.
+        state: The current game state.
+        iterations: Total number of rollouts, or None to only use the time budget.
+        workers: Number of worker processes (default: the number of CPUs).
+        time_budget: Wall-clock seconds per move, or None for no time limit.
+        batch: Leaves selected per step (default: four per worker).
+        rollouts_per_leaf (int): Rollouts played from each selected leaf.
+
+    Returns:
+        SearchResult: The move, with the rollouts played, the number of
+        workers, the tree size and the time taken in its info dict.
+    """
+    if iterations is None and time_budget is None:
+        raise ValueError("an iteration count or a time budget is needed")
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget if time_budget is not None else None
+    workers = workers or os.cpu_count() or 1
+    batch = batch or 4 * workers
+    pool, _ = get_pool(workers)
+    tree = MCTSTree(game, state)
+    player = tree.player
+
+    done = 0
+    while iterations is None or done < iterations:
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        leaves = []
+        for _ in range(batch):
+            node, leaf_state, _, terminal = tree.select_leaf()
+            if terminal:
+                tree.backpropagate(node, rollouts_per_leaf * game.utility(leaf_state, player), rollouts_per_leaf)
+            else:
+                tree.backpropagate(node, VIRTUAL_LOSS, 1)
+                leaves.append((node, leaf_state))
+            done += rollouts_per_leaf
+            if iterations is not None and done >= iterations:
+                break
+
+        # One task per worker, each playing out a share of the leaves
+        chunks = [leaves[i::workers] for i in range(workers) if leaves[i::workers]]
+        seed = random.getrandbits(32)
+        futures = [pool.submit(_rollouts, game, [s for _, s in chunk], player, rollouts_per_leaf, seed + i)
+                   for i, chunk in enumerate(chunks)]
+        for chunk, future in zip(chunks, futures):
+            for (node, _), value in zip(chunk, future.result()):
+                tree.backpropagate(node, -VIRTUAL_LOSS, -1)
+                tree.backpropagate(node, value, rollouts_per_leaf)
+
+    info = {
+        'iterations': done,
+        'workers': workers,
+        'nodes': tree.node_count(),
+        'search_time': time.perf_counter() - start_time,
+    }
+    return SearchResult(tree.best_move(), info)
@@ -0,0 +1,173 @@
+import atexit
+import math
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from alphabeta import AlphaBetaSearch
+from endgame import endgame_move, ENDGAME_EMPTIES
+from game import SearchResult
+from move_ordering import MoveOrdering
+from minimax_limited_pruning import heuristic_evaluator
+from transposition import TranspositionTable
+
+# Pools are kept between moves, one per worker count, since starting the
+# processes costs more than searching a small tree.
+_pools = {}
+
+# Worker process state: the alpha bound shared by all workers, and the
+# game, transposition table and move ordering kept across the root moves of
+# one search.
+_shared_alpha = None
+_worker_game = None
+_worker_table = None
+_worker_ordering = None
+_worker_search_id = None
+
+
+def _init_worker(shared_alpha):
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+
+def get_pool(workers):
+    """Return the process pool (and its shared alpha) for a worker count, starting it on first use."""
+    if workers not in _pools:
+        shared_alpha = multiprocessing.Value('d', -np.inf)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared_alpha,))
+        _pools[workers] = (pool, shared_alpha)
+    return _pools[workers]
+
+
+@atexit.register
+def shutdown_pools():
+    """Stop every worker pool."""
+    for pool, _ in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+
+def _search_root_move(search_id, game_bytes, state, move, index, player, depth, in_place):
+    """
+    Worker task: search the subtree of one root move. The search starts from
+    the best value any worker has found so far (the shared alpha), just below
+    it so that a move tying with the best is still valued exactly, re-reads
+    it at every interior node to narrow its window when a sibling raises it,
+    and raises it itself if it finds something better.
+
+    The game arrives pickled once per search and is unpickled only by the
+    first task of the search a worker runs.
+
+    Returns:
+        tuple: The move's index, its value (or an upper bound on it below the
+        shared alpha), the nodes searched, the table hits and the CPU time spent.
+    """
+    global _worker_game, _worker_table, _worker_ordering, _worker_search_id
+    # CPU time, so that tasks sharing a core do not each count the time they waited
+    start_time = time.process_time()
+    if _worker_search_id != search_id:
+        _worker_game = pickle.loads(game_bytes)
+        _worker_table, _worker_ordering = TranspositionTable(), MoveOrdering(_worker_game)
+        _worker_search_id = search_id
+    game = _worker_game
+
+    hits = _worker_table.hits
+
+    # Read without the lock: a stale value only prunes less
+    shared = _shared_alpha.get_obj()
+    bound = lambda: math.nextafter(shared.value, -math.inf)
+    evaluate = heuristic_evaluator(game, player) if depth is not None else None
+    search = AlphaBetaSearch(game, player, depth=depth, evaluate=evaluate, table=_worker_table,
+                             ordering=_worker_ordering, in_place=in_place, bound=bound)
+    child = game.result(state, move)
+    if in_place:
+        child = game.mutable_state(child)
+    v = search.alphabeta(child, bound(), np.inf, 1)
+
+    with _shared_alpha.get_lock():
+        if v > _shared_alpha.value:
+            _shared_alpha.value = v
+    return index, v, search.nodes, _worker_table.hits - hits, time.process_time() - start_time
+
+
+def parallel_root_search(game, state, depth=None, workers=None, in_place=True):
+    """
+    Alpha-beta search with the root moves split across a process pool. The
+    first move (the best guess of the move ordering) is searched on its own
+    to get a good alpha bound, then the rest are searched in parallel ("young
+    brothers wait"), each worker narrowing its window to the best bound found
+    so far as the others raise it.
+
+    The move returned is the one the serial AlphaBetaSearch with a fresh
+    table and MoveOrdering returns for the same depth: moves are tried in
+    the same order, every move that could be best is valued exactly, and
+    ties go to the move tried first.
+
+    Args:
+        game: The game being played.
+        state: The current game state.
+        depth: Plies to search before the heuristic is applied, or None to search to terminal states.
+        workers: Number of worker processes (default: the number of CPUs).
+        in_place (bool): Whether the workers search with make_move/unmake_move.
+
+    Returns:
+        SearchResult: The move, with nodes, worker time and the workers' CPU utilization in its info dict.
+    """
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    pool, shared_alpha = get_pool(workers)
+    player = game.to_move(state)
+    actions = MoveOrdering(game).order(game.actions(state), player, 0)
+
+    with shared_alpha.get_lock():
+        shared_alpha.value = -np.inf
+    search_id = (os.getpid(), start_time)
+    game_bytes = pickle.dumps(game)
+    submit = lambda i: pool.submit(_search_root_move, search_id, game_bytes, state, actions[i], i, player, depth, in_place)
+
+    results = [submit(0).result()]
+    pending = {submit(i) for i in range(1, len(actions))}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        results.extend(future.result() for future in done)
+
+    # Highest value, and among equal values the move tried first
+    index = max(results, key=lambda r: (r[1], -r[0]))[0]
+    elapsed = time.perf_counter() - start_time
+    worker_time = sum(r[4] for r in results)
+    info = {
+        'nodes': sum(r[2] for r in results),
+        'tt_hits': sum(r[3] for r in results),
+        'workers': workers,
+        'worker_time': worker_time,
+        'search_time': elapsed,
+        # CPU time the work took in the workers, over the wall-clock time it took. This is how
+        # busy the workers kept the cores, not a speedup over the serial search: the extra nodes
+        # the root split searches count too (see benchmark.py parallel-search for the speedup).
+        'utilization': worker_time / elapsed if elapsed > 0 else 0,
+    }
+    if depth is not None:
+        info['depth'] = depth
+    return SearchResult(actions[index], info)
+
+
+def parallel_minimax_limited_pruning_player(game, state, depth=4, workers=None, endgame_empties=ENDGAME_EMPTIES):
+    """Parallel version of minimax_limited_pruning_player: the same depth-limited
+    search, with the root moves split across `workers` processes, and the same
+    switch to the endgame solver."""
+    solved = endgame_move(game, state, endgame_empties)
+    if solved is not None:
+        return solved
+    return parallel_root_search(game, state, depth=depth, workers=workers)
+
+
+def parallel_minimax_pruning_player(game, state, workers=None, endgame_empties=ENDGAME_EMPTIES):
+    """Parallel version of minimax_pruning_player: the same full-depth search,
+    with the root moves split across `workers` processes, and the same switch
+    to the endgame solver."""
+    solved = endgame_move(game, state, endgame_empties)
+    if solved is not None:
+        return solved
+    return parallel_root_search(game, state, workers=workers)
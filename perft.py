@@ -0,0 +1,89 @@
+import argparse
+import time
+from tictactoe import TicTacToe
+from reversi import Reversi
+from bitboard_reversi import BitboardReversi
+
+# Leaf counts at each depth from the initial position. The Reversi figures are
+# the published Othello perft values; they hold here because no game can end
+# (and no player can be without a move) in the first 8 plies. The TicTacToe
+# figures count the positions reached at exactly that depth, so games that
+# were already won before it add nothing.
+REFERENCE_COUNTS = {
+    'tictactoe': [1, 9, 72, 504, 3024, 15120, 54720, 148176, 200448, 127872],
+    'reversi': [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216],
+}
+
+GAMES = {
+    'tictactoe': TicTacToe,
+    'reversi': Reversi,
+    'bitboard': BitboardReversi,
+}
+
+
+def perft(game, state, depth):
+    """
+    Count the positions reached after exactly `depth` moves from `state`.
+
+    Args:
+        game: The game whose `actions` and `result` are exercised.
+        state: The state to start from.
+        depth (int): The number of plies to play out.
+
+    Returns:
+        int: The number of leaf positions at that depth.
+    """
+    if depth == 0:
+        return 1
+    if game.terminal_test(state):
+        return 0
+    if depth == 1:
+        return len(game.actions(state))
+    return sum(perft(game, game.result(state, move), depth - 1) for move in game.actions(state))
+
+
+def run_perft(name, max_depth):
+    """
+    Run perft from the initial position of a game at every depth up to `max_depth`,
+    print the leaf count and throughput, and check the counts against the reference.
+
+    Args:
+        name (str): A key of GAMES.
+        max_depth (int): The deepest depth to run.
+
+    Returns:
+        bool: True if every count matched its reference value.
+    """
+    game = GAMES[name]()
+    reference = REFERENCE_COUNTS['tictactoe' if name == 'tictactoe' else 'reversi']
+    all_match = True
+
+    print(f"perft for {name}")
+    for depth in range(1, max_depth + 1):
+        start_time = time.perf_counter()
+        nodes = perft(game, game.initial, depth)
+        elapsed = time.perf_counter() - start_time
+
+        if depth < len(reference):
+            match = nodes == reference[depth]
+            all_match = all_match and match
+            status = "ok" if match else f"MISMATCH (expected {reference[depth]})"
+        else:
+            status = "no reference"
+        rate = nodes / elapsed if elapsed > 0 else float('inf')
+        print(f"  depth {depth}: {nodes} nodes in {elapsed:.3f}s ({rate:,.0f} nodes/s) {status}")
+    return all_match
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count move-generation leaf nodes and report throughput.")
+    parser.add_argument("--game", choices=sorted(GAMES) + ['all'], default='all', help="game to run perft on")
+    parser.add_argument("--depth", type=int, default=None, help="deepest depth to run (default: 9 for tictactoe, 6 for reversi)")
+    args = parser.parse_args()
+
+    names = sorted(GAMES) if args.game == 'all' else [args.game]
+    ok = True
+    for name in names:
+        depth = args.depth or (9 if name == 'tictactoe' else 6)
+        ok = run_perft(name, depth) and ok
+    raise SystemExit(0 if ok else 1)
@@ -1,13 +1,69 @@
+import copy
 from game import Game
-from collections import namedtuple
+from zobrist import ZobristKeys
 
-GameState = namedtuple('GameState', 'to_move, utility, board, moves')
+class GameState:
+    """A Reversi position: the player to move, the board, its Zobrist hash,
+    and the legal moves of both players and the utility. The moves and the
+    utility are worked out from the board the first time they are read and
+    then kept, so each side's moves are generated at most once per position
+    and only when something asks for them."""
+
+    __slots__ = ('to_move', 'board', 'zobrist', 'game', '_moves', '_opponent_moves', '_utility')
+
+    def __init__(self, to_move, utility=None, board=None, moves=None, zobrist=0, game=None, opponent_moves=None):
+        self.to_move = to_move
+        self.board = board
+        self.zobrist = zobrist
+        self.game = game
+        self._moves = moves
+        self._opponent_moves = opponent_moves
+        self._utility = utility
+
+    @property
+    def moves(self):
+        """The valid moves of the player to move."""
+        if self._moves is None:
+            self._moves = self.game.getValidMoves(self.board, self.to_move)
+        return self._moves
+
+    @property
+    def opponent_moves(self):
+        """The valid moves the other player would have on this board."""
+        if self._opponent_moves is None:
+            self._opponent_moves = self.game.getValidMoves(self.board, 'O' if self.to_move == 'X' else 'X')
+        return self._opponent_moves
+
+    @property
+    def utility(self):
+        """1 if 'X' has won, -1 if 'O' has won, 0 otherwise; see Reversi.compute_utility."""
+        if self._utility is None:
+            self._utility = self.game.score_utility(self.board) if not self.opponent_moves else 0
+        return self._utility
+
+    def __eq__(self, other):
+        return (isinstance(other, GameState) and self.to_move == other.to_move and
+                self.zobrist == other.zobrist and self.board == other.board)
+
+    def __hash__(self):
+        return self.zobrist
+
+    def __deepcopy__(self, memo):
+        # The game is shared; the cached move lists are never changed in place
+        return GameState(self.to_move, self._utility, copy.deepcopy(self.board, memo), self._moves, self.zobrist,
+                         self.game, self._opponent_moves)
+
+    def __repr__(self):
+        return 'GameState(to_move={!r}, utility={!r}, board={!r}, moves={!r}, zobrist={!r})'.format(
+            self.to_move, self.utility, self.board, self.moves, self.zobrist)
 
 class Reversi(Game):
     """Play Reversi on an 8 x 8 board, with Max (first player) playing 'X'.
-    A state has the player to move, a cached utility, a list of moves in
-    the form of a list of (x, y) positions, and a board, in the form of
-    a dict of {(x, y): Player} entries, where Player is 'X' or 'O'. Code
+    A state has the player to move, a lazily cached utility, a lazily
+    cached list of moves in the form of a list of (x, y) positions, and a
+    board, in the form of a dict of {(x, y): Player} entries, where Player
+    is 'X' or 'O', and a Zobrist hash of the position that is updated
+    incrementally. Code
     adapted from http://inventwithpython.com/chapter15.html """
 
     def __init__(self):
@@ -26,8 +82,12 @@ class Reversi(Game):
         # Retrieve initial valid moves for the starting player 'X'
         moves = self.getValidMoves(board, 'X')
 
+        # Random keys for hashing positions, one per (player, square) pair
+        self.zobrist_keys = ZobristKeys([(x, y) for x in range(8) for y in range(8)])
+
         # Store the initial game state including board, current player, and valid moves
-        self.initial = GameState(to_move='X', utility=0, board=board, moves=moves)
+        self.initial = GameState(to_move='X', utility=0, board=board, moves=moves,
+                                 zobrist=self.zobrist_keys.hash_board(board, 'X'), game=self)
 
         # Precompute the weights matrix for use in stability evaluations during the game
         self.weights_matrix = self.weighted_matrix()
@@ -43,24 +103,78 @@ class Reversi(Game):
         board = self.getBoardCopy(state.board)
         tilesToFlip = self.isValidMove(board, state.to_move, move[0], move[1])
         board[(move[0],move[1])] = state.to_move
+        opponent = 'O' if state.to_move == 'X' else 'X'
+        zobrist = self.zobrist_keys.place(state.zobrist, (move[0], move[1]), state.to_move)
         for x, y in tilesToFlip:
             board[(x,y)] = state.to_move
+            zobrist = self.zobrist_keys.flip(zobrist, (x, y), opponent, state.to_move)
 
-        if state.to_move == 'X':
-            moves = self.getValidMoves(board, 'O')
-        else:
-            moves = self.getValidMoves(board, 'X')
-        return GameState(to_move=('O' if state.to_move == 'X' else 'X'),
-                        utility=self.compute_utility(board, move, state.to_move),
-                        board=board, moves=moves)
+        # The moves of both players, and with them the utility, are computed when first needed
+        return GameState(to_move=opponent, board=board, zobrist=zobrist, game=self)
 
     def utility(self, state, player):
         """Return the value to player; 1 for win, -1 for loss, 0 otherwise."""
         return state.utility if player == 'X' else -state.utility
 
+    def mutable_state(self, state):
+        """Return a copy of state, with its own board, for make_move and unmake_move."""
+        return GameState(state.to_move, state._utility, self.getBoardCopy(state.board), state._moves, state.zobrist,
+                         self, state._opponent_moves)
+
+    def make_move(self, state, move):
+        """Play a legal move on a mutable state in place and return what unmake_move needs to take it back."""
+        player = state.to_move
+        opponent = 'O' if player == 'X' else 'X'
+        tilesToFlip = self.isValidMove(state.board, player, move[0], move[1])
+        undo = (move, tilesToFlip, state._utility, state._moves, state._opponent_moves, state.zobrist)
+
+        state.board[move] = player
+        zobrist = self.zobrist_keys.place(state.zobrist, move, player)
+        for x, y in tilesToFlip:
+            state.board[(x, y)] = player
+            zobrist = self.zobrist_keys.flip(zobrist, (x, y), opponent, player)
+
+        state.to_move = opponent
+        state.zobrist = zobrist
+        state._moves = state._opponent_moves = state._utility = None
+        return undo
+
+    def unmake_move(self, state, undo):
+        """Take back a move played by make_move."""
+        move, tilesToFlip, state._utility, state._moves, state._opponent_moves, state.zobrist = undo
+        opponent = state.to_move
+        del state.board[move]
+        for x, y in tilesToFlip:
+            state.board[(x, y)] = opponent
+        state.to_move = 'O' if opponent == 'X' else 'X'
+
     def terminal_test(self, state):
-        """A state is terminal if it is won or there are no empty squares."""
-        return self.getValidMoves(state.board, state.to_move) == []
+        """A state is terminal if the player to move has no valid moves."""
+        return not state.moves
+
+    def legal_moves(self, state, player):
+        """Return the valid moves of either player in a state, from the state's cache."""
+        if not isinstance(state, GameState):
+            return self.getValidMoves(state.board, player)
+        return state.moves if player == state.to_move else state.opponent_moves
+
+    def playout(self, state, player, played=None):
+        """Play random moves from `state` to the end and return the utility for `player`.
+        The game is played on bitboards (bitboard_reversi.random_playout), with no state per move.
+        If `played` is a list, the moves played are appended to it."""
+        from bitboard_reversi import SQUARES, SQUARE_BITS, random_playout
+
+        own = opp = 0
+        for square, tile in state.board.items():
+            if tile == state.to_move:
+                own |= SQUARE_BITS[square]
+            else:
+                opp |= SQUARE_BITS[square]
+        indices = [] if played is not None else None
+        value = random_playout(own, opp, indices)
+        if played is not None:
+            played.extend(SQUARES[index] for index in indices)
+        return value if player == state.to_move else -value
 
     def display(self, state):
         """Print the game board with the current valid moves highlighted for visualization."""
@@ -89,16 +203,20 @@ class Reversi(Game):
     def compute_utility(self, board, move, player):
         """If 'X' wins with this move, return 1; if 'O' wins return -1; else return 0."""
         if self.getValidMoves(board, player) == []:
-            scores = self.getScoreOfBoard(board)
-            if scores['X'] > scores['O']:
-                return 1
-            elif scores['X'] == scores['O']:
-                return 0
-            else:
-                return -1
+            return self.score_utility(board)
         else:
             return 0
 
+    def score_utility(self, board):
+        """Return 1 if 'X' has more tiles on the board, -1 if 'O' has, and 0 on a tie."""
+        scores = self.getScoreOfBoard(board)
+        if scores['X'] > scores['O']:
+            return 1
+        elif scores['X'] == scores['O']:
+            return 0
+        else:
+            return -1
+
     def getValidMoves(self, board, tile):
         """Return a list of all valid move coordinates for the given player on the specified board."""
         validMoves = []
@@ -174,8 +292,11 @@ class Reversi(Game):
                 oscore += 1
         return {'X':xscore, 'O':oscore}
     
-    def evaluateHeuristicFunction(self, state):
-        """Calculate and return the total heuristic score for the given game state."""
+    def evaluateHeuristicFunction(self, state, player=None):
+        """Calculate and return the total heuristic score for the given game state, from the point of view of player (by default the player to move)."""
+        if player is None:
+            player = state.to_move
+        opponent = 'O' if player == 'X' else 'X'
         total_score = 0
         weight_parity = 10
         weight_corners_captured = 801.724
@@ -183,9 +304,26 @@ class Reversi(Game):
         weight_mobility = 78.922
         weight_stability = 10
         
-        total_score = weight_parity * self.coinParity(state.board) + weight_corners_captured * self.cornersCaptured(state.board, state.to_move) + weight_corners_proximity * self.cornerProximity(state.board, state.to_move) + weight_mobility * self.mobility(state.board, state.to_move) + weight_stability * self.stability(state.board, state.to_move)
+        total_score = weight_parity * self.coinParity(state.board) + weight_corners_captured * self.cornersCaptured(state.board, player) + weight_corners_proximity * self.cornerProximity(state.board, player) + weight_mobility * self.mobility(state.board, player, self.legal_moves(state, player), self.legal_moves(state, opponent)) + weight_stability * self.stability(state.board, player)
         return total_score
     
+    def evaluateHeuristicBatch(self, boards, players):
+        """Score many boards, given as an (N, 8, 8) int8 array, in one vectorized pass; see reversi_batch.evaluate_batch."""
+        import reversi_batch
+        return reversi_batch.evaluate_batch(boards, players)
+
+    def evaluate_leaves(self, states, player):
+        """Value many leaf states of a search at once: the utility to player if terminal, the heuristic from player's side otherwise."""
+        import reversi_batch
+        to_move = [reversi_batch.player_sign(state.to_move) for state in states]
+        return reversi_batch.leaf_values(reversi_batch.board_array(states), to_move, player)
+
+    def batch_rollout(self, states, n):
+        """Play n random games to the end from each state in one vectorized computation, and return a
+        (len(states), n) array of the final utilities for 'X'; see reversi_batch.batch_rollout."""
+        import reversi_batch
+        return reversi_batch.batch_rollout(states, n)
+
     def coinParity(self, board):
         """Calculate and return the score based on the relative difference in the number of discs (coins) between the two players."""
         score = 0
@@ -204,13 +342,18 @@ class Reversi(Game):
         return score
         
     
-    def mobility(self, board, player):
-        """Evaluate and return the mobility score based on the difference in the number of valid moves available to the player and their opponent."""
+    def mobility(self, board, player, player_moves=None, opponent_moves=None):
+        """Evaluate and return the mobility score based on the difference in the number of valid moves available to the player and their opponent.
+        Move lists already known (e.g. cached in a state) can be passed in to avoid generating them again."""
         score = 0
         opponent = 'O' if player == 'X' else 'X'
     
-        max_player_moves = len(self.getValidMoves(board, player))
-        min_player_moves = len(self.getValidMoves(board, opponent))
+        if player_moves is None:
+            player_moves = self.getValidMoves(board, player)
+        if opponent_moves is None:
+            opponent_moves = self.getValidMoves(board, opponent)
+        max_player_moves = len(player_moves)
+        min_player_moves = len(opponent_moves)
         
         if (max_player_moves + min_player_moves) != 0:
             if max_player_moves > min_player_moves:
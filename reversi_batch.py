@@ -0,0 +1,308 @@
+import numpy as np
+
+# Boards are (N, 8, 8) int8 arrays indexed [n, y, x], holding 1 for an 'X'
+# disc, -1 for an 'O' disc and 0 for an empty square. Players are given the
+# same way, as 1 for 'X' and -1 for 'O'.
+
+# Square weights of Reversi.weighted_matrix, indexed [y, x]
+_QUADRANT = np.array([[20, -3, 11, 8], [-3, -7, -4, 1], [11, -4, 2, 2], [8, 1, 2, -3]])
+_TOP = np.hstack([_QUADRANT, _QUADRANT[:, ::-1]])
+WEIGHTS = np.vstack([_TOP, _TOP[::-1]])
+
+# The corner squares Reversi.cornersCaptured and Reversi.cornerProximity look
+# at, written 1-indexed there; only those that land on the 0-indexed board can
+# hold a disc, so the others are dropped (an off-board corner counts as empty).
+_ON_BOARD = lambda square: 0 <= square[0] < 8 and 0 <= square[1] < 8
+CAPTURED_CORNERS = [c for c in [(1, 1), (1, 8), (8, 1), (8, 8)] if _ON_BOARD(c)]
+CORNER_NEIGHBOURS = [
+    (corner if _ON_BOARD(corner) else None, [n for n in neighbours if _ON_BOARD(n)])
+    for corner, neighbours in [
+        ((1, 1), [(1, 2), (2, 1), (2, 2)]),
+        ((1, 8), [(1, 7), (2, 7), (2, 8)]),
+        ((8, 1), [(7, 1), (7, 2), (8, 2)]),
+        ((8, 8), [(7, 7), (7, 8), (8, 7)]),
+    ]
+]
+
+
+def player_sign(player):
+    """Return 1 for 'X' and -1 for 'O'."""
+    return 1 if player == 'X' else -1
+
+
+def board_array(states):
+    """
+    Stack the boards of many Reversi or BitboardReversi states.
+
+    Args:
+        states: A sequence of states with either a dict `board` or `xdiscs`/`odiscs` bitboards.
+
+    Returns:
+        np.ndarray: An (N, 8, 8) int8 array of the boards.
+    """
+    if states and hasattr(states[0], 'xdiscs'):
+        return bitboards_to_array([s.xdiscs for s in states], [s.odiscs for s in states])
+    boards = np.zeros((len(states), 8, 8), dtype=np.int8)
+    for n, state in enumerate(states):
+        for (x, y), tile in state.board.items():
+            boards[n, y, x] = 1 if tile == 'X' else -1
+    return boards
+
+
+def bitboards_to_array(xdiscs, odiscs):
+    """Convert lists of 'X' and 'O' bitboards (square (x, y) on bit x * 8 + y) to an (N, 8, 8) int8 array."""
+    xs = from_bitboards(np.array(xdiscs, dtype=np.uint64))
+    os = from_bitboards(np.array(odiscs, dtype=np.uint64))
+    return xs.astype(np.int8) - os.astype(np.int8)
+
+
+# Move generation works on one uint64 bitboard per board (square (x, y) on bit
+# x * 8 + y, as in bitboard_reversi), shifting whole arrays of them at once.
+_FULL = np.uint64(0xFFFFFFFFFFFFFFFF)
+_NOT_Y0 = np.uint64(0xFEFEFEFEFEFEFEFE)
+_NOT_Y7 = np.uint64(0x7F7F7F7F7F7F7F7F)
+_SHIFTS = [
+    (1, _NOT_Y0), (9, _NOT_Y0), (8, _FULL), (7, _NOT_Y7),
+    (-1, _NOT_Y7), (-9, _NOT_Y7), (-8, _FULL), (-7, _NOT_Y0),
+]
+
+
+def to_bitboards(squares):
+    """Pack an (N, 8, 8) bool array into an (N,) uint64 array of bitboards."""
+    bits = np.ascontiguousarray(np.asarray(squares, dtype=bool).transpose(0, 2, 1)).reshape(-1, 64)
+    return np.packbits(bits, axis=1, bitorder='little').view('<u8').reshape(-1).astype(np.uint64)
+
+
+def from_bitboards(bitboards):
+    """Unpack an (N,) uint64 array of bitboards into an (N, 8, 8) bool array."""
+    # Byte x of a bitboard holds column x, and bit y of that byte is row y
+    raw = np.asarray(bitboards, dtype=np.uint64).astype('<u8').view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(raw, axis=1, bitorder='little').reshape(-1, 8, 8).transpose(0, 2, 1).astype(bool)
+
+
+def popcount(bitboards):
+    """Count the set bits of each bitboard."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitboards).astype(np.int64)
+    return from_bitboards(bitboards).sum(axis=(1, 2))
+
+
+def _shift(bits, amount, mask):
+    """Shift uint64 bitboards one step in a direction, dropping squares that fall off the board."""
+    if amount > 0:
+        return (bits << np.uint64(amount)) & mask
+    return (bits >> np.uint64(-amount)) & mask
+
+
+def valid_move_bitboards(own, opp):
+    """Return, as (N,) uint64 bitboards, the valid moves of the owners of `own` against `opp`."""
+    empty = ~(own | opp)
+    moves = np.zeros_like(own)
+    for amount, mask in _SHIFTS:
+        run = _shift(own, amount, mask) & opp
+        for _ in range(5):
+            run |= _shift(run, amount, mask) & opp
+        moves |= _shift(run, amount, mask) & empty
+    return moves
+
+
+def flip_bitboards(own, opp, move_bits):
+    """Return, as (N,) uint64 bitboards, the discs flipped when the owners of `own` play on `move_bits`."""
+    flips = np.zeros_like(own)
+    for amount, mask in _SHIFTS:
+        # The opponent's discs in a line from the move, flipped if one of the player's discs ends it
+        run = _shift(move_bits, amount, mask) & opp
+        for _ in range(5):
+            run |= _shift(run, amount, mask) & opp
+        closed = (_shift(run, amount, mask) & own) != 0
+        flips |= np.where(closed, run, np.uint64(0))
+    return flips
+
+
+def legal_move_masks(own, opp):
+    """
+    Find the valid moves of many boards at once.
+
+    Args:
+        own: (N, 8, 8) bool array of the discs of the player to move.
+        opp: (N, 8, 8) bool array of the opponent's discs.
+
+    Returns:
+        np.ndarray: (N, 8, 8) bool array of the squares the player may play.
+    """
+    return from_bitboards(valid_move_bitboards(to_bitboards(own), to_bitboards(opp)))
+
+
+def move_counts(boards):
+    """Return the number of valid moves of 'X' and of 'O' on each of an (N, 8, 8) array of boards."""
+    x_bits, o_bits = to_bitboards(boards == 1), to_bitboards(boards == -1)
+    return popcount(valid_move_bitboards(x_bits, o_bits)), popcount(valid_move_bitboards(o_bits, x_bits))
+
+
+def evaluate_batch(boards, players, counts=None):
+    """
+    Compute Reversi.evaluateHeuristicFunction for many boards in one pass.
+
+    Args:
+        boards: (N, 8, 8) int8 array of boards.
+        players: The player each board is scored for, as a scalar or an (N,) array of 1 ('X') / -1 ('O').
+        counts: Optional ((N,), (N,)) counts of the valid moves of 'X' and 'O', if already known.
+
+    Returns:
+        np.ndarray: (N,) float64 array of heuristic scores, equal to the per-state function's.
+    """
+    weight_parity = 10
+    weight_corners_captured = 801.724
+    weight_corners_proximity = 382.026
+    weight_mobility = 78.922
+    weight_stability = 10
+
+    boards = np.asarray(boards, dtype=np.int8)
+    players = np.broadcast_to(np.asarray(players, dtype=np.int64), boards.shape[:1])
+    # Board from each scoring player's point of view: 1 for own discs, -1 for the opponent's
+    relative = boards.astype(np.int64) * players[:, None, None]
+
+    x_coins = (boards == 1).sum(axis=(1, 2))
+    o_coins = (boards == -1).sum(axis=(1, 2))
+
+    x_moves, o_moves = counts if counts is not None else move_counts(boards)
+    own_moves = np.where(players == 1, x_moves, o_moves)
+    opp_moves = np.where(players == 1, o_moves, x_moves)
+
+    total_score = (weight_parity * _relative_share(x_coins, o_coins) +
+                   weight_corners_captured * _corners_captured(relative) +
+                   weight_corners_proximity * _corner_proximity(boards, relative) +
+                   weight_mobility * _relative_share(own_moves, opp_moves) +
+                   weight_stability * (relative * WEIGHTS).sum(axis=(1, 2)))
+    return total_score
+
+
+def _relative_share(mine, theirs):
+    """The share of the larger of two counts, as in Reversi.coinParity and Reversi.mobility."""
+    total = mine + theirs
+    safe_total = np.where(total == 0, 1, total)
+    score = np.where(mine > theirs, 100 * mine / safe_total, 0.0)
+    return np.where(theirs > mine, 100 * theirs / safe_total, score)
+
+
+def _corners_captured(relative):
+    """Reversi.cornersCaptured for many boards."""
+    score = np.zeros(relative.shape[0], dtype=np.int64)
+    for x, y in CAPTURED_CORNERS:
+        score += relative[:, y, x]
+    return 25 * score
+
+
+def _corner_proximity(boards, relative):
+    """Reversi.cornerProximity for many boards."""
+    score = np.zeros(relative.shape[0], dtype=np.int64)
+    for corner, neighbours in CORNER_NEIGHBOURS:
+        near = np.zeros(relative.shape[0], dtype=np.int64)
+        for x, y in neighbours:
+            near += relative[:, y, x]
+        if corner is not None:
+            near = np.where(boards[:, corner[1], corner[0]] == 0, near, 0)
+        score += near
+    return -12.5 * score
+
+
+def leaf_values(boards, to_move, player):
+    """
+    Value many leaf positions of a search the way AlphaBetaSearch does one at
+    a time: the game's utility for terminal positions, and the heuristic from
+    `player`'s point of view for the rest.
+
+    Args:
+        boards: (N, 8, 8) int8 array of boards.
+        to_move: (N,) array of the player to move in each, as 1 ('X') / -1 ('O').
+        player: The searching player, 'X' or 'O'.
+
+    Returns:
+        np.ndarray: (N,) float64 array of values.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    to_move = np.asarray(to_move)
+    x_moves, o_moves = move_counts(boards)
+    sign = player_sign(player)
+
+    values = evaluate_batch(boards, sign, (x_moves, o_moves))
+
+    # Reversi.terminal_test and Reversi.compute_utility: the game is over when the player
+    # to move has no move, and decided only if the player who just moved has none either
+    mover_moves = np.where(to_move == 1, o_moves, x_moves)
+    to_move_moves = np.where(to_move == 1, x_moves, o_moves)
+    difference = boards.sum(axis=(1, 2), dtype=np.int64)
+    utility = np.where(mover_moves == 0, np.sign(difference), 0) * sign
+    return np.where(to_move_moves == 0, utility, values)
+
+
+_BIT_INDEX = np.arange(64, dtype=np.uint64)
+
+
+def random_playouts(xdiscs, odiscs, x_to_move, rng=None):
+    """
+    Play random games from many positions in lockstep: at every step each
+    unfinished game plays a uniformly random legal move, until the player to
+    move has none. As in Reversi.compute_utility, a finished game is only
+    decided if the player who moved last has no move either.
+
+    Args:
+        xdiscs, odiscs: (N,) uint64 bitboards of the positions.
+        x_to_move: (N,) bool array, True where 'X' is to move.
+        rng: A numpy Generator or RandomState; the global np.random if None.
+
+    Returns:
+        np.ndarray: (N,) int8 array of the final utility for 'X' (1, -1 or 0).
+    """
+    rng = rng if rng is not None else np.random
+    xs = np.array(xdiscs, dtype=np.uint64)
+    os = np.array(odiscs, dtype=np.uint64)
+    x_to_move = np.array(x_to_move, dtype=bool)
+    active = np.arange(len(xs))
+    while len(active):
+        own = np.where(x_to_move[active], xs[active], os[active])
+        opp = np.where(x_to_move[active], os[active], xs[active])
+        moves = valid_move_bitboards(own, opp)
+        playing = moves != 0
+        active, own, opp, moves = active[playing], own[playing], opp[playing], moves[playing]
+        if not len(active):
+            break
+
+        # Pick the k-th set bit of each board's moves, k uniform below the number of moves
+        counts = popcount(moves)
+        k = (rng.random(len(active)) * counts).astype(np.int64)
+        ranks = np.cumsum((moves[:, None] >> _BIT_INDEX) & np.uint64(1), axis=1)
+        move_bits = np.uint64(1) << np.argmax(ranks > k[:, None].astype(np.uint64), axis=1).astype(np.uint64)
+
+        flips = flip_bitboards(own, opp, move_bits)
+        own |= move_bits | flips
+        opp ^= flips
+        x_moved = x_to_move[active]
+        xs[active] = np.where(x_moved, own, opp)
+        os[active] = np.where(x_moved, opp, own)
+        x_to_move[active] = ~x_moved
+
+    own = np.where(x_to_move, xs, os)
+    opp = np.where(x_to_move, os, xs)
+    decided = valid_move_bitboards(opp, own) == 0
+    return np.where(decided, np.sign(popcount(xs) - popcount(os)), 0).astype(np.int8)
+
+
+def batch_rollout(states, n, rng=None):
+    """
+    Play `n` random games to the end from each of many Reversi or
+    BitboardReversi states, all in one vectorized computation.
+
+    Args:
+        states: A sequence of states.
+        n (int): Number of playouts per state.
+        rng: A numpy Generator or RandomState; the global np.random if None.
+
+    Returns:
+        np.ndarray: (len(states), n) int8 array of the final utility for 'X' (1, -1 or 0).
+    """
+    boards = board_array(list(states))
+    xdiscs = np.repeat(to_bitboards(boards == 1), n)
+    odiscs = np.repeat(to_bitboards(boards == -1), n)
+    x_to_move = np.repeat([state.to_move == 'X' for state in states], n)
+    return random_playouts(xdiscs, odiscs, x_to_move, rng).reshape(len(states), n)
@@ -0,0 +1,249 @@
+import argparse
+import random
+from bitboard_reversi import BitboardReversi, SQUARES, SQUARE_BITS
+from reversi import Reversi
+from tictactoe import TicTacToe
+
+# The eight symmetries of a square board are numbered 0-7. Symmetry t maps a
+# square (x, y) by, in this order: swapping x and y if t & 4, mirroring x
+# if t & 2, and mirroring y if t & 1. Symmetry 0 is the identity. A board
+# that is not square only has the four symmetries that do not swap x and y.
+SYMMETRIES = range(8)
+
+
+def transform_square(square, t, low, high):
+    """Map a square by symmetry t of the board whose corners are `low` and `high` (both (x, y))."""
+    x, y = square
+    if t & 4:
+        x, y = y - low[1] + low[0], x - low[0] + low[1]
+    if t & 2:
+        x = low[0] + high[0] - x
+    if t & 1:
+        y = low[1] + high[1] - y
+    return (x, y)
+
+
+def flip_x(bits):
+    """Mirror a Reversi bitboard in x (x -> 7 - x): x is the byte, so reverse the bytes."""
+    return int.from_bytes(bits.to_bytes(8, 'little'), 'big')
+
+
+def flip_y(bits):
+    """Mirror a Reversi bitboard in y (y -> 7 - y): reverse the bits of every byte."""
+    bits = ((bits >> 1) & 0x5555555555555555) | ((bits & 0x5555555555555555) << 1)
+    bits = ((bits >> 2) & 0x3333333333333333) | ((bits & 0x3333333333333333) << 2)
+    return ((bits >> 4) & 0x0F0F0F0F0F0F0F0F) | ((bits & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def transpose(bits):
+    """Swap x and y on a Reversi bitboard (bit x * 8 + y -> bit y * 8 + x) with three delta swaps."""
+    t = 0x0F0F0F0F00000000 & (bits ^ (bits << 28))
+    bits ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (bits ^ (bits << 14))
+    bits ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (bits ^ (bits << 7))
+    bits ^= t ^ (t >> 7)
+    return bits
+
+
+def transform_bits(bits, t):
+    """Map a Reversi bitboard by symmetry t."""
+    if t & 4:
+        bits = transpose(bits)
+    if t & 2:
+        bits = flip_x(bits)
+    if t & 1:
+        bits = flip_y(bits)
+    return bits
+
+
+class BoardSymmetry:
+    """The symmetries of a board of squares, for games whose states hold a
+    {square: player} board and a Zobrist hash (TicTacToe).
+
+    canonical(state) picks, of all the symmetric images of a position, the
+    one with the lowest Zobrist hash, and returns that hash as the key under
+    which a cache stores the position, with the symmetry that maps the state
+    to it. A move to cache goes through to_canonical with that symmetry, and
+    a cached move comes back through from_canonical, so positions that are
+    rotations or reflections of each other share one entry."""
+
+    def __init__(self, squares, zobrist_keys):
+        """
+        Args:
+            squares: Every square of the board.
+            zobrist_keys: The game's ZobristKeys.
+        """
+        squares = list(squares)
+        low = (min(x for x, _ in squares), min(y for _, y in squares))
+        high = (max(x for x, _ in squares), max(y for _, y in squares))
+        square_set = set(squares)
+        self.maps = []
+        for t in SYMMETRIES:
+            mapping = {square: transform_square(square, t, low, high) for square in squares}
+            if set(mapping.values()) == square_set:
+                self.maps.append(mapping)
+        self.inverse_maps = [{image: square for square, image in mapping.items()} for mapping in self.maps]
+        self.zobrist_keys = zobrist_keys
+
+    def canonical(self, state):
+        """Return the canonical key of the position and the index of the symmetry that maps it there."""
+        keys = self.zobrist_keys.keys
+        side = self.zobrist_keys.side if state.to_move == 'O' else 0
+        best_key, best_t = None, 0
+        for t, mapping in enumerate(self.maps):
+            key = side
+            for square, player in state.board.items():
+                key ^= keys[player][mapping[square]]
+            if best_key is None or key < best_key:
+                best_key, best_t = key, t
+        return best_key, best_t
+
+    def to_canonical(self, move, t):
+        """Map a move of the position to the canonical position."""
+        return self.maps[t][move]
+
+    def from_canonical(self, move, t):
+        """Map a move of the canonical position back to the position."""
+        return self.inverse_maps[t][move]
+
+
+class BitboardSymmetry:
+    """The eight symmetries of the Reversi board, with the same interface as
+    BoardSymmetry, for either Reversi engine. Positions are transformed as
+    bitboards and the canonical key is the Zobrist hash of the image with the
+    lowest (X discs, O discs), which is the same in both engines. The
+    initial position is its own image under four of the symmetries."""
+
+    def __init__(self):
+        self.zobrist_keys = BitboardReversi().zobrist_keys
+        self.maps = [{square: SQUARES[transform_bits(SQUARE_BITS[square], t).bit_length() - 1] for square in SQUARES}
+                     for t in SYMMETRIES]
+        self.inverse_maps = [{image: square for square, image in mapping.items()} for mapping in self.maps]
+
+    def canonical(self, state):
+        """Return the canonical key of the position and the index of the symmetry that maps it there."""
+        if hasattr(state, 'xdiscs'):
+            xdiscs, odiscs = state.xdiscs, state.odiscs
+        else:
+            xdiscs = sum(SQUARE_BITS[square] for square, player in state.board.items() if player == 'X')
+            odiscs = sum(SQUARE_BITS[square] for square, player in state.board.items() if player == 'O')
+        best, best_t = None, 0
+        for t in SYMMETRIES:
+            image = (transform_bits(xdiscs, t), transform_bits(odiscs, t))
+            if best is None or image < best:
+                best, best_t = image, t
+        return self.bits_hash(best[0], best[1], state.to_move), best_t
+
+    def bits_hash(self, xdiscs, odiscs, to_move):
+        """Return the Zobrist hash of a position given as bitboards."""
+        keys = self.zobrist_keys.keys
+        key = self.zobrist_keys.side if to_move == 'O' else 0
+        for player, bits in (('X', xdiscs), ('O', odiscs)):
+            while bits:
+                low = bits & -bits
+                key ^= keys[player][SQUARES[low.bit_length() - 1]]
+                bits ^= low
+        return key
+
+    def to_canonical(self, move, t):
+        """Map a move of the position to the canonical position."""
+        return self.maps[t][move]
+
+    def from_canonical(self, move, t):
+        """Map a move of the canonical position back to the position."""
+        return self.inverse_maps[t][move]
+
+
+def game_symmetry(game):
+    """Return the symmetry object for a game's positions: BitboardSymmetry for
+    either Reversi engine, BoardSymmetry for TicTacToe, None for other games."""
+    if isinstance(game, (Reversi, BitboardReversi)):
+        return BitboardSymmetry()
+    if isinstance(game, TicTacToe):
+        return BoardSymmetry(game.zobrist_keys.keys['X'], game.zobrist_keys)
+    return None
+
+
+def count_positions(game, plies, symmetry=None):
+    """Return the number of distinct positions after each number of moves up to
+    `plies`, telling positions apart by hash, or by canonical key if `symmetry` is given."""
+    counts = []
+    frontier = [game.initial]
+    for _ in range(plies + 1):
+        distinct = {}
+        for state in frontier:
+            key = symmetry.canonical(state)[0] if symmetry is not None else state.zobrist
+            distinct.setdefault(key, state)
+        counts.append(len(distinct))
+        frontier = [game.result(state, move) for state in distinct.values() if not game.terminal_test(state)
+                    for move in game.actions(state)]
+    return counts
+
+
+def mirrored_state(game, state, mapping):
+    """Return the image of a Reversi (dict engine) or TicTacToe state under a square mapping."""
+    board = {mapping[square]: player for square, player in state.board.items()}
+    zobrist = game.zobrist_keys.hash_board(board, state.to_move)
+    if isinstance(game, Reversi):
+        return type(state)(to_move=state.to_move, board=board, zobrist=zobrist, game=game)
+    return state._replace(board=board, moves=[mapping[move] for move in state.moves], zobrist=zobrist)
+
+
+def check_symmetry(game, num_games=20, seed=None):
+    """
+    Play random games and assert, at every position, that each symmetric
+    image of the position has the same canonical key, and that a move mapped
+    into the canonical position and back out into an image is legal there
+    and leads to a position with the same key as the move itself. For
+    Reversi, the bitboard engine's key is checked against the dict engine's.
+
+    Args:
+        game: A Reversi (dict engine) or TicTacToe game.
+        num_games (int): The number of random games to play.
+        seed: Optional seed for the random move choices.
+
+    Returns:
+        int: The number of positions checked.
+    """
+    rng = random.Random(seed)
+    symmetry = game_symmetry(game)
+    bitboard = BitboardReversi() if isinstance(game, Reversi) else None
+    checked = 0
+    for _ in range(num_games):
+        state = game.initial
+        bstate = bitboard.initial if bitboard is not None else None
+        while not game.terminal_test(state):
+            key, t = symmetry.canonical(state)
+            if bitboard is not None:
+                assert symmetry.canonical(bstate) == (key, t)
+            move = rng.choice(game.actions(state))
+            child_key = symmetry.canonical(game.result(state, move))[0]
+            for mapping in symmetry.maps:
+                image = mirrored_state(game, state, mapping)
+                image_key, image_t = symmetry.canonical(image)
+                assert image_key == key, (state, mapping)
+                image_move = symmetry.from_canonical(symmetry.to_canonical(move, t), image_t)
+                assert image_move in game.actions(image)
+                assert symmetry.canonical(game.result(image, image_move))[0] == child_key
+            checked += 1
+            state = game.result(state, move)
+            if bitboard is not None:
+                bstate = bitboard.result(bstate, move)
+    return checked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check position canonicalization and count positions with and without it.")
+    parser.add_argument("--games", type=int, default=20, help="number of random games to check per game")
+    parser.add_argument("--plies", type=int, default=6, help="count distinct positions up to this many moves")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random move choices")
+    args = parser.parse_args()
+
+    for name, game in (('tictactoe', TicTacToe()), ('reversi', Reversi())):
+        checked = check_symmetry(game, args.games, args.seed)
+        print(f"{name}: {checked} positions, every symmetric image has the same key")
+        plain = count_positions(game, args.plies)
+        folded = count_positions(game, args.plies, game_symmetry(game))
+        for ply, (a, b) in enumerate(zip(plain, folded)):
+            print(f"  ply {ply}: {a} positions, {b} up to symmetry ({a / b:.1f}x)")
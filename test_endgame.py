@@ -0,0 +1,54 @@
+import pytest
+from bitboard_reversi import BitboardReversi
+from endgame import solve_endgame, endgame_move, ENDGAME_EMPTIES
+from reversi import Reversi
+
+# Positions reached by random play, as the moves from the initial position
+# (x and y digits of each move), with the exact final disc difference for the
+# player to move and every move that reaches it. The scores and moves were
+# found by a plain alpha-beta search over bitboards, without the solver's
+# table, move ordering or shortcuts.
+POSITIONS = [
+    (8, '35455465424152254032223123112112021036515524306220267547614614566415160463766657137077673717015374600073',
+     20, [(5, 0), (7, 2)]),
+    (9, '535455523231516522617563216442132366774170455012256062747376015620244636401603045710007115021126140535',
+     -2, [(7, 2)]),
+    (10, '3545562342672555132627415322461521646357657340752412043036020311660514171050544737777232160607002071',
+     20, [(0, 1)]),
+    (11, '35251554535242161705624546072655362406322312664731271422376304725765412013773003737451211164764075',
+     22, [(6, 7)]),
+    (12, '425425223241522331245526125630114561273562533663134057677420004771045116157350462165147507606403',
+     14, [(7, 0)]),
+    (12, '533225632223121442362435732154312627205511021640373003061741070452010545566210466166765751605075',
+     22, [(0, 0), (7, 0)]),
+    (13, '3525533624131415045216456103554647424163237062066422027326517150606621563210771230650776054031',
+     -12, [(7, 2)]),
+    (14, '42322454221455212010353004234145121302564650311101476603510064253660155726675365777552064027',
+     4, [(0, 5), (7, 0)]),
+]
+
+
+def play(game, moves):
+    state = game.initial
+    for i in range(0, len(moves), 2):
+        move = (int(moves[i]), int(moves[i + 1]))
+        assert move in game.actions(state)
+        state = game.result(state, move)
+    return state
+
+
+@pytest.mark.parametrize('game', [Reversi(), BitboardReversi()], ids=['reversi', 'bitboard'])
+@pytest.mark.parametrize('empties, moves, score, best_moves', POSITIONS)
+def test_solve_endgame(game, empties, moves, score, best_moves):
+    state = play(game, moves)
+    result = solve_endgame(game, state)
+    assert result.info['empties'] == empties
+    assert result.info['score'] == score
+    assert result.move in best_moves
+
+    # The players hand the positions within ENDGAME_EMPTIES to the solver
+    handed = endgame_move(game, state)
+    if empties <= ENDGAME_EMPTIES:
+        assert handed.move == result.move and handed.info['score'] == score
+    else:
+        assert handed is None
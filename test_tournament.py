@@ -0,0 +1,71 @@
+import json
+import pytest
+from tournament import run_tournament
+
+CONFIG = {
+    'game': {'name': 'tictactoe', 'args': [3, 3, 3]},
+    'games_per_pair': 2,
+    'seed': 0,
+    'players': {
+        'random': {'player': 'random'},
+        'depth2': {'player': 'minimax_limited_pruning', 'params': {'depth': 2}},
+        'mcts': {'player': 'mcts_tree', 'params': {'iterations': 50}},
+    },
+}
+
+OUTCOME = ('id', 'first', 'second', 'seed', 'utility', 'moves')
+
+
+def outcomes(records):
+    return sorted(tuple(record[key] for key in OUTCOME) for record in records)
+
+
+def test_resume_after_partial_record(tmp_path):
+    reference, played = run_tournament(CONFIG, tmp_path / 'reference.jsonl')
+    assert played == 6
+
+    # Cut the file in the middle of its last record, as a killed run would leave it
+    path = tmp_path / 'results.jsonl'
+    lines = (tmp_path / 'reference.jsonl').read_bytes().splitlines(keepends=True)
+    path.write_bytes(b''.join(lines[:-1]) + lines[-1][:len(lines[-1]) // 2])
+
+    with pytest.warns(UserWarning, match='partial record'):
+        records, played = run_tournament(CONFIG, path)
+    assert played == 1
+    assert outcomes(records) == outcomes(reference)
+    assert outcomes(json.loads(line) for line in path.read_text().splitlines()) == outcomes(reference)
+
+    # Nothing is left to play
+    records, played = run_tournament(CONFIG, path)
+    assert played == 0
+    assert len(records) == 6
+
+
+def test_resume_skips_removed_players(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    run_tournament(CONFIG, path)
+    config = dict(CONFIG, players={name: CONFIG['players'][name] for name in ('random', 'depth2')})
+
+    with pytest.warns(UserWarning, match='mcts'):
+        records, played = run_tournament(config, path)
+    assert played == 0
+    assert len(records) == 2
+    assert all({record['first'], record['second']} == {'random', 'depth2'} for record in records)
+
+
+@pytest.mark.parametrize('change', [
+    {'seed': 1},
+    {'game': {'name': 'tictactoe', 'args': [4, 4, 3]}},
+    {'players': dict(CONFIG['players'], depth2={'player': 'minimax_limited_pruning', 'params': {'depth': 3}})},
+], ids=['seed', 'game', 'params'])
+def test_resume_refuses_changed_config(tmp_path, change):
+    path = tmp_path / 'results.jsonl'
+    run_tournament(CONFIG, path)
+    with pytest.raises(ValueError, match='new results file'):
+        run_tournament(dict(CONFIG, **change), path)
+
+    # More games per pair or another player only add games
+    config = dict(CONFIG, games_per_pair=3, players=dict(CONFIG['players'], random2={'player': 'random'}))
+    records, played = run_tournament(config, path)
+    assert played == 18 - 6
+    assert len(records) == 18
@@ -1,13 +1,15 @@
-from game import Game
+from game import Game, MutableState
 from collections import namedtuple
+from zobrist import ZobristKeys
 
-GameState = namedtuple('GameState', 'to_move, utility, board, moves')
+GameState = namedtuple('GameState', 'to_move, utility, board, moves, zobrist')
 
 class TicTacToe(Game):
     """Play TicTacToe on an h x v board, with Max (first player) playing 'X'.
     A state has the player to move, a cached utility, a list of moves in
     the form of a list of (x, y) positions, and a board, in the form of
-    a dict of {(x, y): Player} entries, where Player is 'X' or 'O'."""
+    a dict of {(x, y): Player} entries, where Player is 'X' or 'O', and a
+    Zobrist hash of the position that is updated incrementally."""
 
     def __init__(self, h=3, v=3, k=3):
         self.h = h
@@ -15,7 +17,8 @@ class TicTacToe(Game):
         self.k = k
         moves = [(x, y) for x in range(1, h + 1)
                 for y in range(1, v + 1)]
-        self.initial = GameState(to_move='X', utility=0, board={}, moves=moves)
+        self.zobrist_keys = ZobristKeys(moves)
+        self.initial = GameState(to_move='X', utility=0, board={}, moves=moves, zobrist=0)
 
     def actions(self, state):
         """Legal moves are any square not yet taken."""
@@ -30,12 +33,37 @@ class TicTacToe(Game):
         moves.remove(move)
         return GameState(to_move=('O' if state.to_move == 'X' else 'X'),
                         utility=self.compute_utility(board, move, state.to_move),
-                        board=board, moves=moves)
+                        board=board, moves=moves,
+                        zobrist=self.zobrist_keys.place(state.zobrist, move, state.to_move))
 
     def utility(self, state, player):
         """Return the value to player; 1 for win, -1 for loss, 0 otherwise."""
         return state.utility if player == 'X' else -state.utility
 
+    def mutable_state(self, state):
+        """Return a copy of state, with its own board and moves, for make_move and unmake_move."""
+        return MutableState(to_move=state.to_move, utility=state.utility, board=state.board.copy(),
+                            moves=list(state.moves), zobrist=state.zobrist)
+
+    def make_move(self, state, move):
+        """Play a legal move on a mutable state in place and return what unmake_move needs to take it back."""
+        index = state.moves.index(move)
+        undo = (move, index, state.utility, state.zobrist)
+        player = state.to_move
+        state.board[move] = player
+        del state.moves[index]
+        state.utility = self.compute_utility(state.board, move, player)
+        state.zobrist = self.zobrist_keys.place(state.zobrist, move, player)
+        state.to_move = 'O' if player == 'X' else 'X'
+        return undo
+
+    def unmake_move(self, state, undo):
+        """Take back a move played by make_move."""
+        move, index, state.utility, state.zobrist = undo
+        del state.board[move]
+        state.moves.insert(index, move)
+        state.to_move = 'O' if state.to_move == 'X' else 'X'
+
     def terminal_test(self, state):
         """A state is terminal if it is won or there are no empty squares."""
         return state.utility != 0 or len(state.moves) == 0
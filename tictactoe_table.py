@@ -0,0 +1,256 @@
+import argparse
+import os
+import time
+import numpy as np
+from game import SearchResult
+from symmetry import game_symmetry
+from tictactoe import TicTacToe
+
+# A table has one byte per board, indexed by the board's ternary code: the sum
+# over the cells of digit * 3 ** cell, where the digit is 0 for an empty cell,
+# 1 for 'X' and 2 for 'O', and cell (x - 1) * v + (y - 1) numbers the squares
+# in the order of TicTacToe's move list. A byte holds (value + 2) | (move + 1) << 2,
+# value being the game-theoretic utility for 'X' and move the cell to play (or
+# -1 when the game is over). 0 marks a board that was not solved: one that
+# cannot be reached, or that is not the canonical image of its symmetry class.
+MAX_CELLS = 16
+
+TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Tables loaded or solved in this process, by (h, v, k)
+_tables = {}
+
+
+def table_path(h, v, k):
+    """Return the default file of the table for TicTacToe(h, v, k)."""
+    return os.path.join(TABLE_DIR, f'tictactoe_{h}x{v}_{k}.npy')
+
+
+def cell_index(game, square):
+    """Return the cell number of an (x, y) square."""
+    return (square[0] - 1) * game.v + square[1] - 1
+
+
+def symmetry_maps(game):
+    """Return an array whose row s gives, for each cell, the cell it is mapped to by symmetry s."""
+    squares = [(x, y) for x in range(1, game.h + 1) for y in range(1, game.v + 1)]
+    return np.array([[cell_index(game, mapping[square]) for square in squares] for mapping in game_symmetry(game).maps])
+
+
+def winning_lines(game):
+    """Return every run of k cells in a row, column or diagonal, as a list of cell lists."""
+    lines = []
+    for x in range(1, game.h + 1):
+        for y in range(1, game.v + 1):
+            for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_x, end_y = x + dx * (game.k - 1), y + dy * (game.k - 1)
+                if 1 <= end_x <= game.h and 1 <= end_y <= game.v:
+                    lines.append([cell_index(game, (x + dx * i, y + dy * i)) for i in range(game.k)])
+    return lines
+
+
+def solve_table(game, progress=None):
+    """
+    Solve every board of `game` up to symmetry, by retrograde analysis: the
+    boards are valued a layer (number of discs) at a time from the full
+    board down to the empty one, each layer in one vectorized pass that
+    looks the children up in the layer solved before it.
+
+    Only the canonical board of each symmetry class (the image with the
+    lowest code) is solved and stored. Among equally good moves the first in
+    the canonical board's move list is kept.
+
+    Args:
+        game: A TicTacToe game with at most MAX_CELLS squares.
+        progress: Called as progress(discs, boards solved in the layer) after each layer.
+
+    Returns:
+        np.ndarray: The uint8 table, of 3 ** (h * v) entries.
+    """
+    cells = game.h * game.v
+    if cells > MAX_CELLS:
+        raise ValueError(f"a table for {cells} squares would need 3 ** {cells} bytes")
+    pow3 = 3 ** np.arange(cells, dtype=np.int64)
+    maps = symmetry_maps(game)
+    lines = np.array(winning_lines(game)).reshape(-1, game.k)
+    table = np.zeros(3 ** cells, dtype=np.uint8)
+
+    # Number of X and O discs on every board, built up one cell at a time
+    xcounts = np.zeros(1, dtype=np.int8)
+    ocounts = np.zeros(1, dtype=np.int8)
+    for _ in range(cells):
+        xcounts = np.add.outer(np.array([0, 1, 0], dtype=np.int8), xcounts).ravel()
+        ocounts = np.add.outer(np.array([0, 0, 1], dtype=np.int8), ocounts).ravel()
+    difference = xcounts - ocounts
+    discs = xcounts + ocounts
+    del xcounts, ocounts
+
+    for n in range(cells, -1, -1):
+        # Boards with n discs where X has as many as O or one more, and their canonical ones
+        codes = np.flatnonzero((discs == n) & (difference >= 0) & (difference <= 1))
+        digits = np.empty((cells, len(codes)), dtype=np.int8)
+        for cell in range(cells):
+            digits[cell] = codes // pow3[cell] % 3
+        images = pow3[maps] @ digits
+        canonical = images.min(axis=0) == codes
+        codes, digits, images = codes[canonical], digits[:, canonical], images[:, canonical]
+
+        # The game is over if the player who moved last completed a line, or the board is full
+        x_moved = difference[codes] == 1
+        last = np.where(x_moved, 1, 2)
+        won = np.zeros(len(codes), dtype=bool)
+        for line in lines:
+            won |= (digits[line] == last).all(axis=0)
+        value = np.where(won, np.where(x_moved, 1, -1), 0).astype(np.int8)
+        move = np.full(len(codes), -1, dtype=np.int8)
+
+        if n < cells:
+            # The rest take the best child for the player to move: the highest value for X, the lowest for O
+            playing = ~won
+            piece = np.where(x_moved, 2, 1)
+            sign = np.where(x_moved, -1, 1)
+            best = np.full(len(codes), -2, dtype=np.int8)
+            for cell in range(cells):
+                empty = playing & (digits[cell] == 0)
+                if not empty.any():
+                    continue
+                child = (images[:, empty] + piece[empty] * pow3[maps[:, cell], np.newaxis]).min(axis=0)
+                score = sign[empty] * ((table[child] & 3).astype(np.int8) - 2)
+                better = score > best[empty]
+                index = np.flatnonzero(empty)[better]
+                best[index] = score[better]
+                move[index] = cell
+            value = np.where(playing, sign * best, value).astype(np.int8)
+
+        table[codes] = ((value + 2) | ((move.astype(np.int16) + 1) << 2)).astype(np.uint8)
+        if progress is not None:
+            progress(n, len(codes))
+    return table
+
+
+def save_table(table, path):
+    """Write a table to a .npy file."""
+    np.save(path, table)
+
+
+def load_table(path):
+    """Memory-map a table written by save_table."""
+    return np.load(path, mmap_mode='r')
+
+
+def table_supported(game):
+    """Return whether `game` is a TicTacToe board small enough for a table."""
+    return isinstance(game, TicTacToe) and game.h * game.v <= MAX_CELLS
+
+
+def get_table(game):
+    """Return the table for `game`: already in this process, mapped from its file, or solved
+    now and saved to its file, so that other processes and later runs map it instead."""
+    key = (game.h, game.v, game.k)
+    if key not in _tables:
+        path = table_path(*key)
+        if os.path.exists(path):
+            _tables[key] = load_table(path)
+        else:
+            _tables[key] = solve_table(game)
+            # Written under another name first, so no process maps a partly written file
+            temporary = f'{path}.{os.getpid()}.tmp'
+            try:
+                with open(temporary, 'wb') as f:
+                    np.save(f, _tables[key])
+                os.replace(temporary, path)
+            except OSError:
+                pass  # A read-only directory: the table is solved again in the next process
+    return _tables[key]
+
+
+class TableLookup:
+    """Answers positions of one TicTacToe(h, v, k) from its table, in time
+    independent of the game tree: the board's code is mapped to its
+    canonical image, and the stored move is mapped back."""
+
+    def __init__(self, game, table=None):
+        """
+        Args:
+            game: The TicTacToe game.
+            table: The game's table (default: get_table(game)).
+        """
+        self.game = game
+        self.table = table if table is not None else get_table(game)
+        self.pow3 = [3 ** cell for cell in range(game.h * game.v)]
+        self.maps = symmetry_maps(game).tolist()
+        self.squares = [(x, y) for x in range(1, game.h + 1) for y in range(1, game.v + 1)]
+
+    def lookup(self, state):
+        """Return the value of `state` for 'X' and its best move (None once the game is over)."""
+        cells = [(cell_index(self.game, square), 1 if player == 'X' else 2) for square, player in state.board.items()]
+        best_code, best_map = None, None
+        for mapping in self.maps:
+            code = sum(digit * self.pow3[mapping[cell]] for cell, digit in cells)
+            if best_code is None or code < best_code:
+                best_code, best_map = code, mapping
+        entry = int(self.table[best_code])
+        if entry == 0:
+            raise KeyError(f"position not in the table: {state.board}")
+        value, move = (entry & 3) - 2, (entry >> 2) - 1
+        if move < 0:
+            return value, None
+        return value, self.squares[best_map.index(move)]
+
+
+def perfect_play_player(game, state):
+    """Play a best move of `state` from the game's perfect-play table, with the
+    value of the position for the player to move in the info."""
+    if not table_supported(game):
+        raise ValueError(f"perfect_play_player only plays TicTacToe boards of up to {MAX_CELLS} squares")
+    lookups = perfect_play_player.lookups
+    key = (game.h, game.v, game.k)
+    if key not in lookups:
+        lookups[key] = TableLookup(game)
+    value, move = lookups[key].lookup(state)
+    return SearchResult(move, {'value': value if state.to_move == 'X' else -value})
+
+perfect_play_player.lookups = {}
+
+
+def check_table(game, lookup, num_games=100, seed=None):
+    """Play random games and assert that the table agrees with a full alpha-beta search on the
+    value of every position, and that its move keeps that value. Returns the positions checked."""
+    import random
+    from alphabeta import AlphaBetaSearch
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(num_games):
+        state = game.initial
+        while not game.terminal_test(state):
+            value, move = lookup.lookup(state)
+            search = AlphaBetaSearch(game, 'X', symmetry=game_symmetry(game))
+            assert search.alphabeta(state, -np.inf, np.inf, 0) == value, state
+            assert AlphaBetaSearch(game, 'X').alphabeta(game.result(state, move), -np.inf, np.inf, 1) == value
+            checked += 1
+            state = game.result(state, rng.choice(state.moves))
+    return checked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve TicTacToe(h, v, k) into a perfect-play table and save it.")
+    parser.add_argument("--h", type=int, default=3, help="board height")
+    parser.add_argument("--v", type=int, default=3, help="board width")
+    parser.add_argument("--k", type=int, default=3, help="discs in a row to win")
+    parser.add_argument("--output", default=None, help="table file (default: tictactoe_{h}x{v}_{k}.npy here)")
+    parser.add_argument("--check", type=int, default=0, help="random games to check against alpha-beta search")
+    args = parser.parse_args()
+
+    game = TicTacToe(args.h, args.v, args.k)
+    start_time = time.perf_counter()
+    solved = []
+    table = solve_table(game, lambda n, boards: solved.append(boards))
+    elapsed = time.perf_counter() - start_time
+    path = args.output or table_path(args.h, args.v, args.k)
+    save_table(table, path)
+    value, move = TableLookup(game, table).lookup(game.initial)
+    print(f"TicTacToe({args.h}, {args.v}, {args.k}): {sum(solved)} boards up to symmetry solved in {elapsed:.1f}s, "
+          f"value {value}, first move {move}; {table.nbytes / 2**20:.1f}MB written to {path}")
+    if args.check:
+        checked = check_table(game, TableLookup(game, load_table(path)), args.check)
+        print(f"{checked} positions checked against alpha-beta search")
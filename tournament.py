@@ -0,0 +1,334 @@
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+import warnings
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from tictactoe import TicTacToe
+from compact_tictactoe import CompactTicTacToe
+from reversi import Reversi
+from bitboard_reversi import BitboardReversi
+from randomplayer import random_player
+from minimax import minimax_player
+from minimax_pruning import minimax_pruning_player
+from minimax_limited_pruning import minimax_limited_pruning_player, minimax_iterative_deepening_player
+from mcts import mcts_player
+from mcts_tree import MCTSPlayer, anytime_mcts_player, compact_mcts_player
+from parallel_mcts import root_parallel_mcts_player, leaf_parallel_mcts_player
+from parallel_search import parallel_minimax_limited_pruning_player, parallel_minimax_pruning_player
+from move_ordering import OrderingPlayer
+from opening_book import BookPlayer, OpeningBook
+from tictactoe_table import perfect_play_player
+from main import play_one_game
+from instrumentation import JsonlSink
+
+# Games and players a config can name. Classes are instantiated afresh for
+# every game, since their instances keep state between moves (MCTSPlayer's
+# tree); functions are called with the config's parameters, and those that
+# take a move ordering get one for the whole game (see OrderingPlayer).
+GAMES = {
+    'tictactoe': TicTacToe,
+    'gomoku': CompactTicTacToe,
+    'reversi': Reversi,
+    'bitboard': BitboardReversi,
+}
+
+PLAYERS = {
+    'random': random_player,
+    'minimax': minimax_player,
+    'minimax_pruning': minimax_pruning_player,
+    'minimax_limited_pruning': minimax_limited_pruning_player,
+    'iterative_deepening': minimax_iterative_deepening_player,
+    'parallel_minimax_pruning': parallel_minimax_pruning_player,
+    'parallel_minimax_limited_pruning': parallel_minimax_limited_pruning_player,
+    'mcts': mcts_player,
+    'compact_mcts': compact_mcts_player,
+    'anytime_mcts': anytime_mcts_player,
+    'root_parallel_mcts': root_parallel_mcts_player,
+    'leaf_parallel_mcts': leaf_parallel_mcts_player,
+    'mcts_tree': MCTSPlayer,
+    'perfect_play': perfect_play_player,
+}
+
+# Rating of the average player
+ELO_MEAN = 1500
+
+
+def make_game(spec):
+    """Return the game a config describes, as a name or {"name": ..., "args": [...]}."""
+    if isinstance(spec, str):
+        spec = {'name': spec}
+    return GAMES[spec['name']](*spec.get('args', []))
+
+
+def make_player(spec):
+    """
+    Return a player for one game from its config entry:
+    {"player": name in PLAYERS, "params": {...}, "book": true or a book file}.
+    With "book" the player plays from the opening book while it can (see opening_book.py).
+    """
+    player = PLAYERS[spec['player']]
+    params = spec.get('params', {})
+    if isinstance(player, type):
+        player = player(**params)
+    elif 'ordering' in inspect.signature(player).parameters:
+        player = OrderingPlayer(player, **params)
+    else:
+        player = functools.partial(player, **params)
+    if spec.get('book'):
+        player = BookPlayer(player, OpeningBook(spec['book']) if isinstance(spec['book'], str) else None)
+    return player
+
+
+def fingerprint(config, first, second):
+    """Return a hash of the settings a game between `first` and `second` is played with:
+    the game and its arguments, the base seed and both players' config entries."""
+    settings = {'game': config['game'], 'seed': config.get('seed', 0),
+                'players': [config['players'][first], config['players'][second]]}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def schedule(names, games_per_pair, seed=0):
+    """
+    Return the round-robin games: `games_per_pair` per pair of players, each
+    player moving first in every other one, as dicts with an id, the players
+    in move order and a seed. Ids only depend on the names and the game's
+    number within its pair, so a resumed run recognises the games it has
+    played, and so do the seeds (the base seed plus a hash of the id), so
+    adding players or games per pair leaves the other games as they were.
+    """
+    games = []
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            for n in range(games_per_pair):
+                first, second = (a, b) if n % 2 == 0 else (b, a)
+                game_id = f'{a}|{b}|{n}'
+                games.append({'id': game_id, 'first': first, 'second': second,
+                              'seed': seed + zlib.crc32(game_id.encode())})
+    return games
+
+
+def play_scheduled_game(game_spec, player_specs, scheduled):
+    """Worker task: play one scheduled game and return its result record."""
+    game = make_game(game_spec)
+    first, second = make_player(player_specs[scheduled['first']]), make_player(player_specs[scheduled['second']])
+    start_time = time.perf_counter()
+    utility, _, _, move_stats = play_one_game(game, first, second, scheduled['seed'])
+    return dict(scheduled,
+                utility=utility,
+                moves=len(move_stats),
+                first_move_times=[r['move_time'] for r in move_stats if r['player'] == 0],
+                second_move_times=[r['move_time'] for r in move_stats if r['player'] == 1],
+                game_time=time.perf_counter() - start_time)
+
+
+def load_results(path, config):
+    """
+    Return the finished games recorded in a results file, for resuming.
+
+    A run killed while writing a record leaves a partial last line. That line
+    is cut off the file, so its game is played again and the records written
+    after it start on a line of their own. Records of players that are no
+    longer in the config are skipped with a warning. Every record carries the
+    fingerprint of the settings it was played with, and a ValueError is
+    raised if any differs from the config's, rather than mixing games played
+    under different settings.
+    """
+    names = list(config['players'])
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    records = []
+    end = 0
+    for number, line in enumerate(lines, 1):
+        try:
+            record = json.loads(line) if line.strip() else None
+        except ValueError:
+            if number < len(lines):
+                raise ValueError(f"{path}, line {number}: not a JSON record")
+            warnings.warn(f"{path}: dropping the partial record on its last line")
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+            break
+        end += len(line)
+        if record is not None:
+            records.append(record)
+    else:
+        if lines and not lines[-1].endswith(b'\n'):
+            with open(path, 'ab') as f:
+                f.write(b'\n')
+
+    unknown = {name for record in records for name in (record['first'], record['second'])} - set(names)
+    if unknown:
+        warnings.warn(f"{path}: skipping the games of players not in the config: {', '.join(sorted(unknown))}")
+        records = [record for record in records if record['first'] in names and record['second'] in names]
+
+    changed = {f"{record['first']} vs {record['second']}" for record in records
+               if record.get('fingerprint') != fingerprint(config, record['first'], record['second'])}
+    if changed:
+        raise ValueError(f"{path} has games played with another game, seed or player settings than the config "
+                         f"({', '.join(sorted(changed))}); use a new results file")
+    return records
+
+
+def run_tournament(config, results_path, workers=None, progress=None):
+    """
+    Play every scheduled game of `config` that is not yet in `results_path`,
+    appending one JSON line per finished game, so an interrupted run picks
+    up where it stopped when started again with the same file (see load_results).
+
+    Args:
+        config (dict): "game", "players" ({name: player entry}), "games_per_pair" and optionally "seed".
+        results_path: JSON Lines file of finished games.
+        workers: Number of games played at the same time (default: config's "workers", or 1).
+        progress: Called as progress(record, played, remaining) after each game.
+
+    Returns:
+        tuple: The records of every finished game and the number played in this run.
+    """
+    names = list(config['players'])
+    games = schedule(names, config.get('games_per_pair', 2), config.get('seed', 0))
+    for scheduled in games:
+        scheduled['fingerprint'] = fingerprint(config, scheduled['first'], scheduled['second'])
+    records = load_results(results_path, config)
+    done = {record['id'] for record in records}
+    pending = [scheduled for scheduled in games if scheduled['id'] not in done]
+    workers = workers or config.get('workers', 1)
+
+    played = 0
+    with JsonlSink(results_path) as sink:
+        def record(result):
+            nonlocal played
+            played += 1
+            records.append(result)
+            sink.write(result)
+            if progress is not None:
+                progress(result, played, len(pending) - played)
+
+        task = functools.partial(play_scheduled_game, config['game'], config['players'])
+        if workers <= 1:
+            for scheduled in pending:
+                record(task(scheduled))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for future in as_completed([pool.submit(task, scheduled) for scheduled in pending]):
+                    record(future.result())
+    return records, played
+
+
+def scores(records, names):
+    """Return the games and points (1 per win, 1/2 per draw) of every ordered pair of players, as two arrays."""
+    index = {name: i for i, name in enumerate(names)}
+    games = np.zeros((len(names), len(names)))
+    points = np.zeros((len(names), len(names)))
+    for record in records:
+        i, j = index[record['first']], index[record['second']]
+        points_first = (record['utility'] + 1) / 2
+        games[i, j] += 1
+        games[j, i] += 1
+        points[i, j] += points_first
+        points[j, i] += 1 - points_first
+    return games, points
+
+
+def elo_ratings(games, points, iterations=1000):
+    """
+    Fit Elo ratings to the results by maximum likelihood (the Bradley-Terry
+    model, with a draw counting as half a win), using the minorization-
+    maximization updates. One virtual draw is added between every pair that
+    played, so that a player who won or lost every game still gets a finite
+    rating. The ratings are shifted to average ELO_MEAN.
+    """
+    games = games + (games > 0)
+    points = points + (games > 0) * 0.5
+    wins = points.sum(axis=1)
+    strength = np.ones(len(games))
+    for _ in range(iterations):
+        previous = strength
+        strength = wins / (games / (strength[:, np.newaxis] + strength[np.newaxis, :])).sum(axis=1)
+        strength /= np.exp(np.log(strength).mean())
+        if np.allclose(strength, previous, rtol=1e-9):
+            break
+    ratings = 400 * np.log10(strength)
+    return ratings - ratings.mean() + ELO_MEAN
+
+
+def elo_intervals(records, names, samples=200, seed=0):
+    """Return the 2.5th and 97.5th percentiles of each player's rating over
+    `samples` bootstrap resamples of the games, as a (2, players) array."""
+    rng = np.random.default_rng(seed)
+    ratings = []
+    for _ in range(samples):
+        resample = [records[i] for i in rng.integers(len(records), size=len(records))]
+        ratings.append(elo_ratings(*scores(resample, names)))
+    return np.percentile(ratings, [2.5, 97.5], axis=0)
+
+
+def standings(records, names):
+    """Return one row per player, best rating first: name, Elo, its 95% interval, games,
+    score (share of points), average and 95th percentile move time."""
+    games, points = scores(records, names)
+    ratings = elo_ratings(games, points)
+    low, high = elo_intervals(records, names)
+    rows = []
+    for i, name in enumerate(names):
+        times = [t for record in records for side in ('first', 'second') if record[side] == name
+                 for t in record[f'{side}_move_times']]
+        played = games[i].sum()
+        rows.append({
+            'player': name,
+            'elo': ratings[i],
+            'elo_low': low[i],
+            'elo_high': high[i],
+            'games': int(played),
+            'score': points[i].sum() / played if played else 0,
+            'average_move_time': float(np.mean(times)) if times else 0,
+            'p95_move_time': float(np.percentile(times, 95)) if times else 0,
+        })
+    rows.sort(key=lambda row: -row['elo'])
+    return rows
+
+
+def print_standings(rows):
+    print(f"{'player':<24}{'Elo':>7}{'95% interval':>16}{'games':>7}{'score':>8}{'avg move':>11}{'p95 move':>11}")
+    for row in rows:
+        interval = f"{row['elo_low']:.0f}-{row['elo_high']:.0f}"
+        print(f"{row['player']:<24}{row['elo']:>7.0f}{interval:>16}{row['games']:>7}{row['score']:>8.1%}"
+              f"{row['average_move_time']:>10.4f}s{row['p95_move_time']:>10.4f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a round-robin tournament from a JSON config, without prompts.")
+    parser.add_argument("config", help="JSON config: game, players, games_per_pair, seed, workers")
+    parser.add_argument("--results", default=None, help="JSON Lines results file, resumed if it exists "
+                                                         "(default: the config's name with .results.jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="games played at the same time")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    results_path = args.results or os.path.splitext(args.config)[0] + '.results.jsonl'
+
+    start_time = time.perf_counter()
+
+    def show_progress(record, played, remaining):
+        outcome = {1: f"{record['first']} wins", -1: f"{record['second']} wins", 0: "draw"}[record['utility']]
+        print(f"[{played}/{played + remaining}] {record['first']} vs {record['second']}: {outcome} "
+              f"({record['moves']} moves, {record['game_time']:.2f}s)")
+
+    try:
+        records, played = run_tournament(config, results_path, args.workers, show_progress)
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start_time
+    if played:
+        moves = sum(record['moves'] for record in records[-played:])
+        print(f"{played} games in {elapsed:.1f}s: {played / elapsed * 60:.1f} games/min, {moves / elapsed:.0f} moves/s")
+    print(f"{len(records)} games in {results_path}")
+    print_standings(standings(records, list(config['players'])))
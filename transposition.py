@@ -0,0 +1,54 @@
+from collections import namedtuple
+
+# Bound types of a stored value
+EXACT, LOWER, UPPER = 0, 1, 2
+
+TTEntry = namedtuple('TTEntry', 'key, depth, value, flag, move, generation')
+
+
+class TranspositionTable:
+    """A fixed-size table of search results keyed by position hash.
+
+    Each slot holds one entry with the remaining search depth, the value, the
+    kind of bound the value is (exact, lower or upper) and the best move found.
+    When two positions map to the same slot the new result replaces the old
+    one if the old one is from an earlier search or was searched less deeply,
+    so deep results survive within a search and stale ones are recycled."""
+
+    def __init__(self, size=1 << 18):
+        """
+        Create an empty table.
+
+        Args:
+            size (int): Number of slots, rounded up to a power of two.
+        """
+        self.size = 1 << max(size - 1, 1).bit_length()
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """Mark the entries stored so far as belonging to an earlier search."""
+        self.generation += 1
+
+    def lookup(self, key):
+        """Return the entry stored for `key`, or None."""
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, value, flag, move=None):
+        """Store a search result, subject to the replacement policy."""
+        index = key & self.mask
+        old = self.entries[index]
+        if old is None or old.key == key or old.generation != self.generation or depth >= old.depth:
+            self.entries[index] = TTEntry(key, depth, value, flag, move, self.generation)
+
+    def clear(self):
+        """Drop every entry."""
+        self.entries = [None] * self.size
@@ -0,0 +1,45 @@
+import random
+
+# A fixed seed keeps hashes identical across runs and processes, so they can be
+# stored on disk or compared between engines that share a square layout.
+ZOBRIST_SEED = 0x5EED
+
+
+class ZobristKeys:
+    """Random 64-bit keys for Zobrist hashing of a board of squares.
+
+    The hash of a position is the XOR of the key of every (player, square)
+    pair on the board, with `side` mixed in when 'O' is to move. Because XOR
+    is its own inverse, a move only updates the hash for the squares it
+    changes instead of rehashing the whole board."""
+
+    def __init__(self, squares, players=('X', 'O'), seed=ZOBRIST_SEED):
+        """
+        Draw the keys for a board.
+
+        Args:
+            squares: The squares of the board, in a fixed order.
+            players: The pieces that can occupy a square.
+            seed: Seed of the key generator.
+        """
+        rng = random.Random(seed)
+        self.keys = {player: {} for player in players}
+        for square in squares:
+            for player in players:
+                self.keys[player][square] = rng.getrandbits(64)
+        self.side = rng.getrandbits(64)
+
+    def hash_board(self, board, to_move):
+        """Hash a {square: player} board from scratch."""
+        h = self.side if to_move == 'O' else 0
+        for square, player in board.items():
+            h ^= self.keys[player][square]
+        return h
+
+    def place(self, h, square, player):
+        """Return the hash after `player` places a piece on an empty square and the turn passes."""
+        return h ^ self.keys[player][square] ^ self.side
+
+    def flip(self, h, square, old, new):
+        """Return the hash after the piece on `square` changes from `old` to `new`."""
+        return h ^ self.keys[old][square] ^ self.keys[new][square]